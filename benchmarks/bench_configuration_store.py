@@ -0,0 +1,71 @@
+"""
+benchmark for storing the data distribution: pickling the whole distribution (as done before) compared with the
+SQLite configuration store, for a full save, an incremental save of a few changed folders and loading.
+
+usage: python benchmarks/bench_configuration_store.py [num_folders] [num_changed_folders]
+"""
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+from xtreemfs_client import configurationStore
+from xtreemfs_client import dataDistribution
+
+
+def main():
+    num_folders = 1000000
+    num_changed_folders = 100
+    if len(sys.argv) > 1:
+        num_folders = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        num_changed_folders = int(sys.argv[2])
+
+    distribution = dataDistribution.DataDistribution()
+    distribution.add_osd_list(['osd_' + str(i) for i in range(0, 30)])
+    osds = list(distribution.OSDs.values())
+    for i in range(0, num_folders):
+        osds[i % len(osds)].add_folder('volume/dataset_' + str(i % 100) + '/tile_' + str(i), 1 + i % 1000)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        pickle_path = os.path.join(tmp_dir, 'config.pickle')
+        start_time = time.time()
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(distribution, f)
+        pickle_save_time = time.time() - start_time
+
+        start_time = time.time()
+        with open(pickle_path, 'rb') as f:
+            pickle.load(f)
+        pickle_load_time = time.time() - start_time
+
+        store = configurationStore.ConfigurationStore(os.path.join(tmp_dir, '.das_config'))
+        start_time = time.time()
+        store.save(distribution)
+        store_full_save_time = time.time() - start_time
+
+        for i in range(0, num_changed_folders):
+            distribution.update_folder('volume/dataset_' + str(i % 100) + '/tile_' + str(i), 5000)
+        start_time = time.time()
+        store.save(distribution)
+        store_incremental_save_time = time.time() - start_time
+
+        start_time = time.time()
+        configurationStore.ConfigurationStore(os.path.join(tmp_dir, '.das_config')).load()
+        store_load_time = time.time() - start_time
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print("folders: " + str(num_folders) + ", changed folders: " + str(num_changed_folders))
+    print("pickle save:              {:.3f} s".format(pickle_save_time))
+    print("pickle load:              {:.3f} s".format(pickle_load_time))
+    print("store full save:          {:.3f} s".format(store_full_save_time))
+    print("store incremental save:   {:.3f} s".format(store_incremental_save_time))
+    print("store load:               {:.3f} s".format(store_load_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+benchmark for the memory needed to hold the files to be moved: FileToMove objects holding their three xtfsutil
+commands (as done before) compared with the compact FileToMove objects building their commands on demand.
+
+usage: python benchmarks/bench_file_to_move_memory.py [num_files]
+"""
+import sys
+import tracemalloc
+
+from xtreemfs_client import div_util
+from xtreemfs_client import physicalPlacementRealizer
+
+
+class FileToMoveWithCommands(object):
+    def __init__(self, absolute_file_path, origin_osd, target_osd,
+                 policy_command, create_replica_command, delete_replica_command, size=None):
+        self.absolute_file_path = absolute_file_path
+        self.origin_osd = origin_osd
+        self.target_osd = target_osd
+        self.policy_command = policy_command
+        self.create_replica_command = create_replica_command
+        self.delete_replica_command = delete_replica_command
+        self.size = size
+
+
+def get_path(i):
+    return '/mnt/xtreemfs/managed/dataset_' + str(i % 100) + '/tile_' + str(i % 10000) + '/file_' + str(i)
+
+
+def create_with_commands(num_files):
+    files = []
+    for i in range(0, num_files):
+        path = get_path(i)
+        files.append(FileToMoveWithCommands(path, 'osd_1', 'osd_2',
+                                            div_util.create_replication_policy_command(path),
+                                            div_util.create_create_replica_command(path, 'osd_2'),
+                                            div_util.create_delete_replica_command(path, 'osd_1'), i))
+    return files
+
+
+def create_compact(num_files):
+    return [physicalPlacementRealizer.FileToMove(get_path(i), 'osd_1', 'osd_2', True, True, 'osd_1', i)
+            for i in range(0, num_files)]
+
+
+def measure(create, num_files):
+    tracemalloc.start()
+    files = create(num_files)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del files
+    return size
+
+
+def main():
+    num_files = 1000000
+    if len(sys.argv) > 1:
+        num_files = int(sys.argv[1])
+
+    with_commands_size = measure(create_with_commands, num_files)
+    compact_size = measure(create_compact, num_files)
+
+    print("files: " + str(num_files))
+    print("with commands:   {:.1f} MiB ({:.0f} bytes per file)".format(with_commands_size / 2 ** 20,
+                                                                       with_commands_size / num_files))
+    print("compact:         {:.1f} MiB ({:.0f} bytes per file)".format(compact_size / 2 ** 20,
+                                                                       compact_size / num_files))
+
+
+if __name__ == '__main__':
+    main()
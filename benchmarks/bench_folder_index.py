@@ -0,0 +1,60 @@
+"""
+scaling benchmark for folder lookups in DataDistribution.
+
+compares the folder index (folder_id -> OSD) with the linear scan over all OSDs that was used before.
+for each number of folders, all folders are placed (not timed). afterwards, all folder sizes are updated
+(which is what OSDManager.update() does) and the folders are added again (which is the per-folder check
+in add_folders), and this is what is timed.
+
+usage: python benchmarks/bench_folder_index.py [num_osds]
+"""
+import sys
+import time
+
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folder
+
+
+def linear_get_containing_osd(distribution, folder_id):
+    """
+    the lookup as it was implemented before the folder index existed.
+    """
+    for checked_osd in distribution.OSDs.values():
+        if checked_osd.contains_folder(folder_id):
+            return checked_osd
+    return None
+
+
+def run(num_osds, num_folders, linear_lookup):
+    distribution = dataDistribution.DataDistribution()
+    distribution.add_osd_list(["osd_" + str(i) for i in range(0, num_osds)])
+    if linear_lookup:
+        distribution.get_containing_osd = lambda folder_id: linear_get_containing_osd(distribution, folder_id)
+
+    folders = [folder.Folder("volume/tiles/folder_" + str(i), 1 + i % 17, None) for i in range(0, num_folders)]
+
+    distribution.add_folders(folders)
+
+    start_time = time.time()
+    distribution.add_folders(folders)
+    for a_folder in folders:
+        distribution.update_folder(a_folder.id, a_folder.size + 1)
+    return time.time() - start_time
+
+
+def main():
+    num_osds = 100
+    if len(sys.argv) > 1:
+        num_osds = int(sys.argv[1])
+
+    print("osds: " + str(num_osds))
+    print("{:>10} {:>14} {:>14} {:>10}".format("folders", "linear (s)", "index (s)", "speedup"))
+    for num_folders in [1000, 2000, 5000, 10000, 20000, 50000]:
+        linear_time = run(num_osds, num_folders, True)
+        index_time = run(num_osds, num_folders, False)
+        print("{:>10} {:>14.3f} {:>14.3f} {:>10.1f}".format(num_folders, linear_time, index_time,
+                                                            linear_time / index_time))
+
+
+if __name__ == '__main__':
+    main()
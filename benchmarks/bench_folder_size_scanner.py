@@ -0,0 +1,73 @@
+"""
+benchmark for calculating the sizes of many depth-2 folders, as done by OSDManager.update and
+OSDManager.create_distribution_from_existing_files.
+
+compares one 'du -s' process per folder with the in-process folderSizeScanner, and with checking an up to date
+folderSizeCache (as done by OSDManager.update on an unchanged volume).
+
+usage: python benchmarks/bench_folder_size_scanner.py [num_folders] [files_per_folder]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from xtreemfs_client import folderSizeCache
+from xtreemfs_client import folderSizeScanner
+
+
+def main():
+    num_folders = 10000
+    files_per_folder = 5
+    if len(sys.argv) > 1:
+        num_folders = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        files_per_folder = int(sys.argv[2])
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        folders = []
+        for i in range(0, num_folders):
+            folder = os.path.join(tmp_dir, 'dataset_' + str(i % 10), 'tile_' + str(i))
+            os.makedirs(folder)
+            for j in range(0, files_per_folder):
+                with open(os.path.join(folder, 'file_' + str(j)), 'wb') as f:
+                    f.write(b'x' * (1000 * j))
+            folders.append(folder)
+
+        start_time = time.time()
+        du_sizes = {}
+        for folder in folders:
+            du = subprocess.run(["du", "-s", folder], stdout=subprocess.PIPE, universal_newlines=True)
+            du_sizes[folder] = int(du.stdout.split()[0])
+        du_time = time.time() - start_time
+
+        start_time = time.time()
+        folder_sizes = folderSizeScanner.scan_folders(folders)
+        scanner_time = time.time() - start_time
+
+        assert all(du_sizes[folder] == folder_sizes[folder].get_du_size() for folder in folders)
+
+        cache = folderSizeCache.FolderSizeCache(os.path.join(tmp_dir, '.das_config.sizes'), tmp_dir)
+        cache.get_folder_sizes(folders)
+        cache.save()
+        start_time = time.time()
+        cache = folderSizeCache.FolderSizeCache(os.path.join(tmp_dir, '.das_config.sizes'), tmp_dir)
+        cache.load()
+        cache.get_folder_sizes(folders)
+        cache.save()
+        cache_time = time.time() - start_time
+        assert cache.num_misses == 0
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print("folders: " + str(num_folders) + ", files per folder: " + str(files_per_folder))
+    print("du -s per folder: {:.3f} s".format(du_time))
+    print("scanner:          {:.3f} s".format(scanner_time))
+    print("unchanged cache:  {:.3f} s".format(cache_time))
+
+
+if __name__ == '__main__':
+    main()
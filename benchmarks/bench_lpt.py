@@ -0,0 +1,53 @@
+"""
+benchmark for bulk LPT placement in DataDistribution.add_folders.
+
+compares the priority queue LPT (use_lpt_queue=True) with the linear scan over all OSDs per folder.
+the linear scan is only run for the smaller instances, as it takes too long for the large ones.
+
+usage: python benchmarks/bench_lpt.py [num_osds] [max_num_folders]
+"""
+import random
+import sys
+import time
+
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folder
+
+
+def run(num_osds, num_folders, use_lpt_queue):
+    random.seed(0)
+    distribution = dataDistribution.DataDistribution()
+    distribution.add_osd_list(["osd_" + str(i) for i in range(0, num_osds)])
+    # mixed bandwidths, as on nodes with different disks
+    distribution.set_osd_bandwidths({uuid: 1 + (i % 3) for i, uuid in enumerate(distribution.get_osd_list())})
+
+    folders = [folder.Folder("volume/tiles/folder_" + str(i), random.randint(1, 10 ** 6), None)
+               for i in range(0, num_folders)]
+
+    start_time = time.time()
+    distribution.add_folders(folders, use_lpt_queue=use_lpt_queue)
+    return time.time() - start_time
+
+
+def main():
+    num_osds = 300
+    max_num_folders = 10 ** 6
+    if len(sys.argv) > 1:
+        num_osds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        max_num_folders = int(sys.argv[2])
+
+    print("osds: " + str(num_osds))
+    print("{:>10} {:>14} {:>14}".format("folders", "linear (s)", "queue (s)"))
+    num_folders = 1000
+    while num_folders <= max_num_folders:
+        linear_time = float('nan')
+        if num_folders <= 20000:
+            linear_time = run(num_osds, num_folders, False)
+        queue_time = run(num_osds, num_folders, True)
+        print("{:>10} {:>14.3f} {:>14.3f}".format(num_folders, linear_time, queue_time))
+        num_folders *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+benchmark for replica location lookups on a fake XtreemFS mount (see tests/fake_mount.py).
+
+compares reading the canned xtreemfs.locations extended attribute in-process with forking the stub xtfsutil
+for each file (the stub is a python script, so it is somewhat slower to start than the real xtfsutil).
+
+usage: python benchmarks/bench_replica_lookup.py [num_files]
+"""
+import sys
+import time
+
+from xtreemfs_client import div_util
+from tests import fake_mount
+
+
+def main():
+    num_files = 200
+    if len(sys.argv) > 1:
+        num_files = int(sys.argv[1])
+
+    with fake_mount.FakeXtreemFSMount() as mount:
+        file_paths = [mount.create_file('tiles/tile_' + str(i % 10) + '/file_' + str(i), 'osd_' + str(1 + i % 3))
+                      for i in range(0, num_files)]
+
+        start_time = time.time()
+        for file_path in file_paths:
+            div_util.get_osd_uuids_xtfsutil(file_path)
+        xtfsutil_time = time.time() - start_time
+
+        start_time = time.time()
+        for file_path in file_paths:
+            div_util.get_osd_uuids(file_path)
+        xattr_time = time.time() - start_time
+
+    print("files: " + str(num_files))
+    print("xtfsutil: {:.3f} s ({:.2f} ms per file)".format(xtfsutil_time, 1000 * xtfsutil_time / num_files))
+    print("xattr:    {:.3f} s ({:.2f} ms per file)".format(xattr_time, 1000 * xattr_time / num_files))
+
+
+if __name__ == '__main__':
+    main()
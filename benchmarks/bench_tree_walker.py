@@ -0,0 +1,85 @@
+"""
+benchmark for walking a directory tree: os.walk (as done before) compared with the parallel treeWalker.TreeWalker,
+on a synthetic tree. the metadata latency of a FUSE mount (a round trip to the MRC per directory listing and per
+file) is simulated by sleeping in os.scandir and in a per-file function, as a local file system answers from
+memory.
+
+usage: python benchmarks/bench_tree_walker.py [num_directories] [files_per_directory] [latency_ms] [parallelism]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from xtreemfs_client import treeWalker
+
+
+def main():
+    num_directories = 500
+    files_per_directory = 20
+    latency_secs = 0.001
+    parallelism = 16
+    if len(sys.argv) > 1:
+        num_directories = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        files_per_directory = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        latency_secs = float(sys.argv[3]) / 1000
+    if len(sys.argv) > 4:
+        parallelism = int(sys.argv[4])
+
+    tmp_dir = tempfile.mkdtemp()
+    original_scandir = os.scandir
+
+    def slow_scandir(path):
+        time.sleep(latency_secs)
+        return original_scandir(path)
+
+    def query_file(path):
+        # e.g., reading the OSDs of the file
+        time.sleep(latency_secs)
+        return path
+
+    try:
+        for i in range(0, num_directories):
+            directory = os.path.join(tmp_dir, 'stripe_' + str(i % 20), 'tile_' + str(i), 'scene')
+            os.makedirs(directory)
+            for j in range(0, files_per_directory):
+                open(os.path.join(directory, 'file_' + str(j)), 'w').close()
+
+        os.scandir = slow_scandir
+        start_time = time.time()
+        num_walked_files = 0
+        for directory, _, filenames in os.walk(tmp_dir):
+            num_walked_files += len(filenames)
+        walk_time = time.time() - start_time
+
+        start_time = time.time()
+        num_tree_walker_files = len(list(treeWalker.walk_files(tmp_dir, parallelism)))
+        tree_walker_time = time.time() - start_time
+
+        start_time = time.time()
+        for directory, _, filenames in os.walk(tmp_dir):
+            for filename in filenames:
+                query_file(os.path.join(directory, filename))
+        walk_query_time = time.time() - start_time
+
+        start_time = time.time()
+        list(treeWalker.walk_files(tmp_dir, parallelism, function=lambda x: query_file(x.path)))
+        tree_walker_query_time = time.time() - start_time
+    finally:
+        os.scandir = original_scandir
+        shutil.rmtree(tmp_dir)
+
+    assert num_walked_files == num_tree_walker_files
+    print("directories: " + str(num_directories) + ", files: " + str(num_walked_files) + ", latency: "
+          + str(latency_secs * 1000) + " ms, parallelism: " + str(parallelism))
+    print("os.walk:                      {:.3f} s".format(walk_time))
+    print("tree walker:                  {:.3f} s".format(tree_walker_time))
+    print("os.walk + query per file:     {:.3f} s".format(walk_query_time))
+    print("tree walker + query per file: {:.3f} s".format(tree_walker_query_time))
+
+
+if __name__ == '__main__':
+    main()
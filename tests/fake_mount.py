@@ -0,0 +1,295 @@
+"""
+a fake XtreemFS mount for tests and benchmarks without an XtreemFS installation.
+
+the mount is a local directory. the replica locations of its files are kept in a state file and served as canned
+extended attributes (by replacing os.getxattr) as well as by a stub xtfsutil executable, which is put in front of
+$PATH. the stub understands the subset of xtfsutil used by xtreemfs_client: printing information on files,
+directories and the volume, setting the replication policy, adding and deleting replicas and setting
+filenamePrefix rules. files that are not known to the state are located on the OSD given by the longest
+matching filenamePrefix rule (or on the first OSD), just like new files on a real volume.
+"""
+import fcntl
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from unittest import mock
+
+from xtreemfs_client import div_util
+
+state_file_name = 'state.json'
+
+
+class VolumeState(object):
+    """
+    the state of a fake volume, stored in a json file. use as context manager to read and modify the state
+    while holding a lock on the file, as several stub xtfsutil processes may run in parallel.
+    """
+
+    def __init__(self, state_dir):
+        self.state_file = os.path.join(state_dir, state_file_name)
+        self.lock_file = None
+        self.values = None
+
+    def __enter__(self):
+        self.lock_file = open(self.state_file + '.lock', 'a')
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        with open(self.state_file) as f:
+            self.values = json.load(f)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.values, f)
+            os.replace(tmp_file, self.state_file)
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+    def get_relative_path(self, path):
+        """
+        path relative to the mount point, or None if path is not on the fake volume.
+        """
+        mount_point = self.values['mount_point']
+        path = os.path.abspath(path)
+        if path == mount_point:
+            return ''
+        if not path.startswith(mount_point + '/'):
+            return None
+        return path[len(mount_point) + 1:]
+
+    def get_file(self, relative_path):
+        """
+        get (and create, if necessary) the entry of a file.
+        """
+        files = self.values['files']
+        if relative_path not in files:
+            files[relative_path] = {'policy': 'none',
+                                    'replicas': [[[self.select_osd(relative_path)],
+                                                  div_util.replication_flag_is_complete]]}
+        return files[relative_path]
+
+    def select_osd(self, relative_path):
+        path_on_volume = os.path.join(self.values['volume_name'], relative_path)
+        selected_osd = self.values['osds'][0]
+        longest_prefix = -1
+        for prefix, osd_uuid in self.values['rules']:
+            if (path_on_volume == prefix or path_on_volume.startswith(prefix + '/')) \
+                    and len(prefix) > longest_prefix:
+                selected_osd = osd_uuid
+                longest_prefix = len(prefix)
+        return selected_osd
+
+
+class FakeXtreemFSMount(object):
+    def __init__(self, osds=('osd_1', 'osd_2', 'osd_3'), volume_name='volume', complete_new_replicas=True):
+        self.tmp_dir = tempfile.mkdtemp(prefix='fake_xtreemfs_')
+        self.mount_point = os.path.join(self.tmp_dir, 'mnt')
+        self.bin_dir = os.path.join(self.tmp_dir, 'bin')
+        self.volume_name = volume_name
+        self.osds = list(osds)
+        os.makedirs(self.mount_point)
+        os.makedirs(self.bin_dir)
+
+        with open(os.path.join(self.tmp_dir, state_file_name), 'w') as f:
+            json.dump({'mount_point': self.mount_point, 'volume_name': volume_name, 'osds': self.osds,
+                       'rules': [], 'osd_selection_policy': '1000,1004', 'files': {}, 'calls': [],
+                       'complete_new_replicas': complete_new_replicas}, f)
+
+        stub = os.path.join(self.bin_dir, 'xtfsutil')
+        repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(stub, 'w') as f:
+            f.write('#!' + sys.executable + '\n'
+                    'import sys\n'
+                    'sys.path.insert(0, ' + repr(repository_root) + ')\n'
+                    'from tests import fake_mount\n'
+                    'sys.exit(fake_mount.xtfsutil_main(' + repr(self.tmp_dir) + ', sys.argv[1:]))\n')
+        os.chmod(stub, os.stat(stub).st_mode | stat.S_IEXEC)
+
+        self.patchers = []
+
+    def start(self):
+        self.patchers = [mock.patch('os.getxattr', self.getxattr, create=True),
+                         mock.patch.dict(os.environ, {'PATH': self.bin_dir + os.pathsep + os.environ['PATH']})]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def stop(self):
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        self.patchers = []
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def get_value_map(self, managed_folder, data_distribution):
+        """
+        value map for constructing an OSDManager on this mount without calling xtfsutil.
+        """
+        relative_path = os.path.relpath(managed_folder, self.mount_point)
+        return {'path_on_volume': relative_path, 'path_to_mount': self.mount_point,
+                'volume_name': self.volume_name, 'osd_selection_policy': '1000,1004',
+                'data_distribution': data_distribution, 'volume_address': 'localhost:32638',
+                'osd_information': None}
+
+    def create_file(self, relative_path, osd_uuid=None, size=0):
+        """
+        create a file of the given size. if osd_uuid is None, the OSD is chosen by the filenamePrefix rules.
+        """
+        absolute_path = os.path.join(self.mount_point, relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        with open(absolute_path, 'wb') as f:
+            f.write(b'\0' * size)
+        with self.state() as state:
+            if relative_path in state.values['files']:
+                del state.values['files'][relative_path]
+            entry = state.get_file(relative_path)
+            if osd_uuid is not None:
+                entry['replicas'] = [[[osd_uuid], div_util.replication_flag_is_complete]]
+        return absolute_path
+
+    def get_osds(self, relative_path):
+        with self.state() as state:
+            entry = state.get_file(relative_path)
+            return [osd_uuid for osd_uuids, _ in entry['replicas'] for osd_uuid in osd_uuids]
+
+    def complete_replicas(self):
+        """
+        mark all replicas as complete (as if the OSDs had fetched all objects).
+        """
+        with self.state() as state:
+            for entry in state.values['files'].values():
+                for replica in entry['replicas']:
+                    replica[1] |= div_util.replication_flag_is_complete
+
+    def get_rules(self):
+        with self.state() as state:
+            return [tuple(rule) for rule in state.values['rules']]
+
+    def get_calls(self):
+        """
+        the argument lists of all stub xtfsutil calls so far.
+        """
+        with self.state() as state:
+            return state.values['calls']
+
+    def state(self):
+        return VolumeState(self.tmp_dir)
+
+    def getxattr(self, path, attribute, *, follow_symlinks=True):
+        with self.state() as state:
+            relative_path = state.get_relative_path(path)
+            if attribute != div_util.locations_xattr or relative_path is None or not os.path.isfile(path):
+                raise OSError(61, 'No data available', path)
+            entry = state.get_file(relative_path)
+            locations = {'update-policy': entry['policy'], 'version': 1,
+                         'replicas': [{'osds': [{'uuid': osd_uuid, 'address': '127.0.0.1:32640'}
+                                                for osd_uuid in osd_uuids],
+                                       'replication-flags': flags,
+                                       'striping-policy': {'pattern': 'STRIPING_POLICY_RAID0', 'size': 128,
+                                                           'width': len(osd_uuids)}}
+                                      for osd_uuids, flags in entry['replicas']]}
+        return json.dumps(locations).encode('UTF-8')
+
+
+def xtfsutil_main(state_dir, args):
+    """
+    entry point of the stub xtfsutil.
+    """
+    with VolumeState(state_dir) as state:
+        state.values['calls'].append(args)
+
+        if len(args) == 0:
+            print("Usage: xtfsutil <path>")
+            return 1
+
+        path = args[-1]
+        relative_path = state.get_relative_path(path)
+        if relative_path is None or not os.path.exists(path):
+            sys.stderr.write("xtfsutil failed: Path doesn't point to an entity on an XtreemFS volume!\n")
+            return 1
+
+        if args[0] == '--set-pattr':
+            operation = args[3].split()
+            if operation[0] == 'add':
+                state.values['rules'] = [rule for rule in state.values['rules'] if rule[0] != operation[1]]
+                state.values['rules'].append([operation[1], operation[2]])
+            elif operation[0] == 'remove':
+                state.values['rules'] = [rule for rule in state.values['rules'] if rule[0] != operation[1]]
+            elif operation[0] == 'clear':
+                state.values['rules'] = []
+            return 0
+
+        if args[0] == '--set-osp':
+            state.values['osd_selection_policy'] = '1000,1004'
+            return 0
+
+        if len(args) == 1:
+            print_information(state, relative_path, path)
+            return 0
+
+        entry = state.get_file(relative_path)
+        if args[0] == '-r':
+            entry['policy'] = args[1].lower()
+            return 0
+
+        if args[0].startswith('-a'):
+            new_osd = args[0][2:] if len(args[0]) > 2 else args[1]
+            if entry['policy'] != 'ronly':
+                sys.stderr.write("xtfsutil failed: file is not replicated\n")
+                return 1
+            flags = div_util.replication_flag_is_complete if state.values['complete_new_replicas'] else 0
+            entry['replicas'].append([[new_osd], flags])
+            return 0
+
+        if args[0] == '-d':
+            osd_to_delete = args[1]
+            remaining = [replica for replica in entry['replicas'] if osd_to_delete not in replica[0]]
+            if len(remaining) == len(entry['replicas']):
+                sys.stderr.write("xtfsutil failed: no replica on OSD " + osd_to_delete + "\n")
+                return 1
+            if not any(flags & div_util.replication_flag_is_complete for _, flags in remaining):
+                sys.stderr.write("xtfsutil failed: cannot delete the last complete replica\n")
+                return 1
+            entry['replicas'] = remaining
+            return 0
+
+        sys.stderr.write("xtfsutil failed: unsupported arguments " + str(args) + "\n")
+        return 1
+
+
+def print_information(state, relative_path, path):
+    values = state.values
+    print("Path (on volume)     /" + relative_path)
+    print("XtreemFS URL         pbrpc://localhost:32638/"
+          + div_util.remove_leading_trailing_slashes(os.path.join(values['volume_name'], relative_path)))
+    if relative_path == '':
+        print("Type                 volume")
+        print("OSD Selection p.     " + values['osd_selection_policy'])
+        for i, osd_uuid in enumerate(values['osds']):
+            prefix = "Selectable OSDs      " if i == 0 else "                     "
+            print(prefix + osd_uuid + " (127.0.0.1:" + str(32640 + i) + ")")
+    elif os.path.isdir(path):
+        print("Type                 directory")
+    else:
+        entry = state.get_file(relative_path)
+        print("Type                 file")
+        print("Replication policy   " + entry['policy'])
+        print("Replicas:")
+        for i, (osd_uuids, flags) in enumerate(entry['replicas']):
+            print("  Replica " + str(i + 1))
+            print("     Striping policy     STRIPING_POLICY_RAID0 / 1 / 128kB")
+            if flags & div_util.replication_flag_is_complete:
+                print("     Replication Flags   complete")
+            else:
+                print("     Replication Flags   partial")
+            for j, osd_uuid in enumerate(osd_uuids):
+                print("     OSD " + str(j + 1) + "               " + osd_uuid + " (127.0.0.1:32640)")
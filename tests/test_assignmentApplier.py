@@ -0,0 +1,106 @@
+import os
+import unittest
+from unittest import mock
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import assignmentApplier
+from xtreemfs_client import commandExecutor
+from xtreemfs_client import dataDistribution
+from tests import fake_mount
+
+
+class TestAssignmentApplier(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2'))
+        self.mount.start()
+        self.applier = assignmentApplier.AssignmentApplier(self.mount.mount_point, max_concurrency=8,
+                                                           retry_delay_secs=0.01)
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def test_add_and_remove_rules(self):
+        assignments = [('volume/stripe/tile_' + str(i), 'osd_' + str(1 + i % 2)) for i in range(0, 20)]
+        self.assertEqual([], self.applier.add_rules(assignments))
+        self.assertEqual(set(assignments), set(self.mount.get_rules()))
+
+        removed_folders = ['volume/stripe/tile_' + str(i) for i in range(0, 10)]
+        self.assertEqual([], self.applier.remove_rules(removed_folders))
+        self.assertEqual(set(assignments[10:]), set(self.mount.get_rules()))
+
+    def test_operations_on_the_same_folder_keep_their_order(self):
+        operations = [assignmentApplier.RuleOperation('add', 'volume/a', 'osd_1'),
+                      assignmentApplier.RuleOperation('add', 'volume/b', 'osd_1'),
+                      assignmentApplier.RuleOperation('remove', 'volume/a'),
+                      assignmentApplier.RuleOperation('add', 'volume/a', 'osd_2')]
+        waves = assignmentApplier.split_into_waves(operations)
+        self.assertEqual([['add volume/a osd_1', 'add volume/b osd_1'], ['remove volume/a'], ['add volume/a osd_2']],
+                         [list(map(str, wave)) for wave in waves])
+
+        self.assertEqual([], self.applier.apply(operations))
+        self.assertEqual({('volume/a', 'osd_2'), ('volume/b', 'osd_1')}, set(self.mount.get_rules()))
+
+    def test_permanent_errors_are_not_retried(self):
+        applier = assignmentApplier.AssignmentApplier(os.path.join(self.mount.mount_point, 'missing'),
+                                                      retry_delay_secs=0.01)
+        failed_operations = applier.add_rules([('volume/a', 'osd_1')])
+        self.assertEqual(1, len(failed_operations))
+        self.assertEqual('volume/a', failed_operations[0].operation.folder_id)
+        self.assertEqual(1, failed_operations[0].attempts)
+        self.assertFalse(failed_operations[0].is_transient())
+        self.assertEqual(1, len(self.mount.get_calls()))
+
+    def test_transient_errors_are_retried(self):
+        attempts = []
+        run_command = commandExecutor.run_command
+
+        async def flaky_run_command(args, timeout=None):
+            attempts.append(args)
+            if len(attempts) <= 2:
+                return commandExecutor.CommandResult(args, '', 'Error: connection refused', 1, 0)
+            return await run_command(args, timeout)
+
+        with mock.patch('xtreemfs_client.commandExecutor.run_command', flaky_run_command):
+            self.assertEqual([], self.applier.add_rules([('volume/a', 'osd_1')]))
+        self.assertEqual(3, len(attempts))
+        self.assertEqual([('volume/a', 'osd_1')], self.mount.get_rules())
+
+        applier = assignmentApplier.AssignmentApplier(self.mount.mount_point, max_retries=1, retry_delay_secs=0.01)
+        attempts.clear()
+        with mock.patch('xtreemfs_client.commandExecutor.run_command', flaky_run_command):
+            failed_operations = applier.add_rules([('volume/b', 'osd_1')])
+        self.assertEqual(1, len(failed_operations))
+        self.assertEqual(2, failed_operations[0].attempts)
+        self.assertTrue(failed_operations[0].is_transient())
+
+    def test_osd_manager(self):
+        managed_folder = os.path.join(self.mount.mount_point, 'managed')
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd_list(['osd_1', 'osd_2'])
+        osd_manager = OSDManager.OSDManager(managed_folder,
+                                            value_map=self.mount.get_value_map(managed_folder, distribution))
+        os.makedirs(managed_folder)
+        folder_ids = [osd_manager.get_path_on_volume(os.path.join(managed_folder, 'stripe', 'tile_' + str(i)))
+                      for i in range(0, 4)]
+        for folder_id in folder_ids:
+            distribution.OSDs['osd_1'].add_folder(folder_id, 1)
+        self.assertEqual([], osd_manager.apply_osd_assignments([(x, 'osd_1') for x in folder_ids]))
+        self.assertEqual(4, len(self.mount.get_rules()))
+
+        self.assertEqual([], osd_manager.remove_folders(folder_ids[0:2]))
+        self.assertEqual(set(folder_ids[2:]), set(map(lambda x: x[0], self.mount.get_rules())))
+        self.assertIsNone(distribution.get_containing_osd(folder_ids[0]))
+
+    def test_prefix_policy_is_set_once(self):
+        managed_folder = os.path.join(self.mount.mount_point, 'managed')
+        value_map = self.mount.get_value_map(managed_folder, dataDistribution.DataDistribution())
+        value_map['osd_selection_policy'] = '1000,3002'
+        osd_manager = OSDManager.OSDManager(managed_folder, value_map=value_map)
+        osd_manager.set_prefix_policy()
+        osd_manager.set_prefix_policy()
+        self.assertEqual('1000,1004', osd_manager.osd_selection_policy)
+        self.assertEqual(1, len([call for call in self.mount.get_calls() if call[0] == '--set-osp']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import unittest
+from unittest import mock
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import bandwidthCalibrator
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folder
+from xtreemfs_client import osd
+from tests import fake_mount
+
+
+class TestBandwidthCalibrator(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2', 'osd_3'))
+        self.mount.start()
+        self.managed_folder = os.path.join(self.mount.mount_point, 'managed')
+        os.makedirs(self.managed_folder)
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd_list(['osd_1', 'osd_2', 'osd_3'])
+        self.osd_manager = OSDManager.OSDManager(self.managed_folder,
+                                                 value_map=self.mount.get_value_map(self.managed_folder,
+                                                                                    self.distribution))
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def test_calibrate(self):
+        calibrator = bandwidthCalibrator.BandwidthCalibrator(self.osd_manager, probe_size=100 * 1024,
+                                                             block_size=16 * 1024, repetitions=2)
+        placed_osds = []
+        calibrate_osd = calibrator.calibrate_osd
+
+        def record_placement(osd_uuid):
+            throughput = calibrate_osd(osd_uuid)
+            placed_osds.append(osd_uuid)
+            return throughput
+
+        with mock.patch.object(calibrator, 'calibrate_osd', record_placement):
+            bandwidths = calibrator.calibrate()
+        self.assertEqual(['osd_1', 'osd_2', 'osd_3'], placed_osds)
+        self.assertEqual({'osd_1', 'osd_2', 'osd_3'}, set(bandwidths.keys()))
+        for osd_uuid, bandwidth in bandwidths.items():
+            self.assertGreater(bandwidth, 0)
+            self.assertEqual(bandwidth, self.distribution.OSDs[osd_uuid].bandwidth)
+
+        # the temporary rules and probe files are removed, and the bandwidths are saved
+        self.assertEqual([], self.mount.get_rules())
+        self.assertFalse(os.path.exists(calibrator.calibration_folder))
+        self.assertEqual(bandwidths['osd_2'], self.osd_manager.configuration_store.load().OSDs['osd_2'].bandwidth)
+
+    def test_misplaced_probe_files(self):
+        calibrator = bandwidthCalibrator.BandwidthCalibrator(self.osd_manager, probe_size=1024)
+        # every file is placed on osd_1
+        with mock.patch.object(calibrator, 'get_rule_prefix', lambda osd_uuid: 'other/' + osd_uuid):
+            bandwidths = calibrator.calibrate(save=False)
+        self.assertEqual(['osd_1'], list(bandwidths.keys()))
+        self.assertEqual(1, self.distribution.OSDs['osd_2'].bandwidth)
+        self.assertEqual([], self.mount.get_rules())
+
+    def test_bandwidths_are_used_for_placement(self):
+        calibrator = bandwidthCalibrator.BandwidthCalibrator(self.osd_manager)
+        throughputs = {'osd_1': 400 * 1024 * 1024, 'osd_2': 100 * 1024 * 1024, 'osd_3': 100 * 1024 * 1024}
+        with mock.patch.object(calibrator, 'calibrate_osd', lambda osd_uuid: throughputs[osd_uuid]):
+            bandwidths = calibrator.calibrate(save=False)
+        self.assertEqual({'osd_1': 400 * 1024 * 1024 / osd.bytes_per_sec_per_bandwidth_unit,
+                          'osd_2': 1, 'osd_3': 1}, bandwidths)
+
+        new_folders = [folder.Folder('volume/managed/a/tile_' + str(i), 100, None) for i in range(0, 6)]
+        assigned_osds = [osd_uuid for _, osd_uuid in self.distribution.add_folders(new_folders)]
+        self.assertEqual(4, assigned_osds.count('osd_1'))
+
+    def test_quantize_bandwidth(self):
+        self.assertEqual(1, bandwidthCalibrator.quantize_bandwidth(1.05))
+        self.assertEqual(4, bandwidthCalibrator.quantize_bandwidth(3.9))
+        self.assertEqual(0.5, bandwidthCalibrator.quantize_bandwidth(0.51))
+        self.assertEqual(2 ** 0.25, bandwidthCalibrator.quantize_bandwidth(1.2))
+        # repeated measurements of an OSD, varying by a few percent, yield few distinct bandwidths
+        measured = [1 + i / 2000 for i in range(0, 300)]
+        quantized = set(bandwidthCalibrator.quantize_bandwidth(x) for x in measured)
+        self.assertLessEqual(len(quantized), 2)
+        for x in measured:
+            self.assertLess(abs(bandwidthCalibrator.quantize_bandwidth(x) - x) / x, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
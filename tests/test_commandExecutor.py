@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from xtreemfs_client import commandExecutor
+from xtreemfs_client import div_util
+
+
+class TestCommandExecutor(unittest.TestCase):
+    def test_results(self):
+        executor = commandExecutor.CommandExecutor(max_concurrency=2)
+        results = executor.run([["echo", "hello world"], ["false"], ["no-such-executable-1234"]])
+
+        self.assertEqual(["echo", "hello world"], results[0].args)
+        self.assertEqual("hello world\n", results[0].stdout)
+        self.assertTrue(results[0].succeeded())
+
+        self.assertEqual(1, results[1].returncode)
+        self.assertFalse(results[1].succeeded())
+
+        self.assertEqual(127, results[2].returncode)
+        self.assertFalse(results[2].succeeded())
+
+    def test_timeout(self):
+        executor = commandExecutor.CommandExecutor(timeout=0.2)
+        start_time = time.time()
+        results = executor.run([["sleep", "10"], ["true"]])
+        self.assertLess(time.time() - start_time, 5)
+        self.assertTrue(results[0].timed_out)
+        self.assertFalse(results[0].succeeded())
+        self.assertTrue(results[1].succeeded())
+
+    def test_bounded_concurrency_and_callback(self):
+        completed = []
+        executor = commandExecutor.CommandExecutor(max_concurrency=3, callback=completed.append)
+        start_time = time.time()
+        results = executor.run([["sleep", "0.3"]] * 6)
+        duration = time.time() - start_time
+
+        self.assertEqual(6, len(completed))
+        self.assertTrue(all(result.succeeded() for result in results))
+        # 6 commands with 3 in parallel need two rounds
+        self.assertGreaterEqual(duration, 0.6)
+        self.assertLess(duration, 3)
+
+    def test_div_util_run_commands(self):
+        errored = div_util.run_commands(["true", "sh -c 'echo failed >&2; exit 3'", ["true"]], print_errors=False)
+        self.assertEqual(1, len(errored))
+        self.assertEqual((["sh", "-c", "echo failed >&2; exit 3"], ("", "failed\n"), 3), errored[0])
@@ -0,0 +1,119 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import configurationStore
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import osd
+
+
+class TestConfigurationStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, '.das_config')
+
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd(osd.OSD('osd_2', bandwidth=2, capacity=1000))
+        self.distribution.add_osd(osd.OSD('osd_1', bandwidth=0.5))
+        for i in range(0, 10):
+            self.distribution.OSDs['osd_' + str(1 + i % 2)].add_folder('volume/a/folder_' + str(i), i + 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assert_distributions_equal(self, expected, actual):
+        self.assertEqual(list(expected.OSDs.keys()), list(actual.OSDs.keys()))
+        for osd_uuid, expected_osd in expected.OSDs.items():
+            actual_osd = actual.OSDs[osd_uuid]
+            self.assertEqual(expected_osd.folders, actual_osd.folders)
+            self.assertEqual(expected_osd.total_folder_size, actual_osd.total_folder_size)
+            self.assertEqual(expected_osd.bandwidth, actual_osd.bandwidth)
+            self.assertEqual(expected_osd.capacity, actual_osd.capacity)
+            self.assertIs(actual, actual_osd.distribution)
+        self.assertEqual(expected.folder_index, actual.folder_index)
+
+    def test_save_and_load(self):
+        store = configurationStore.ConfigurationStore(self.path)
+        self.assertIsNone(store.load())
+        store.save(self.distribution)
+        self.assertEqual(set(), self.distribution.changed_folders)
+
+        loaded = configurationStore.ConfigurationStore(self.path).load()
+        self.assert_distributions_equal(self.distribution, loaded)
+        self.assertEqual(set(), loaded.changed_folders)
+
+    def test_incremental_save(self):
+        store = configurationStore.ConfigurationStore(self.path)
+        store.save(self.distribution)
+
+        store = configurationStore.ConfigurationStore(self.path)
+        distribution = store.load()
+        distribution.update_folder('volume/a/folder_0', 100)
+        distribution.OSDs['osd_2'].remove_folder('volume/a/folder_1')
+        distribution.assign_new_osd('volume/a/folder_2', 'osd_2')
+        distribution.OSDs['osd_1'].add_folder('volume/b/folder_0', 7)
+        self.assertEqual({'volume/a/folder_0', 'volume/a/folder_1', 'volume/a/folder_2', 'volume/b/folder_0'},
+                         distribution.changed_folders)
+
+        # rows of unchanged folders are not written again
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("UPDATE folders SET size = 42 WHERE folder_id = 'volume/a/folder_3'")
+        connection.close()
+
+        store.save(distribution)
+        loaded = configurationStore.ConfigurationStore(self.path).load()
+        self.assertEqual(42, loaded.get_folder_size('volume/a/folder_3'))
+        distribution.update_folder('volume/a/folder_3', 42)
+        self.assert_distributions_equal(distribution, loaded)
+
+    def test_import_pickle(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump(self.distribution, f)
+
+        store = configurationStore.ConfigurationStore(self.path)
+        loaded = store.load()
+        self.assert_distributions_equal(self.distribution, loaded)
+        self.assertFalse(store.is_pickle())
+        self.assertTrue(os.path.isfile(self.path + '.pickle'))
+        self.assert_distributions_equal(self.distribution, configurationStore.ConfigurationStore(self.path).load())
+
+    def test_rules(self):
+        store = configurationStore.ConfigurationStore(self.path)
+        self.assertIsNone(store.load_rules())
+        store.save(self.distribution)
+        self.assertIsNone(store.load_rules())
+
+        rules = {'volume/a': 'osd_1', 'volume/a/folder_0': 'osd_2'}
+        store.save_rules(rules)
+        self.assertEqual(rules, store.load_rules())
+
+        # only the changed prefixes are written
+        rules['volume/a/folder_1'] = 'osd_2'
+        del rules['volume/a/folder_0']
+        rules['volume/a'] = 'osd_2'
+        store.save_rules(rules, changed_prefixes=['volume/a/folder_0', 'volume/a/folder_1'])
+        self.assertEqual({'volume/a': 'osd_1', 'volume/a/folder_1': 'osd_2'}, store.load_rules())
+
+        store.save_rules({})
+        self.assertEqual({}, store.load_rules())
+        self.assert_distributions_equal(self.distribution, store.load())
+
+    def test_osd_manager(self):
+        value_map = {'path_on_volume': 'a', 'path_to_mount': '/mnt', 'volume_name': 'volume',
+                     'osd_selection_policy': '1000,1004', 'data_distribution': self.distribution,
+                     'volume_address': 'localhost:32638', 'osd_information': None}
+        OSDManager.OSDManager(self.tmp_dir, value_map=value_map).save_configuration()
+
+        # the distribution is read from the configuration store when it is needed
+        value_map['data_distribution'] = None
+        osd_manager = OSDManager.OSDManager(self.tmp_dir, value_map=value_map)
+        self.assert_distributions_equal(self.distribution, osd_manager.distribution)
+
+
+if __name__ == '__main__':
+    unittest.main()
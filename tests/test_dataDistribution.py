@@ -312,6 +312,117 @@ class TestDataDistribution(unittest.TestCase):
 
         self.assertEqual(8, distribution.get_maximum_processing_time()[1])
 
+    def test_folder_index(self):
+        folder_sizes = [1, 2, 5]
+        num_folders = 10
+        osd_bandwidths = [10, 30]
+        num_osds = 3
+
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd_list(create_test_osd_list(num_osds, osd_bandwidths))
+        distribution.set_osd_bandwidths(create_osd_information(num_osds, osd_bandwidths))
+        distribution.add_folders(create_test_folder_list(num_folders, folder_sizes), random_osd_assignment=True)
+        assert_folder_index_consistent(self, distribution)
+
+        distribution.rebalance_lpt()
+        assert_folder_index_consistent(self, distribution)
+
+        distribution.rebalance_one_folder()
+        assert_folder_index_consistent(self, distribution)
+
+        distribution.rebalance_two_steps_optimal_matching()
+        assert_folder_index_consistent(self, distribution)
+
+        distribution.rebalance_two_steps_random_matching()
+        assert_folder_index_consistent(self, distribution)
+
+        a_folder_id = list(distribution.folder_index.keys())[0]
+        old_osd = distribution.get_containing_osd(a_folder_id)
+        new_osd = [uuid for uuid in distribution.get_osd_list() if uuid != old_osd.uuid][0]
+        distribution.assign_new_osd(a_folder_id, new_osd)
+        self.assertEqual(new_osd, distribution.get_containing_osd(a_folder_id).uuid)
+        assert_folder_index_consistent(self, distribution)
+
+        distribution.get_containing_osd(a_folder_id).remove_folder(a_folder_id)
+        self.assertIsNone(distribution.get_containing_osd(a_folder_id))
+        assert_folder_index_consistent(self, distribution)
+
+    def test_assign_new_osd_keeps_folder_on_failure(self):
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd(osd.OSD('a'))
+        distribution.add_osd(osd.OSD('b', capacity=5))
+        distribution.OSDs['a'].add_folder('v/x/1', 10)
+        with self.assertRaises(AssertionError):
+            distribution.assign_new_osd('v/x/1', 'b')
+        self.assertEqual({'v/x/1': 10}, distribution.OSDs['a'].folders)
+        self.assertEqual({}, distribution.OSDs['b'].folders)
+        self.assertEqual('a', distribution.get_containing_osd('v/x/1').uuid)
+
+        distribution.assign_new_osd('v/x/1', 'a')
+        self.assertEqual({'v/x/1': 10}, distribution.OSDs['a'].folders)
+        assert_folder_index_consistent(self, distribution)
+
+    def test_no_suitable_osd(self):
+        for use_lpt_queue in [False, True]:
+            distribution = dataDistribution.DataDistribution()
+            distribution.add_osd(osd.OSD('a', capacity=10))
+            distribution.add_osd(osd.OSD('b', capacity=10))
+            with self.assertRaises(dataDistribution.NoSuitableOSDException) as context:
+                distribution.add_folders([folder.Folder('v/x/1', 8, None), folder.Folder('v/x/2', 11, None)],
+                                         use_lpt_queue=use_lpt_queue)
+            self.assertEqual('v/x/2', context.exception.folder.id)
+            self.assertIn('v/x/2', str(context.exception))
+            self.assertIn('largest free capacity of an OSD: 10', str(context.exception))
+
+        with self.assertRaises(dataDistribution.NoSuitableOSDException):
+            distribution.add_folders([folder.Folder('v/x/3', 11, None)], random_osd_assignment=True,
+                                     ignore_osd_capacities=False)
+
+    def test_lpt_queue_matches_linear_lpt(self):
+        # the priority queue must yield exactly the assignments of the linear scan, with and without capacities
+        num_osds = 5
+        osd_bandwidths = [1, 2, 3]
+        osd_capacities = [40, 60, 1000]
+        num_folders = 30
+        folder_sizes = [1, 2, 3, 5, 8]
+
+        for respect_capacities in [False, True]:
+            assignments = []
+            for use_lpt_queue in [False, True]:
+                random.seed(4711)
+                distribution = dataDistribution.DataDistribution()
+                distribution.add_osd_list(create_test_osd_list(num_osds, osd_bandwidths))
+                distribution.set_osd_bandwidths(create_osd_information(num_osds, osd_bandwidths))
+                if respect_capacities:
+                    distribution.set_osd_capacities(create_osd_information(num_osds, osd_capacities))
+                assignments.append(distribution.add_folders(create_test_folder_list(num_folders, folder_sizes),
+                                                            use_lpt_queue=use_lpt_queue))
+            self.assertEqual(num_folders * len(folder_sizes), len(assignments[0]))
+            self.assertEqual(assignments[0], assignments[1])
+
+    def test_get_containing_folder_id(self):
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd_list(create_test_osd_list(2, [1]))
+        distribution.add_folders([folder.Folder('volume/tiles/stripe_1/tile_1', 1, None),
+                                  folder.Folder('volume/tiles/stripe_1/tile_2', 1, None)])
+
+        self.assertEqual('volume/tiles/stripe_1/tile_1',
+                         distribution.get_containing_folder_id('volume/tiles/stripe_1/tile_1/scene/file'))
+        self.assertEqual('volume/tiles/stripe_1/tile_2',
+                         distribution.get_containing_folder_id('volume/tiles/stripe_1/tile_2'))
+        # prefixes are matched component-wise
+        self.assertIsNone(distribution.get_containing_folder_id('volume/tiles/stripe_1/tile_10/file'))
+        self.assertIsNone(distribution.get_containing_folder_id('volume/tiles/stripe_1'))
+        self.assertIsNone(distribution.get_containing_folder_id('other_volume/file'))
+
+
+def assert_folder_index_consistent(test_case, distribution):
+    expected_index = {}
+    for one_osd in distribution.OSDs.values():
+        for folder_id in one_osd.folders:
+            expected_index[folder_id] = one_osd.uuid
+    test_case.assertEqual(expected_index, distribution.folder_index)
+
 
 def create_test_osd_list(num_osds, osd_capacities):
     test_osds = []
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folderSizeCache
+from xtreemfs_client import folderSizeScanner
+
+
+class TestFolderSizeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, '.das_config.sizes')
+        self.folders = []
+        for i in range(0, 3):
+            folder = os.path.join(self.tmp_dir, 'dataset', 'tile_' + str(i))
+            os.makedirs(os.path.join(folder, 'scene'))
+            write_file(os.path.join(folder, 'scene', 'file_0'), 10000)
+            self.folders.append(folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_only_changed_folders_are_scanned(self):
+        cache = folderSizeCache.FolderSizeCache(self.cache_file, self.tmp_dir)
+        self.assertFalse(cache.load())
+        first_sizes = cache.get_folder_sizes(self.folders)
+        self.assertEqual(3, cache.num_misses)
+        cache.save()
+
+        write_file(os.path.join(self.folders[1], 'scene', 'file_1'), 20000)
+        os.makedirs(os.path.join(self.folders[2], 'new_scene'))
+
+        cache = folderSizeCache.FolderSizeCache(self.cache_file, self.tmp_dir)
+        self.assertTrue(cache.load())
+        with mock.patch.object(folderSizeScanner, 'scan_folder', wraps=folderSizeScanner.scan_folder) as scan:
+            second_sizes = cache.get_folder_sizes(self.folders)
+            self.assertEqual(sorted(self.folders[1:]), sorted(call[0][0] for call in scan.call_args_list))
+        self.assertEqual(1, cache.num_hits)
+
+        self.assertEqual(first_sizes[self.folders[0]].allocated_size, second_sizes[self.folders[0]].allocated_size)
+        self.assertEqual(2, second_sizes[self.folders[1]].num_files)
+        for folder in self.folders:
+            self.assertEqual(folderSizeScanner.scan_folder(folder).get_du_size(),
+                             second_sizes[folder].get_du_size())
+
+    def test_retain_and_invalidate(self):
+        cache = folderSizeCache.FolderSizeCache(self.cache_file, self.tmp_dir)
+        cache.get_folder_sizes(self.folders)
+        cache.retain(self.folders[:2])
+        self.assertEqual(2, len(cache.folder_sizes))
+        cache.invalidate(self.folders[0])
+        self.assertFalse(cache.is_valid(self.folders[0]))
+        self.assertTrue(cache.is_valid(self.folders[1]))
+
+    def test_osd_manager_update(self):
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd_list(['osd_1'])
+        managed_folder = self.tmp_dir
+        osd_manager = OSDManager.OSDManager(managed_folder,
+                                            value_map={'path_on_volume': 'managed', 'path_to_mount': '/mnt',
+                                                       'volume_name': 'volume',
+                                                       'osd_selection_policy': '1000,1004',
+                                                       'data_distribution': distribution,
+                                                       'volume_address': 'localhost:32638',
+                                                       'osd_information': None})
+        for folder in self.folders:
+            distribution.OSDs['osd_1'].add_folder(osd_manager.get_path_on_volume(folder), 1)
+
+        osd_manager.update()
+        self.assertTrue(os.path.isfile(os.path.join(managed_folder, '.das_config.sizes')))
+        expected_size = folderSizeScanner.scan_folder(self.folders[0]).get_du_size()
+        self.assertEqual(expected_size,
+                         distribution.OSDs['osd_1'].folders[osd_manager.get_path_on_volume(self.folders[0])])
+
+        with mock.patch.object(folderSizeScanner, 'scan_folder') as scan:
+            osd_manager.update()
+            scan.assert_not_called()
+
+
+def write_file(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+if __name__ == '__main__':
+    unittest.main()
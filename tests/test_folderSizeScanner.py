@@ -0,0 +1,48 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from xtreemfs_client import folderSizeScanner
+
+
+class TestFolderSizeScanner(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.folders = []
+        for i in range(0, 4):
+            folder = os.path.join(self.tmp_dir, 'dataset', 'tile_' + str(i))
+            os.makedirs(os.path.join(folder, 'sub'))
+            for j in range(0, i + 1):
+                with open(os.path.join(folder, 'file_' + str(j)), 'wb') as f:
+                    f.write(b'x' * (5000 * j + 1))
+                with open(os.path.join(folder, 'sub', 'file_' + str(j)), 'wb') as f:
+                    f.write(b'y' * 70000)
+            self.folders.append(folder)
+        # a hard link is only counted once, a symbolic link is not followed
+        os.link(os.path.join(self.folders[3], 'file_3'), os.path.join(self.folders[3], 'sub', 'link'))
+        os.symlink(self.folders[2], os.path.join(self.folders[3], 'symlink'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_scan_folder(self):
+        folder_size = folderSizeScanner.scan_folder(self.folders[1])
+        self.assertEqual(4, folder_size.num_files)
+        self.assertEqual(1 + 5001 + 2 * 70000, folder_size.apparent_size)
+
+    @unittest.skipIf(shutil.which('du') is None, "du is not available")
+    def test_same_size_as_du(self):
+        folder_sizes = folderSizeScanner.scan_folders(self.folders, parallelism=2)
+        self.assertEqual(set(self.folders), set(folder_sizes.keys()))
+        for folder in self.folders:
+            du = subprocess.run(["du", "-s", folder], stdout=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(int(du.stdout.split()[0]), folder_sizes[folder].get_du_size())
+
+    def test_empty(self):
+        self.assertEqual({}, folderSizeScanner.scan_folders([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
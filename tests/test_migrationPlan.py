@@ -0,0 +1,102 @@
+import json
+import os
+import unittest
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import migrationPlan
+from xtreemfs_client import osd
+from xtreemfs_client import physicalPlacementRealizer
+from tests import fake_mount
+
+mib = 1024 * 1024
+
+
+def create_file(name, origin_osd, target_osd, size):
+    return physicalPlacementRealizer.FileToMove(name, origin_osd, target_osd, None, None, None, size)
+
+
+class TestMigrationPlan(unittest.TestCase):
+    def test_summary_and_estimate(self):
+        files = [create_file('a', 'osd_1', 'osd_2', 300 * mib), create_file('b', 'osd_1', 'osd_2', 100 * mib),
+                 create_file('c', 'osd_3', 'osd_2', 200 * mib)]
+        plan = migrationPlan.MigrationPlan(files, osd_bandwidths={'osd_1': 1, 'osd_2': 2, 'osd_3': 1})
+        self.assertEqual({('osd_1', 'osd_2'): (2, 400 * mib), ('osd_3', 'osd_2'): (1, 200 * mib)},
+                         dict(plan.get_movement_summary()))
+
+        # osd_1 sends 400 MiB at 100 MiB/s, osd_2 receives 600 MiB at 200 MiB/s
+        unit_secs = 100 * mib / osd.bytes_per_sec_per_bandwidth_unit
+        estimates = plan.get_osd_estimates(per_file_overhead_secs=0)
+        self.assertAlmostEqual(4 * unit_secs, estimates['osd_1'])
+        self.assertAlmostEqual(3 * unit_secs, estimates['osd_2'])
+        self.assertAlmostEqual(2 * unit_secs, estimates['osd_3'])
+        self.assertAlmostEqual(4 * unit_secs, plan.estimate_duration(per_file_overhead_secs=0))
+
+        # rate limits and the per-file overhead also bound the duration
+        self.assertAlmostEqual(40, plan.estimate_duration(per_file_overhead_secs=0, default_rate_limit=15 * mib))
+        self.assertAlmostEqual(3000, plan.estimate_duration(per_file_overhead_secs=1000,
+                                                            max_files_in_progress_per_osd=1))
+
+        self.assertIn("osd_1 -> osd_2: 2 files, 400.0 MiB", plan.report())
+
+
+class TestMigrationPlanOnVolume(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2'))
+        self.mount.start()
+
+        self.path_on_mount_point = 'x/managed'
+        self.managed_folder = os.path.join(self.mount.mount_point, self.path_on_mount_point)
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd_list(['osd_1', 'osd_2'])
+        self.osd_manager = OSDManager.OSDManager(self.managed_folder,
+                                                 value_map=self.mount.get_value_map(self.managed_folder,
+                                                                                    self.distribution))
+
+        self.files = []
+        for tile in ['stripe_1/tile_1', 'stripe_1/tile_2', 'stripe_2/tile_3', 'stripe_2/tile_4']:
+            for i in range(0, 2):
+                relative_path = os.path.join(self.path_on_mount_point, tile, 'file_' + str(i))
+                self.mount.create_file(relative_path, 'osd_1', size=1000)
+                self.files.append(relative_path)
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def test_plan_and_execute(self):
+        plan = self.osd_manager.plan_distribution_from_existing_files()
+
+        # planning does not change anything, not even the size cache
+        self.assertFalse(os.path.exists(os.path.join(self.managed_folder, self.osd_manager.size_cache_file)))
+        self.assertEqual({}, self.distribution.folder_index)
+        self.assertEqual([], self.mount.get_rules())
+        self.assertFalse(any(call[0] in ['-r', '-a', '-d'] for call in self.mount.get_calls()))
+
+        self.assertEqual(4, len(plan.assignments))
+        planned_osds = dict((folder_id, osd_uuid) for folder_id, osd_uuid, _ in plan.assignments)
+        self.assertEqual(2, list(planned_osds.values()).count('osd_2'))
+        self.assertEqual({('osd_1', 'osd_2'): (4, 4000)}, dict(plan.get_movement_summary()))
+
+        plan_file = os.path.join(self.mount.tmp_dir, 'plan.json')
+        plan.save(plan_file)
+        with open(plan_file) as f:
+            saved_files = json.load(f)['files']
+        self.assertFalse(any('delete_replica_command' in entry for entry in saved_files))
+        loaded_plan = migrationPlan.load(plan_file)
+        self.assertEqual(plan.assignments, loaded_plan.assignments)
+        self.assertEqual(plan.get_movement_summary(), loaded_plan.get_movement_summary())
+        for planned_file, loaded_file in zip(plan.files_to_move, loaded_plan.files_to_move):
+            self.assertEqual(planned_file.policy_command, loaded_file.policy_command)
+            self.assertEqual(planned_file.create_replica_command, loaded_file.create_replica_command)
+            self.assertEqual(planned_file.delete_replica_command, loaded_file.delete_replica_command)
+
+        self.osd_manager.execute_plan(loaded_plan, movement_strategy='pipelined')
+        self.assertEqual(planned_osds, dict(self.distribution.folder_index))
+        self.assertEqual(set(planned_osds.items()), set(self.mount.get_rules()))
+        for relative_path in self.files:
+            folder_id = os.path.join(self.mount.volume_name, os.path.dirname(relative_path))
+            self.assertEqual([planned_osds[folder_id]], self.mount.get_osds(relative_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+from unittest import mock
+
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import migrationScheduler
+from xtreemfs_client import osd
+from xtreemfs_client import physicalPlacementRealizer
+
+mib = 1024 * 1024
+
+
+def create_file(name, origin_osd, target_osd, size):
+    return physicalPlacementRealizer.FileToMove(name, origin_osd, target_osd, None, None, None, size)
+
+
+class TestMigrationScheduler(unittest.TestCase):
+    def test_files_per_osd(self):
+        scheduler = migrationScheduler.MigrationScheduler(max_files_in_progress=10, max_files_in_progress_per_osd=2)
+        scheduler.add_files([create_file('a_' + str(i), 'osd_1', 'osd_2', 1) for i in range(0, 3)])
+        scheduler.add_files([create_file('b_' + str(i), 'osd_3', 'osd_4', 1) for i in range(0, 3)])
+
+        next_files = scheduler.next_files()
+        self.assertEqual(['a_0', 'b_0', 'a_1', 'b_1'], [x.absolute_file_path for x in next_files])
+        self.assertEqual([], scheduler.next_files())
+        scheduler.finished(next_files[0])
+        self.assertEqual(['a_2'], [x.absolute_file_path for x in scheduler.next_files()])
+        self.assertIsNone(scheduler.get_next_start_delay())
+
+
+class TestByteAwareMigrationScheduler(unittest.TestCase):
+    def setUp(self):
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd(osd.OSD('osd_1', bandwidth=1))
+        self.distribution.add_osd(osd.OSD('osd_2', bandwidth=4))
+        self.distribution.add_osd(osd.OSD('osd_3', bandwidth=4))
+
+    def test_bytes_in_flight_weighted_by_bandwidth(self):
+        # osd_1 may have 100 MiB in flight, osd_2 and osd_3 400 MiB
+        max_in_flight_secs = 100 * mib / migrationScheduler.osd.bytes_per_sec_per_bandwidth_unit
+        scheduler = migrationScheduler.ByteAwareMigrationScheduler(self.distribution,
+                                                                   max_in_flight_secs=max_in_flight_secs)
+        scheduler.add_files([create_file('a_' + str(i), 'osd_1', 'osd_2', 40 * mib) for i in range(0, 5)])
+        scheduler.add_files([create_file('b_' + str(i), 'osd_3', 'osd_2', 150 * mib) for i in range(0, 5)])
+
+        next_files = scheduler.next_files()
+        self.assertEqual(['a_0', 'b_0', 'a_1', 'b_1'], [x.absolute_file_path for x in next_files])
+        self.assertEqual(80 * mib, scheduler.bytes_in_flight_per_osd['osd_1'])
+        self.assertEqual(380 * mib, scheduler.bytes_in_flight_per_osd['osd_2'])
+
+        scheduler.finished(next_files[1])
+        self.assertEqual(['b_2'], [x.absolute_file_path for x in scheduler.next_files()])
+
+    def test_large_file_is_started_on_idle_osds(self):
+        scheduler = migrationScheduler.ByteAwareMigrationScheduler(self.distribution, max_in_flight_secs=0.001)
+        scheduler.add_files([create_file('a_' + str(i), 'osd_1', 'osd_2', 10 * mib) for i in range(0, 2)])
+        next_files = scheduler.next_files()
+        self.assertEqual(['a_0'], [x.absolute_file_path for x in next_files])
+        scheduler.finished(next_files[0])
+        self.assertEqual(['a_1'], [x.absolute_file_path for x in scheduler.next_files()])
+
+    def test_rate_limits(self):
+        now = [1000.0]
+        with mock.patch('time.time', lambda: now[0]):
+            scheduler = migrationScheduler.ByteAwareMigrationScheduler(self.distribution,
+                                                                       osd_rate_limits={'osd_1': 10 * mib})
+            scheduler.add_files([create_file('a_' + str(i), 'osd_1', 'osd_2', 15 * mib) for i in range(0, 3)])
+            scheduler.add_files([create_file('b_' + str(i), 'osd_3', 'osd_2', 15 * mib) for i in range(0, 2)])
+
+            # the bucket of osd_1 holds 10 MiB, so only one file of osd_1 is started
+            self.assertEqual(['a_0', 'b_0', 'b_1'], [x.absolute_file_path for x in scheduler.next_files()])
+            self.assertAlmostEqual(0.5, scheduler.get_next_start_delay(), places=2)
+
+            now[0] += 0.4
+            self.assertEqual([], scheduler.next_files())
+            now[0] += 0.2
+            self.assertEqual(['a_1'], [x.absolute_file_path for x in scheduler.next_files()])
+
+
+def create_moving_file(name, origin_osd, target_osd, size):
+    return physicalPlacementRealizer.FileToMove(name, origin_osd, target_osd, False, True, origin_osd, size)
+
+
+class TestCapacitySafeMigrationScheduler(unittest.TestCase):
+    def setUp(self):
+        self.osd_information = {'osd_1': {'usable_space': 100 * mib, 'total_space': 1000 * mib},
+                                'osd_2': {'usable_space': 200 * mib, 'total_space': 1000 * mib},
+                                'osd_3': {'usable_space': 500 * mib, 'total_space': 1000 * mib}}
+
+    def test_fill_threshold(self):
+        # osd_2 may receive 100 MiB until it reaches 90 %
+        scheduler = migrationScheduler.CapacitySafeMigrationScheduler(self.osd_information, fill_threshold=0.9)
+        scheduler.add_files([create_moving_file('a_' + str(i), 'osd_3', 'osd_2', 40 * mib) for i in range(0, 4)])
+
+        next_files = scheduler.next_files()
+        self.assertEqual(['a_0', 'a_1'], [x.absolute_file_path for x in next_files])
+        self.assertEqual([], scheduler.next_files())
+
+        # the space on the origin OSD is freed, but the new replicas stay on the target OSD
+        scheduler.finished(next_files[0])
+        self.assertEqual(460 * mib, scheduler.used_space['osd_3'])
+        self.assertEqual(880 * mib, scheduler.used_space['osd_2'])
+        self.assertEqual([], scheduler.next_files())
+        self.assertIsNone(scheduler.get_next_start_delay())
+        self.assertEqual(['a_2', 'a_3'], [x.absolute_file_path for x in scheduler.get_pending_files()])
+
+    def test_fullest_origin_first(self):
+        scheduler = migrationScheduler.CapacitySafeMigrationScheduler(self.osd_information, fill_threshold=0.9,
+                                                                      max_files_in_progress=1)
+        scheduler.add_files([create_moving_file('c', 'osd_3', 'osd_2', mib)])
+        scheduler.add_files([create_moving_file('b', 'osd_2', 'osd_3', mib)])
+        scheduler.add_files([create_moving_file('a', 'osd_1', 'osd_3', mib)])
+
+        started = []
+        while scheduler.has_pending_files():
+            next_files = scheduler.next_files()
+            started.extend(map(lambda x: x.absolute_file_path, next_files))
+            for file_to_move in next_files:
+                scheduler.finished(file_to_move)
+        self.assertEqual(['a', 'b', 'c'], started)
+
+    def test_moving_away_from_full_osd_makes_room(self):
+        # osd_1 and osd_2 are above the threshold, and files need to be swapped between them
+        scheduler = migrationScheduler.CapacitySafeMigrationScheduler(self.osd_information, fill_threshold=0.85)
+        scheduler.add_files([create_moving_file('a', 'osd_1', 'osd_3', 100 * mib)])
+        scheduler.add_files([create_moving_file('b', 'osd_2', 'osd_1', 50 * mib)])
+
+        next_files = scheduler.next_files()
+        self.assertEqual(['a'], [x.absolute_file_path for x in next_files])
+        scheduler.finished(next_files[0])
+        self.assertEqual(['b'], [x.absolute_file_path for x in scheduler.next_files()])
+
+    def test_osds_without_information_are_not_limited(self):
+        scheduler = migrationScheduler.CapacitySafeMigrationScheduler({}, fill_threshold=0.5)
+        scheduler.add_files([create_moving_file('a', 'osd_1', 'osd_2', 100 * mib)])
+        self.assertEqual(['a'], [x.absolute_file_path for x in scheduler.next_files()])
+
+
+def create_folder_file(name, folder_id, origin_osd, target_osd):
+    return physicalPlacementRealizer.FileToMove(name, origin_osd, target_osd, None, None, None, 1, folder_id)
+
+
+class TestFolderMajorMigrationScheduler(unittest.TestCase):
+    def test_folders_are_moved_one_after_another(self):
+        scheduler = migrationScheduler.FolderMajorMigrationScheduler(folder_priorities=['folder_c'],
+                                                                     max_files_in_progress=2)
+        scheduler.add_files([create_folder_file('a_0', 'folder_a', 'osd_1', 'osd_2'),
+                             create_folder_file('b_0', 'folder_b', 'osd_2', 'osd_1'),
+                             create_folder_file('c_0', 'folder_c', 'osd_1', 'osd_2'),
+                             create_folder_file('a_1', 'folder_a', 'osd_2', 'osd_1'),
+                             create_folder_file('c_1', 'folder_c', 'osd_2', 'osd_1'),
+                             create_folder_file('b_1', 'folder_b', 'osd_1', 'osd_2')])
+
+        started = []
+        while scheduler.has_pending_files():
+            next_files = scheduler.next_files()
+            started.append(sorted(map(lambda x: x.absolute_file_path, next_files)))
+            for file_to_move in next_files:
+                scheduler.finished(file_to_move)
+        self.assertEqual([['c_0', 'c_1'], ['a_0', 'a_1'], ['b_0', 'b_1']], started)
+
+    def test_later_folders_use_idle_osds(self):
+        scheduler = migrationScheduler.FolderMajorMigrationScheduler(max_files_in_progress_per_osd=1)
+        scheduler.add_files([create_folder_file('a_0', 'folder_a', 'osd_1', 'osd_2'),
+                             create_folder_file('a_1', 'folder_a', 'osd_1', 'osd_2'),
+                             create_folder_file('b_0', 'folder_b', 'osd_3', 'osd_4')])
+        self.assertEqual(['a_0', 'b_0'], [x.absolute_file_path for x in scheduler.next_files()])
+
+    def test_fill_threshold(self):
+        # osd_2 may receive 100 MiB until it reaches 90 %
+        osd_information = {'osd_1': {'usable_space': 500 * mib, 'total_space': 1000 * mib},
+                           'osd_2': {'usable_space': 200 * mib, 'total_space': 1000 * mib}}
+        scheduler = migrationScheduler.CapacitySafeFolderMajorMigrationScheduler(osd_information, fill_threshold=0.9,
+                                                                                 folder_priorities=['folder_b'])
+        files = [create_moving_file('a_0', 'osd_1', 'osd_2', 40 * mib),
+                 create_moving_file('b_0', 'osd_1', 'osd_2', 80 * mib),
+                 create_moving_file('b_1', 'osd_1', 'osd_2', 40 * mib),
+                 create_moving_file('c_0', 'osd_2', 'osd_1', 30 * mib)]
+        for file_to_move in files:
+            file_to_move.folder_id = 'folder_' + file_to_move.absolute_file_path[0]
+        scheduler.add_files(files)
+
+        # b_1 would fill osd_2 above the threshold, so the files of later folders are started
+        next_files = scheduler.next_files()
+        self.assertEqual(['b_0', 'c_0'], [x.absolute_file_path for x in next_files])
+        self.assertEqual(880 * mib, scheduler.used_space['osd_2'])
+        for file_to_move in next_files:
+            scheduler.finished(file_to_move)
+        self.assertEqual(850 * mib, scheduler.used_space['osd_2'])
+        self.assertEqual(['b_1'], [x.absolute_file_path for x in scheduler.next_files()])
+        self.assertEqual(['a_0'], [x.absolute_file_path for x in scheduler.get_pending_files()])
+
+
+if __name__ == '__main__':
+    unittest.main()
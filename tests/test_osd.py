@@ -13,3 +13,13 @@ class TestOsd(unittest.TestCase):
             for folder_id, folder_size in test_folders:
                 test_osd.add_folder(folder_id, folder_size)
             self.assertEqual(("folder_1", 1), test_osd.get_smallest_folder())
+
+    def test_update_folder_exceeding_capacity(self):
+        test_osd = osd.OSD("osd_uuid", capacity=10)
+        test_osd.add_folder("folder_1", 4)
+        test_osd.add_folder("folder_2", 4)
+        test_osd.update_folder("folder_1", 6)
+        with self.assertRaises(AssertionError):
+            test_osd.update_folder("folder_1", 7)
+        self.assertEqual({"folder_1": 6, "folder_2": 4}, test_osd.folders)
+        self.assertEqual(10, test_osd.total_folder_size)
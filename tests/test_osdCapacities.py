@@ -0,0 +1,130 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import configurationStore
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folder
+from xtreemfs_client import migrationPlan
+
+kib = 1024
+
+
+class TestOSDCapacities(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd_list(['osd_1', 'osd_2', 'osd_3'])
+        # in bytes, while folder sizes and capacities are in KiB
+        self.osd_information = {'osd_1': {'usable_space': 1000 * kib, 'total_space': 10000 * kib},
+                                'osd_2': {'usable_space': 100000 * kib, 'total_space': 100000 * kib}}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def create_osd_manager(self, **kwargs):
+        return OSDManager.OSDManager(self.tmp_dir,
+                                     value_map={'path_on_volume': 'managed', 'path_to_mount': '/mnt',
+                                                'volume_name': 'volume', 'osd_selection_policy': '1000,1004',
+                                                'data_distribution': self.distribution,
+                                                'volume_address': 'localhost:32638',
+                                                'osd_information': self.osd_information}, **kwargs)
+
+    def test_refresh_osd_capacities(self):
+        self.distribution.OSDs['osd_1'].add_folder('volume/managed/a/tile_1', 200)
+        self.distribution.OSDs['osd_2'].add_folder('volume/managed/a/tile_2', 5000)
+        osd_manager = self.create_osd_manager(capacity_reserve=0.05)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(200 + 1000 - 500, self.distribution.OSDs['osd_1'].capacity)
+        self.assertEqual(5000 + 100000 - 5000, self.distribution.OSDs['osd_2'].capacity)
+        # OSDs unknown to the DIR keep their capacity
+        self.assertEqual(sys.maxsize, self.distribution.OSDs['osd_3'].capacity)
+
+        # osd_1 would have the lowest processing time, but not enough free space
+        self.distribution.OSDs['osd_3'].add_folder('volume/managed/a/tile_3', 100000)
+        new_assignments = self.distribution.add_folders([folder.Folder('volume/managed/a/tile_4', 600, None)])
+        self.assertEqual([('volume/managed/a/tile_4', 'osd_2')], new_assignments)
+
+    def test_full_osds(self):
+        self.osd_information['osd_1']['usable_space'] = 100 * kib
+        self.distribution.OSDs['osd_1'].add_folder('volume/managed/a/tile_1', 200)
+        osd_manager = self.create_osd_manager(capacity_reserve=0.05)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(200, self.distribution.OSDs['osd_1'].capacity)
+
+    def test_disabled(self):
+        osd_manager = self.create_osd_manager(capacity_reserve=None)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(sys.maxsize, self.distribution.OSDs['osd_1'].capacity)
+
+    def test_periodic_refresh(self):
+        osd_manager = self.create_osd_manager(capacity_reserve=0, capacity_refresh_interval_secs=60)
+        new_information = {'osd_1': {'usable_space': 50 * kib, 'total_space': 100 * kib}}
+        with mock.patch('xtreemfs_client.OSDManager.read_osd_information', return_value=new_information) as read:
+            osd_manager.refresh_osd_capacities()
+            self.assertEqual(0, read.call_count)
+            self.assertEqual(1000, self.distribution.OSDs['osd_1'].capacity)
+
+            osd_manager.osd_information_timestamp -= 61
+            osd_manager.refresh_osd_capacities()
+            self.assertEqual(1, read.call_count)
+            self.assertEqual(50, self.distribution.OSDs['osd_1'].capacity)
+            self.assertIs(new_information, osd_manager.osd_information)
+
+        # the previous information is kept if the DIR cannot be reached
+        osd_manager.osd_information_timestamp -= 61
+        with mock.patch('xtreemfs_client.OSDManager.read_osd_information', return_value=None):
+            osd_manager.refresh_osd_capacities()
+        self.assertIs(new_information, osd_manager.osd_information)
+
+    def test_update_with_grown_folders(self):
+        tile = os.path.join(self.tmp_dir, 'a', 'tile_1')
+        os.makedirs(tile)
+        osd_manager = self.create_osd_manager(capacity_reserve=0.05, use_size_cache=False)
+        folder_id = osd_manager.get_path_on_volume(tile)
+        self.distribution.OSDs['osd_1'].add_folder(folder_id, 0)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(500, self.distribution.OSDs['osd_1'].capacity)
+
+        with open(os.path.join(tile, 'file'), 'wb') as f:
+            f.write(b'\0' * 1000 * kib)
+        osd_manager.update()
+        folder_size = self.distribution.OSDs['osd_1'].folders[folder_id]
+        self.assertGreaterEqual(folder_size, 1000)
+        self.assertEqual(folder_size + 500, self.distribution.OSDs['osd_1'].capacity)
+
+    def test_capacities_are_not_persisted(self):
+        self.distribution.OSDs['osd_1'].add_folder('volume/managed/a/tile_1', 200)
+        osd_manager = self.create_osd_manager(capacity_reserve=0.05)
+        osd_manager.refresh_osd_capacities()
+        osd_manager.save_configuration()
+        stored_distribution = configurationStore.ConfigurationStore(osd_manager.configuration_store.path).load()
+        self.assertEqual(sys.maxsize, stored_distribution.OSDs['osd_1'].capacity)
+        self.assertEqual(200, stored_distribution.OSDs['osd_1'].total_folder_size)
+
+        # the capacities are refreshed when the distribution is used again
+        osd_manager.distribution = None
+        self.assertEqual(sys.maxsize, osd_manager.distribution.OSDs['osd_1'].capacity)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(200 + 1000 - 500, osd_manager.distribution.OSDs['osd_1'].capacity)
+
+    def test_execute_plan_ignores_capacities(self):
+        self.distribution.OSDs['osd_2'].add_folder('volume/managed/a/tile_1', 5000)
+        osd_manager = self.create_osd_manager(capacity_reserve=0.05)
+        osd_manager.refresh_osd_capacities()
+        self.assertEqual(500, self.distribution.OSDs['osd_1'].capacity)
+        plan = migrationPlan.MigrationPlan([], [('volume/managed/a/tile_1', 'osd_1', 5000)],
+                                           ['volume/managed/a/tile_1'], {})
+        with mock.patch.object(osd_manager, 'apply_osd_assignments'), \
+                mock.patch('xtreemfs_client.physicalPlacementRealizer.PhysicalPlacementRealizer'):
+            osd_manager.execute_plan(plan)
+        self.assertEqual({'volume/managed/a/tile_1': 5000}, self.distribution.OSDs['osd_1'].folders)
+        self.assertEqual('osd_1', self.distribution.get_containing_osd('volume/managed/a/tile_1').uuid)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import div_util
+from xtreemfs_client import migrationJournal
+from xtreemfs_client import physicalPlacementRealizer
+from tests import fake_mount
+
+
+class TestPhysicalPlacementRealizer(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2'))
+        self.mount.start()
+
+        self.path_on_mount_point = 'x/managed'
+        self.managed_folder = os.path.join(self.mount.mount_point, self.path_on_mount_point)
+        self.tiles = {'stripe_1/tile_1': 'osd_1', 'stripe_1/tile_2': 'osd_2', 'stripe_2/tile_3': 'osd_2'}
+
+        distribution = dataDistribution.DataDistribution()
+        distribution.add_osd_list(['osd_1', 'osd_2'])
+        for tile, osd_uuid in self.tiles.items():
+            distribution.OSDs[osd_uuid].add_folder(self.get_folder_id(tile), 1)
+        self.osd_manager = OSDManager.OSDManager(self.managed_folder,
+                                                 value_map=self.mount.get_value_map(self.managed_folder,
+                                                                                    distribution))
+
+        # all files are created on osd_1, so the files of tile_2 and tile_3 need to be moved
+        self.files = {}
+        for tile in self.tiles:
+            for i in range(0, 2):
+                relative_path = os.path.join(self.path_on_mount_point, tile, 'scene', 'file_' + str(i))
+                self.files[relative_path] = self.tiles[tile]
+                self.mount.create_file(relative_path, 'osd_1', size=10)
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def get_folder_id(self, tile):
+        return os.path.join(self.mount.volume_name, self.path_on_mount_point, tile)
+
+    def assert_files_on_assigned_osds(self):
+        for relative_path, osd_uuid in self.files.items():
+            self.assertEqual([osd_uuid], self.mount.get_osds(relative_path))
+
+    def test_calculate_files_to_be_moved(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager)
+        realizer.calculate_files_to_be_moved()
+        self.assertEqual([('osd_1', 'osd_2')], list(realizer.files_to_be_moved.keys()))
+        file_to_move = realizer.files_to_be_moved[('osd_1', 'osd_2')][0]
+        self.assertEqual(div_util.create_replication_policy_command(file_to_move.absolute_file_path),
+                         file_to_move.policy_command)
+        self.assertEqual(4, len(realizer.get_list_of_all_files_to_be_moved()))
+
+    def test_realize_placement_osd_balanced(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01)
+        realizer.realize_placement(strategy='osd_balanced')
+        self.assert_files_on_assigned_osds()
+
+    def test_realize_placement_pipelined(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager,
+                                                                       max_files_in_progress_per_osd=2,
+                                                                       min_poll_interval_secs=0.01)
+        realizer.realize_placement(strategy='pipelined')
+        self.assert_files_on_assigned_osds()
+
+    def test_original_replicas_are_deleted_when_new_replicas_are_complete(self):
+        with self.mount.state() as state:
+            state.values['complete_new_replicas'] = False
+
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.05,
+                                                                       max_poll_interval_secs=0.1,
+                                                                       max_completion_polls=3)
+        realizer.calculate_files_to_be_moved()
+        incomplete_files = realizer.execute_moves(realizer.get_list_of_all_files_to_be_moved())
+
+        # the new replicas never became complete, so no original replica has been deleted
+        self.assertEqual(4, len(incomplete_files))
+        for relative_path, osd_uuid in self.files.items():
+            if osd_uuid == 'osd_2':
+                self.assertEqual(['osd_1', 'osd_2'], self.mount.get_osds(relative_path))
+        self.assertFalse(any(call[0] == '-d' for call in self.mount.get_calls()))
+
+        # now the replicas become complete while being watched
+        realizer.completion_watcher.max_polls = 100
+        realizer.calculate_files_to_be_moved()
+        self.assertEqual(4, len(realizer.get_list_of_all_files_to_be_moved()))
+        timer = threading.Timer(0.3, self.mount.complete_replicas)
+        timer.start()
+        incomplete_files = realizer.execute_moves(realizer.get_list_of_all_files_to_be_moved())
+        timer.join()
+
+        self.assertEqual([], incomplete_files)
+        self.assert_files_on_assigned_osds()
+
+    def test_update_files_to_be_moved_is_incremental(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01)
+        with mock.patch.object(realizer, 'check_file', wraps=realizer.check_file) as check_file:
+            realizer.realize_placement(strategy='pipelined')
+            # all 6 files are checked once, and only the 4 moved files are checked again
+            self.assertEqual(10, check_file.call_count)
+
+        self.assert_files_on_assigned_osds()
+        self.assertEqual(set(map(lambda x: os.path.join(self.mount.mount_point, x), self.files.keys())),
+                         realizer.files_in_place)
+
+    def test_realize_placement_for_given_folders(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01)
+        movements = {self.get_folder_id('stripe_1/tile_2'): ('osd_1', 'osd_2')}
+        realizer.realize_placement(strategy='pipelined', folder_ids=movements)
+
+        for relative_path, osd_uuid in self.files.items():
+            if 'tile_2' in relative_path:
+                self.assertEqual(['osd_2'], self.mount.get_osds(relative_path))
+            else:
+                # files of other folders are not touched
+                self.assertEqual(['osd_1'], self.mount.get_osds(relative_path))
+
+    def test_resume_interrupted_migration(self):
+        journal_path = os.path.join(self.mount.tmp_dir, 'journal')
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(
+            self.osd_manager, min_poll_interval_secs=0.01, journal=migrationJournal.MigrationJournal(journal_path))
+        # the migration dies after the new replicas have been added
+        with mock.patch.object(realizer.completion_watcher, 'wait_for_files', side_effect=RuntimeError('crash')):
+            self.assertRaises(RuntimeError, realizer.realize_placement)
+        realizer.journal.close()
+
+        journal = migrationJournal.MigrationJournal(journal_path)
+        self.assertTrue(journal.has_unfinished_migration())
+        self.assertEqual([migrationJournal.file_replica_added] * 4, list(journal.get_file_states().values()))
+
+        # all folders have been checked before, so nothing is scanned again
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01,
+                                                                       journal=journal)
+        with mock.patch('os.walk', side_effect=AssertionError('folder scanned again')):
+            realizer.realize_placement(resume=True)
+
+        self.assert_files_on_assigned_osds()
+        self.assertFalse(journal.has_unfinished_migration())
+        self.assertEqual([migrationJournal.file_moved] * 4, list(journal.get_file_states().values()))
+        journal.close()
+
+    def test_failed_policy_command(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01)
+        realizer.journal = mock.Mock()
+        realizer.calculate_files_to_be_moved()
+        run_command = physicalPlacementRealizer.commandExecutor.run_command
+
+        async def fail_policy_commands_of_tile_2(args, timeout=None):
+            if args[1] == '-r' and 'tile_2' in args[-1]:
+                return physicalPlacementRealizer.commandExecutor.CommandResult(args, '', 'failed', 1, 0)
+            return await run_command(args, timeout)
+
+        with mock.patch('xtreemfs_client.commandExecutor.run_command', side_effect=fail_policy_commands_of_tile_2):
+            realizer.move_files_pipelined()
+
+        tile_2_files = set(os.path.join(self.mount.mount_point, x) for x in self.files if 'tile_2' in x)
+        self.assertEqual(tile_2_files, set(realizer.failed_files))
+        recorded_files = set(call[0][0] for call in realizer.journal.record_file_state.call_args_list)
+        self.assertEqual(set(), tile_2_files & recorded_files)
+        for relative_path, osd_uuid in self.files.items():
+            self.assertEqual(['osd_1'] if 'tile_2' in relative_path else [osd_uuid], self.mount.get_osds(relative_path))
+
+    def test_realize_placement_with_fill_threshold(self):
+        # osd_2 has room for two of the four files of 10 bytes below the fill threshold
+        osd_information = {'osd_1': {'usable_space': 60, 'total_space': 100},
+                           'osd_2': {'usable_space': 30, 'total_space': 100}}
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01,
+                                                                       fill_threshold=0.9,
+                                                                       osd_information=osd_information)
+        realizer.realize_placement(strategy='osd_balanced')
+        moved_files = list(filter(lambda x: self.mount.get_osds(x) == ['osd_2'], self.files))
+        self.assertEqual(2, len(moved_files))
+        self.assertEqual(2, len(realizer.files_not_started))
+        self.assertEqual(10, realizer.osd_information['osd_2']['usable_space'])
+        self.assertEqual(80, realizer.osd_information['osd_1']['usable_space'])
+
+    def test_realize_placement_folder_major(self):
+        placed_folders = []
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(
+            self.osd_manager, min_poll_interval_secs=0.01, max_files_in_progress=2,
+            folder_priorities=[self.get_folder_id('stripe_2/tile_3')], folder_placed_callback=placed_folders.append)
+        realizer.realize_placement(strategy='folder_major')
+        self.assert_files_on_assigned_osds()
+        # tile_1 is already in place when it is checked, tile_3 is moved before tile_2
+        self.assertEqual([self.get_folder_id(x) for x in ['stripe_1/tile_1', 'stripe_2/tile_3', 'stripe_1/tile_2']],
+                         placed_folders)
+
+    def test_realize_placement_folder_major_with_fill_threshold(self):
+        # osd_2 has room for two of the four files of 10 bytes below the fill threshold, i.e., for one folder
+        osd_information = {'osd_1': {'usable_space': 60, 'total_space': 100},
+                           'osd_2': {'usable_space': 30, 'total_space': 100}}
+        placed_folders = []
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(
+            self.osd_manager, min_poll_interval_secs=0.01, fill_threshold=0.9, osd_information=osd_information,
+            folder_priorities=[self.get_folder_id('stripe_2/tile_3')], folder_placed_callback=placed_folders.append)
+        self.assertEqual('folder_major', realizer.get_movement_strategy('folder_major'))
+        realizer.realize_placement(strategy='folder_major')
+        # the prioritized folder is moved, the files of the other folder do not fit anymore
+        moved_files = set(filter(lambda x: self.mount.get_osds(x) == ['osd_2'], self.files))
+        self.assertEqual(set(filter(lambda x: 'tile_3' in x, self.files)), moved_files)
+        self.assertEqual(2, len(realizer.files_not_started))
+        self.assertIn(self.get_folder_id('stripe_2/tile_3'), placed_folders)
+        self.assertNotIn(self.get_folder_id('stripe_1/tile_2'), placed_folders)
+
+    def test_realize_placement_while_scanning(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01,
+                                                                       scan_window=1)
+        with mock.patch.object(realizer, 'check_file', wraps=realizer.check_file) as check_file:
+            realizer.realize_placement(strategy='pipelined')
+            # the files are checked while scanning, and none of them needs to be checked again
+            self.assertEqual(0, check_file.call_count)
+        self.assert_files_on_assigned_osds()
+        self.assertEqual({}, realizer.files_to_be_moved)
+
+    def test_scan_files_to_be_moved(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager)
+        scanned_folders = dict(realizer.scan_files_to_be_moved())
+        self.assertEqual(set(map(self.get_folder_id, self.tiles)), set(scanned_folders.keys()))
+        self.assertEqual([], scanned_folders[self.get_folder_id('stripe_1/tile_1')])
+        file_to_move = scanned_folders[self.get_folder_id('stripe_1/tile_2')][0]
+        self.assertEqual(div_util.create_create_replica_command(file_to_move.absolute_file_path, 'osd_2'),
+                         file_to_move.create_replica_command)
+        self.assertEqual(div_util.create_delete_replica_command(file_to_move.absolute_file_path, 'osd_1'),
+                         file_to_move.delete_replica_command)
+        # scanning does not keep the files
+        self.assertEqual({}, realizer.files_to_be_moved)
+        self.assertEqual(set(), realizer.files_in_place)
+
+    def test_realize_placement_byte_balanced(self):
+        realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self.osd_manager, min_poll_interval_secs=0.01,
+                                                                       default_rate_limit=20)
+        start_time = time.time()
+        realizer.realize_placement(strategy='byte_balanced')
+        self.assert_files_on_assigned_osds()
+        # 4 files of 10 bytes, at 20 bytes/sec with a burst of 20 bytes
+        self.assertLess(0.9, time.time() - start_time)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import sys
+import unittest
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import folderSizeScanner
+from xtreemfs_client import placementDaemon
+from tests import fake_mount
+
+
+@unittest.skipIf(not sys.platform.startswith('linux'), "inotify is only available on linux")
+class TestPlacementDaemon(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2'))
+        self.mount.start()
+
+        self.path_on_mount_point = 'x/managed'
+        self.managed_folder = os.path.join(self.mount.mount_point, self.path_on_mount_point)
+        os.makedirs(os.path.join(self.managed_folder, 'stripe_1', 'tile_1'))
+
+        self.distribution = dataDistribution.DataDistribution()
+        self.distribution.add_osd_list(['osd_1', 'osd_2'])
+        self.distribution.OSDs['osd_1'].add_folder(self.get_folder_id('stripe_1/tile_1'), 1000)
+        self.osd_manager = OSDManager.OSDManager(self.managed_folder,
+                                                 value_map=self.mount.get_value_map(self.managed_folder,
+                                                                                    self.distribution))
+
+        self.daemon = placementDaemon.PlacementDaemon(self.osd_manager, batch_interval_secs=0.2,
+                                                      resync_on_start=False)
+        self.daemon.placement_realizer.completion_watcher.min_poll_interval_secs = 0.01
+        self.daemon.start()
+
+    def tearDown(self):
+        self.daemon.close()
+        self.mount.stop()
+
+    def get_folder_id(self, tile):
+        return os.path.join(self.mount.volume_name, self.path_on_mount_point, tile)
+
+    def get_size_on_disk(self, tile):
+        return folderSizeScanner.scan_folder(os.path.join(self.managed_folder, tile)).get_du_size()
+
+    def test_new_folder(self):
+        # the file is written before the folder has an OSD, so it lands on osd_1
+        relative_path = os.path.join(self.path_on_mount_point, 'stripe_2/tile_2/scene/file_1')
+        self.mount.create_file(relative_path, 'osd_1', size=100)
+        self.daemon.run_once(timeout=5)
+
+        self.assertEqual('osd_2', self.distribution.get_containing_osd(self.get_folder_id('stripe_2/tile_2')).uuid)
+        self.assertIn((self.get_folder_id('stripe_2/tile_2'), 'osd_2'), self.mount.get_rules())
+        self.assertEqual(['osd_2'], self.mount.get_osds(relative_path))
+
+        # new files in an assigned folder are only checked, not moved
+        relative_path = os.path.join(self.path_on_mount_point, 'stripe_2/tile_2/scene/file_2')
+        self.mount.create_file(relative_path, size=50000)
+        self.daemon.run_once(timeout=5)
+        self.assertEqual(['osd_2'], self.mount.get_osds(relative_path))
+        self.assertEqual(self.get_size_on_disk('stripe_2/tile_2'),
+                         self.distribution.get_folder_size(self.get_folder_id('stripe_2/tile_2')))
+
+    def test_removed_folder(self):
+        shutil.rmtree(os.path.join(self.managed_folder, 'stripe_1', 'tile_1'))
+        self.daemon.run_once(timeout=5)
+        self.assertIsNone(self.distribution.get_containing_osd(self.get_folder_id('stripe_1/tile_1')))
+        self.assertFalse(self.daemon.inotify.is_watched(os.path.join(self.managed_folder, 'stripe_1', 'tile_1')))
+
+    def test_resync(self):
+        os.makedirs(os.path.join(self.managed_folder, 'stripe_2', 'tile_2'))
+        # events that have been missed are picked up by a resync
+        self.daemon.process_events = lambda events: None
+        self.daemon.run_once(timeout=1)
+        self.assertIsNone(self.distribution.get_containing_osd(self.get_folder_id('stripe_2/tile_2')))
+
+        self.daemon.resync()
+        self.assertEqual('osd_2', self.distribution.get_containing_osd(self.get_folder_id('stripe_2/tile_2')).uuid)
+        self.assertEqual(self.get_size_on_disk('stripe_1/tile_1'),
+                         self.distribution.get_folder_size(self.get_folder_id('stripe_1/tile_1')))
+
+
+if __name__ == '__main__':
+    unittest.main()
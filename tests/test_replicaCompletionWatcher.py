@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from xtreemfs_client import physicalPlacementRealizer
+from xtreemfs_client import replicaCompletionWatcher
+
+
+class TestReplicaCompletionWatcher(unittest.TestCase):
+    def test_on_complete_is_called_per_file(self):
+        watcher = replicaCompletionWatcher.ReplicaCompletionWatcher(min_poll_interval_secs=0.01,
+                                                                    max_poll_interval_secs=0.01, max_polls=20)
+        files = [physicalPlacementRealizer.FileToMove('/mnt/volume/' + name, 'osd_1', 'osd_2', False, True, 'osd_1')
+                 for name in ['a', 'b', 'c']]
+        handled = []
+
+        async def is_complete(absolute_file_path, target_osd):
+            # b only becomes complete after a has been handled, c never
+            if absolute_file_path.endswith('a'):
+                return True
+            if absolute_file_path.endswith('b'):
+                return '/mnt/volume/a' in handled
+            return False
+
+        async def on_complete(file_to_move):
+            handled.append(file_to_move.absolute_file_path)
+
+        with mock.patch.object(watcher, 'is_complete_async', side_effect=is_complete):
+            loop = asyncio.new_event_loop()
+            try:
+                complete_files, incomplete_files = loop.run_until_complete(watcher.wait_for_files(files, on_complete))
+            finally:
+                loop.close()
+
+        self.assertEqual(['/mnt/volume/a', '/mnt/volume/b'], handled)
+        self.assertEqual(files[0:2], complete_files)
+        self.assertEqual([files[2]], incomplete_files)
+
+
+if __name__ == '__main__':
+    unittest.main()
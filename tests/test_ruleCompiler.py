@@ -0,0 +1,130 @@
+import os
+import unittest
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import assignmentApplier
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import ruleCompiler
+from tests import fake_mount
+
+
+def create_distribution(assignments):
+    distribution = dataDistribution.DataDistribution()
+    distribution.add_osd_list(['osd_1', 'osd_2', 'osd_3'])
+    for folder_id, osd_uuid in assignments.items():
+        distribution.OSDs[osd_uuid].add_folder(folder_id, 1)
+    return distribution
+
+
+class TestRuleCompiler(unittest.TestCase):
+    def test_compile_rules(self):
+        assignments = {'volume/stripe_1/tile_1': 'osd_1', 'volume/stripe_1/tile_2': 'osd_1',
+                       'volume/stripe_1/tile_3': 'osd_2', 'volume/stripe_1/tile_4': 'osd_1',
+                       'volume/stripe_2/tile_1': 'osd_2', 'volume/stripe_2/tile_2': 'osd_3',
+                       'volume/stripe_3/tile_1': 'osd_3', 'volume/stripe_3/tile_2': 'osd_3'}
+        rules = ruleCompiler.compile_rules(create_distribution(assignments))
+        self.assertEqual({'volume/stripe_1': 'osd_1', 'volume/stripe_1/tile_3': 'osd_2',
+                          'volume/stripe_2/tile_1': 'osd_2', 'volume/stripe_2/tile_2': 'osd_3',
+                          'volume/stripe_3': 'osd_3'}, rules)
+
+        # folders without assignment keep the default OSD selection
+        rules = ruleCompiler.compile_rules(create_distribution(assignments),
+                                           unassigned_folders=['volume/stripe_3/tile_3'])
+        self.assertNotIn('volume/stripe_3', rules)
+        self.assertEqual('osd_3', rules['volume/stripe_3/tile_1'])
+
+        rules = ruleCompiler.compile_rules(create_distribution(assignments), min_group_size=3)
+        self.assertEqual('osd_1', rules['volume/stripe_1'])
+        self.assertNotIn('volume/stripe_3', rules)
+
+    def test_parents_with_other_folders_are_not_collapsed(self):
+        assignments = {'volume/a/tile_1': 'osd_1', 'volume/a/tile_2': 'osd_1',
+                       'volume/a/b/tile_1': 'osd_2', 'volume/a/b/tile_2': 'osd_2',
+                       'volume/c': 'osd_1', 'volume/c/tile_1': 'osd_1', 'volume/c/tile_2': 'osd_1'}
+        self.assertEqual({'volume/a/tile_1': 'osd_1', 'volume/a/tile_2': 'osd_1', 'volume/a/b': 'osd_2',
+                          'volume/c': 'osd_1', 'volume/c/tile_1': 'osd_1', 'volume/c/tile_2': 'osd_1'},
+                         ruleCompiler.compile_rules(create_distribution(assignments)))
+
+    def test_diff_rules(self):
+        installed_rules = {'volume/a': 'osd_1', 'volume/a/tile_1': 'osd_2', 'volume/b/tile_1': 'osd_1'}
+        compiled_rules = {'volume/a': 'osd_2', 'volume/b': 'osd_1', 'volume/b/tile_1': 'osd_1'}
+        additions, removals = ruleCompiler.diff_rules(installed_rules, compiled_rules)
+        self.assertEqual(['add volume/a osd_2', 'add volume/b osd_1'], list(map(str, additions)))
+        self.assertEqual(['remove volume/a/tile_1'], list(map(str, removals)))
+        self.assertEqual(([], []), ruleCompiler.diff_rules(compiled_rules, compiled_rules))
+
+
+class TestApplyRules(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2', 'osd_3'))
+        self.mount.start()
+        self.applier = assignmentApplier.AssignmentApplier(self.mount.mount_point, retry_delay_secs=0.01)
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def assert_placement(self, assignments, file_name):
+        # the OSD of a new file in each folder
+        for folder_id, osd_uuid in assignments.items():
+            relative_path = os.path.relpath(folder_id, 'volume')
+            self.assertEqual([osd_uuid], self.mount.get_osds(os.path.join(relative_path, 'scene', file_name)))
+
+    def test_apply_rules(self):
+        assignments = {'volume/stripe_' + str(i) + '/tile_' + str(j): 'osd_' + str(1 + (i + j // 4) % 3)
+                       for i in range(0, 4) for j in range(0, 5)}
+        installed_rules = {}
+        compiled_rules = ruleCompiler.compile_rules(create_distribution(assignments))
+        self.assertEqual([], ruleCompiler.apply_rules(self.applier, installed_rules, compiled_rules))
+        self.assertEqual(compiled_rules, installed_rules)
+        self.assertEqual(compiled_rules, dict(self.mount.get_rules()))
+        self.assertEqual(8, len(installed_rules))
+        self.assert_placement(assignments, 'file_1')
+
+        # moving a single folder only changes its rule
+        num_calls = len(self.mount.get_calls())
+        assignments['volume/stripe_0/tile_0'] = 'osd_3'
+        compiled_rules = ruleCompiler.compile_rules(create_distribution(assignments))
+        self.assertEqual([], ruleCompiler.apply_rules(self.applier, installed_rules, compiled_rules))
+        self.assertEqual(1, len(self.mount.get_calls()) - num_calls)
+        self.assertEqual(compiled_rules, dict(self.mount.get_rules()))
+        self.assert_placement(assignments, 'file_2')
+
+    def test_no_removals_after_failed_additions(self):
+        installed_rules = {'volume/a/tile_1': 'osd_1', 'volume/a/tile_2': 'osd_1'}
+        applier = assignmentApplier.AssignmentApplier(os.path.join(self.mount.mount_point, 'missing'),
+                                                      retry_delay_secs=0.01)
+        failed_operations = ruleCompiler.apply_rules(applier, installed_rules, {'volume/a': 'osd_1'})
+        self.assertEqual(['add volume/a osd_1'], list(map(lambda x: str(x.operation), failed_operations)))
+        self.assertEqual({'volume/a/tile_1': 'osd_1', 'volume/a/tile_2': 'osd_1'}, installed_rules)
+        self.assertEqual(1, len(self.mount.get_calls()))
+
+    def test_osd_manager(self):
+        managed_folder = os.path.join(self.mount.mount_point, 'managed')
+        distribution = create_distribution({})
+        osd_manager = OSDManager.OSDManager(managed_folder, compact_rules=True,
+                                            value_map=self.mount.get_value_map(managed_folder, distribution))
+        folder_ids = []
+        for i in range(0, 6):
+            os.makedirs(os.path.join(managed_folder, 'stripe', 'tile_' + str(i)))
+            folder_ids.append(osd_manager.get_path_on_volume(os.path.join(managed_folder, 'stripe', 'tile_' + str(i))))
+        for folder_id in folder_ids[0:4]:
+            distribution.OSDs['osd_2'].add_folder(folder_id, 1)
+
+        # tile_4 and tile_5 exist, but are not assigned
+        self.assertEqual([], osd_manager.apply_osd_assignments([(x, 'osd_2') for x in folder_ids[0:4]]))
+        self.assertEqual(4, len(self.mount.get_rules()))
+
+        for folder_id in folder_ids[4:]:
+            distribution.OSDs['osd_2'].add_folder(folder_id, 1)
+        self.assertEqual([], osd_manager.apply_osd_assignments([(x, 'osd_2') for x in folder_ids[4:]]))
+        parent = os.path.dirname(folder_ids[0])
+        self.assertEqual([(parent, 'osd_2')], self.mount.get_rules())
+        self.assertEqual({parent: 'osd_2'}, osd_manager.configuration_store.load_rules())
+
+        self.assertEqual([], osd_manager.remove_folders(folder_ids[0:5]))
+        self.assertEqual([(folder_ids[5], 'osd_2')], self.mount.get_rules())
+        self.assertEqual({folder_ids[5]: 'osd_2'}, osd_manager.configuration_store.load_rules())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from xtreemfs_client import treeWalker
+
+
+class TestTreeWalker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = set()
+        for i in range(0, 5):
+            for j in range(0, 4):
+                directory = os.path.join(self.tmp_dir, 'stripe_' + str(i), 'tile_' + str(j), 'scene')
+                os.makedirs(directory)
+                for k in range(0, 3):
+                    file_path = os.path.join(directory, 'file_' + str(k))
+                    with open(file_path, 'w') as f:
+                        f.write('x')
+                    self.files.add(file_path)
+        os.makedirs(os.path.join(self.tmp_dir, 'empty', 'empty'))
+        # symbolic links are reported as files and not followed
+        os.symlink(os.path.join(self.tmp_dir, 'stripe_0'), os.path.join(self.tmp_dir, 'link'))
+        self.files.add(os.path.join(self.tmp_dir, 'link'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_walk_files(self):
+        walker = treeWalker.TreeWalker(parallelism=4)
+        try:
+            for _ in range(0, 2):
+                self.assertEqual(self.files, set(map(lambda x: x.path, walker.walk_files(self.tmp_dir))))
+        finally:
+            walker.close()
+
+    def test_function(self):
+        sizes = dict(treeWalker.walk_files(self.tmp_dir, parallelism=3,
+                                           function=lambda x: (x.path, x.stat(follow_symlinks=False).st_size)))
+        self.assertEqual(self.files, set(sizes.keys()))
+        self.assertEqual(1, sizes[os.path.join(self.tmp_dir, 'stripe_0', 'tile_0', 'scene', 'file_0')])
+
+    def test_stop_walk(self):
+        walker = treeWalker.TreeWalker(parallelism=4, max_queued_results=1)
+        try:
+            files = walker.walk_files(self.tmp_dir)
+            next(files)
+            files.close()
+            # the walker can be used again
+            self.assertEqual(len(self.files), len(list(walker.walk_files(self.tmp_dir))))
+        finally:
+            walker.close()
+
+    def test_exceptions_are_raised(self):
+        def fail(entry):
+            raise ValueError(entry.path)
+
+        with self.assertRaises(ValueError):
+            list(treeWalker.walk_files(self.tmp_dir, parallelism=4, function=fail))
+
+    def test_missing_directory(self):
+        self.assertEqual([], list(treeWalker.walk_files(os.path.join(self.tmp_dir, 'missing'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
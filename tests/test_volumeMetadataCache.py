@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import volumeMetadataCache
+from tests import fake_mount
+
+volume_information = ('volume', [('osd_1', '127.0.0.1'), ('osd_2', '127.0.0.1')], '1000,1004', 'localhost:32638')
+osd_information = {'osd_1': {'usable_space': 10, 'total_space': 20}}
+
+
+class TestVolumeMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'cache', 'volume_metadata.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_put_and_get(self):
+        cache = volumeMetadataCache.VolumeMetadataCache(self.path)
+        self.assertIsNone(cache.get('/mnt/volume'))
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume', volume_information, osd_information))
+
+        metadata = volumeMetadataCache.VolumeMetadataCache(self.path).get('/mnt/volume')
+        self.assertEqual('/mnt/volume', metadata.mount_point)
+        self.assertEqual(volume_information, metadata.volume_information)
+        self.assertEqual(osd_information, metadata.osd_information)
+        self.assertIsNone(cache.get('/mnt'))
+
+    def test_ttl(self):
+        cache = volumeMetadataCache.VolumeMetadataCache(self.path, ttl_secs=60)
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume', volume_information, None, timestamp=1))
+        self.assertIsNone(cache.get('/mnt/volume'))
+        self.assertIsNone(cache.find('/mnt/volume/managed'))
+        # expired entries still tell the mount point
+        self.assertEqual('/mnt/volume', cache.guess_mount_point('/mnt/volume/managed'))
+
+    def test_find(self):
+        cache = volumeMetadataCache.VolumeMetadataCache(self.path)
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume', volume_information, None))
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume/other', volume_information, osd_information))
+        self.assertEqual('/mnt/volume', cache.find('/mnt/volume/managed/stripe').mount_point)
+        self.assertEqual('/mnt/volume/other', cache.find('/mnt/volume/other/managed').mount_point)
+        self.assertIsNone(cache.find('/mnt/volume_2/managed'))
+        self.assertEqual('managed/stripe', volumeMetadataCache.get_path_on_volume(
+            cache.find('/mnt/volume/managed/stripe'), '/mnt/volume/managed/stripe'))
+
+    def test_invalidate(self):
+        cache = volumeMetadataCache.VolumeMetadataCache(self.path)
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume', volume_information, None))
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume_2', volume_information, None))
+        cache.invalidate('/mnt/volume')
+        self.assertIsNone(cache.get('/mnt/volume'))
+        self.assertIsNotNone(cache.get('/mnt/volume_2'))
+        cache.invalidate()
+        self.assertIsNone(cache.get('/mnt/volume_2'))
+
+    def test_corrupt_cache(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{"/mnt/volume": {"timestamp": 1')
+        cache = volumeMetadataCache.VolumeMetadataCache(self.path)
+        self.assertIsNone(cache.find('/mnt/volume/managed'))
+        cache.put(volumeMetadataCache.VolumeMetadata('/mnt/volume', volume_information, None))
+        self.assertIsNotNone(cache.find('/mnt/volume/managed'))
+
+
+class TestOSDManagerStartup(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount(osds=('osd_1', 'osd_2'))
+        self.mount.start()
+        self.managed_folder = os.path.join(self.mount.mount_point, 'managed')
+        os.makedirs(self.managed_folder)
+        self.cache_path = os.path.join(self.mount.tmp_dir, 'volume_metadata.json')
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def create_osd_manager(self, ttl_secs=300, **kwargs):
+        cache = volumeMetadataCache.VolumeMetadataCache(self.cache_path, ttl_secs=ttl_secs)
+        return OSDManager.OSDManager(self.managed_folder, metadata_cache=cache, **kwargs)
+
+    def assert_volume(self, osd_manager):
+        self.assertEqual('managed', osd_manager.path_on_volume)
+        self.assertEqual(self.mount.mount_point, osd_manager.path_to_mount_point)
+        self.assertEqual('volume', osd_manager.volume_name)
+        self.assertEqual('localhost:32638', osd_manager.volume_address)
+        self.assertEqual(['osd_1', 'osd_2'], osd_manager.distribution.get_osd_list())
+
+    def test_cached_metadata(self):
+        self.assert_volume(self.create_osd_manager())
+        self.assertEqual([[self.managed_folder], [self.mount.mount_point]], self.mount.get_calls())
+
+        # no xtfsutil calls while the metadata is cached
+        self.assert_volume(self.create_osd_manager())
+        self.assertEqual(2, len(self.mount.get_calls()))
+
+        self.assert_volume(self.create_osd_manager(refresh_metadata=True))
+        self.assertEqual(4, len(self.mount.get_calls()))
+
+    def test_expired_metadata(self):
+        self.assert_volume(self.create_osd_manager(ttl_secs=0))
+        # the cached mount point is read while xtfsutil determines the mount point of the managed folder
+        self.assert_volume(self.create_osd_manager(ttl_secs=-1))
+        self.assertEqual(4, len(self.mount.get_calls()))
+        self.assertEqual(sorted([[self.managed_folder], [self.mount.mount_point]]),
+                         sorted(self.mount.get_calls()[2:]))
+
+    def test_not_a_volume(self):
+        other_folder = tempfile.mkdtemp()
+        try:
+            cache = volumeMetadataCache.VolumeMetadataCache(self.cache_path)
+            with self.assertRaises(OSDManager.NotAXtreemFSVolume):
+                OSDManager.OSDManager(other_folder, metadata_cache=cache)
+            self.assertIsNone(cache.find(other_folder))
+        finally:
+            shutil.rmtree(other_folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,12 @@ import subprocess
 import unittest
 import os
 import shutil
+from unittest import mock
 
 from xtreemfs_client import OSDManager
 from xtreemfs_client import div_util
 from xtreemfs_client import verify
+from tests import fake_mount
 
 
 class TestDivUtil(unittest.TestCase):
@@ -17,6 +19,38 @@ class TestDivUtil(unittest.TestCase):
         self.assertEqual(div_util.remove_leading_trailing_slashes(s), 'just_one_tile')
 
 
+class TestReplicaLocations(unittest.TestCase):
+    def setUp(self):
+        self.mount = fake_mount.FakeXtreemFSMount()
+        self.mount.start()
+
+    def tearDown(self):
+        self.mount.stop()
+
+    def test_get_osd_uuids_from_xattrs(self):
+        file_path = self.mount.create_file('tiles/tile_1/file_1', 'osd_2')
+        self.assertEqual(['osd_2'], div_util.get_osd_uuids(file_path))
+        self.assertEqual([(['osd_2'], div_util.replication_flag_is_complete)], div_util.get_replicas(file_path))
+        # everything was read in-process
+        self.assertEqual([], self.mount.get_calls())
+
+    def test_get_osd_uuids_xtfsutil_fallback(self):
+        file_path = self.mount.create_file('tiles/tile_1/file_1', 'osd_3')
+        with mock.patch('os.getxattr', side_effect=OSError(95, 'Operation not supported'), create=True):
+            self.assertIsNone(div_util.get_replicas(file_path))
+            self.assertEqual(['osd_3'], div_util.get_osd_uuids(file_path))
+        self.assertEqual([[file_path]], self.mount.get_calls())
+
+    def test_replicas_of_moved_file(self):
+        file_path = self.mount.create_file('tiles/tile_1/file_1', 'osd_1')
+        subprocess.run(["xtfsutil", "-r", "RONLY", file_path])
+        subprocess.run(["xtfsutil", "-aosd_2", "--full", file_path])
+        self.assertEqual(['osd_1', 'osd_2'], div_util.get_osd_uuids(file_path))
+        self.assertEqual(['osd_1', 'osd_2'], div_util.get_osd_uuids_xtfsutil(file_path))
+        subprocess.run(["xtfsutil", "-d", "osd_1", file_path])
+        self.assertEqual(['osd_2'], div_util.get_osd_uuids(file_path))
+
+
 class TestOSDManager(unittest.TestCase):
     def setUp(self):
         # fields for unit testing without an xtreemfs instance
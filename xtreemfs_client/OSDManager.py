@@ -1,5 +1,6 @@
+import concurrent.futures
+import copy
 import os
-import pickle
 import subprocess
 from urllib import request
 import urllib.error
@@ -7,12 +8,22 @@ import shutil
 import time
 import datetime
 import random
+import sys
 
+from xtreemfs_client import assignmentApplier
 from xtreemfs_client import dataDistribution
 from xtreemfs_client import div_util
+from xtreemfs_client import commandExecutor
+from xtreemfs_client import configurationStore
 from xtreemfs_client import folder
 from xtreemfs_client import dirstatuspageparser
+from xtreemfs_client import folderSizeCache
+from xtreemfs_client import folderSizeScanner
+from xtreemfs_client import migrationJournal
+from xtreemfs_client import migrationPlan
 from xtreemfs_client import physicalPlacementRealizer
+from xtreemfs_client import ruleCompiler
+from xtreemfs_client import volumeMetadataCache
 
 '''
 xOSDManager - a python module to manage OSD selection in XtreemFS
@@ -28,73 +39,69 @@ max_processes_delete_replica = 200
 class OSDManager(object):
     # TODO add support for arbitrary subdirectory level
     # (currently depth=2 is hardcoded, which is fine for GeoMultiSens purposes)
-    def __init__(self, path_to_managed_folder, config_file='.das_config', value_map=None, debug=False):
+    def __init__(self, path_to_managed_folder, config_file='.das_config', value_map=None, debug=False,
+                 scan_parallelism=16, use_size_cache=True, assignment_parallelism=32, compact_rules=False,
+                 metadata_cache=None, refresh_metadata=False, capacity_reserve=0.05,
+                 capacity_refresh_interval_secs=300):
 
         self.managed_folder = path_to_managed_folder
         self.config_file = config_file
         self.debug = debug
+        # number of folders whose size is calculated concurrently
+        self.scan_parallelism = scan_parallelism
+        # folder sizes are cached next to the configuration, such that only changed folders are scanned again
+        self.use_size_cache = use_size_cache
+        # number of xtfsutil processes applying filenamePrefix rules concurrently
+        self.assignment_parallelism = assignment_parallelism
+        # collapse the rules of folders sharing a parent and an OSD into a rule for the parent (see sync_rules)
+        self.compact_rules = compact_rules
+        # fraction of the total space of each OSD that is kept free when assigning folders (see
+        # refresh_osd_capacities). None disables the use of the OSD space reported by the DIR.
+        self.capacity_reserve = capacity_reserve
+        # maximum age of the OSD space used for capacities, before it is read again from the DIR
+        self.capacity_refresh_interval_secs = capacity_refresh_interval_secs
+        self.metadata_cache = None
+        self.size_cache_file = config_file + '.sizes'
+        self.journal_file = config_file + '.journal'
+        self.configuration_store = configurationStore.ConfigurationStore(os.path.join(self.managed_folder,
+                                                                                      self.config_file))
+        self.__distribution = None
+        self.__volume_osds = []
+        # whether the capacities of self.distribution have been set by refresh_osd_capacities
+        self.__capacities_derived = False
+        # the filenamePrefix rules installed on the volume, prefix -> osd uuid
+        self.__installed_rules = None
 
         if value_map is None:
-
-            if not div_util.check_for_executable('xtfsutil'):
-                raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
-
-            output_1 = subprocess.run(["xtfsutil", self.managed_folder], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                      universal_newlines=True)
-
-            if output_1.stderr.startswith("xtfsutil failed: Path doesn't point to an entity on an XtreemFS volume!"):
-                raise NotAXtreemFSVolume("The specified folder '" + path_to_managed_folder +
-                                         "' is not part of an XtreemFS volume!")
-
-            if len(output_1.stderr) > 0:
-                raise Exception("xtfsutil produced some error: " + output_1.stderr)
-
-            self.path_on_volume = div_util.remove_leading_trailing_slashes(
-                str(output_1.stdout).split("\n")[0].split()[-1])
-            self.path_to_mount_point = self.managed_folder[0:(len(self.managed_folder) - len(self.path_on_volume) - 1)]
-
-            output_2 = subprocess.run(["xtfsutil", self.path_to_mount_point],
-                                      stdout=subprocess.PIPE, universal_newlines=True)
-
-            self.volume_information = div_util.extract_volume_information(output_2.stdout)
+            # the volume metadata is cached, such that, e.g., printing the distribution does not need to call
+            # xtfsutil and fetch the DIR status page
+            if metadata_cache is None:
+                metadata_cache = volumeMetadataCache.VolumeMetadataCache()
+            self.metadata_cache = metadata_cache
+            metadata = None
+            if not refresh_metadata:
+                metadata = metadata_cache.find(self.managed_folder)
+            if metadata is None:
+                metadata = self.__probe_volume_metadata(metadata_cache.guess_mount_point(self.managed_folder))
+                metadata_cache.put(metadata)
+            elif self.debug:
+                print("using volume metadata cached " + str(round(metadata.get_age())) + " sec. ago.")
+
+            self.path_on_volume = volumeMetadataCache.get_path_on_volume(metadata, self.managed_folder)
+            self.path_to_mount_point = metadata.mount_point
+
+            self.volume_information = metadata.volume_information
             self.volume_name = self.volume_information[0]
             osd_list = list(map(lambda x: x[0], self.volume_information[1]))
             self.osd_selection_policy = self.volume_information[2]
             self.volume_address = self.volume_information[3]
 
-            self.distribution = None
-            if not self.__read_configuration():
-                self.distribution = dataDistribution.DataDistribution()
-
-            self.distribution.add_osd_list(osd_list)
-
-            self.osd_information = None
-
-            try:
-                answer = request.urlopen(div_util.get_http_address(self.volume_address))
-                html_data = answer.read().decode('UTF-8')
-
-                parser = dirstatuspageparser.DIRStatusPageParser()
-                parser.feed(html_data)
-
-                # filter out data sets without last update time or wrong service type
-                filtered_data_sets = list(filter(lambda x: int(x['last updated'].split()[0]) != 0, parser.dataSets))
-                filtered_data_sets = list(filter(lambda x: x['type'] == 'SERVICE_TYPE_OSD', filtered_data_sets))
+            # the distribution is read from the configuration store on first use
+            self.__distribution = None
+            self.__volume_osds = osd_list
 
-                self.osd_information = {}
-
-                for data_set in filtered_data_sets:
-                    uuid = data_set['uuid']
-                    current_osd = {}
-                    current_osd['usable_space'] = int(data_set['usable'].split()[0])
-                    current_osd['total_space'] = int(data_set['total'].split()[0])
-
-                    self.osd_information[uuid] = current_osd
-
-            except urllib.error.URLError as error:
-                print("osd information could not be fetched! Probably the http status page could not be found at:",
-                      div_util.get_http_address(self.volume_address))
-                print(error)
+            self.osd_information = metadata.osd_information
+            self.osd_information_timestamp = metadata.timestamp
         else:
             try:
                 self.path_on_volume = value_map['path_on_volume']
@@ -104,58 +111,256 @@ class OSDManager(object):
                 self.distribution = value_map['data_distribution']
                 self.volume_address = value_map['volume_address']
                 self.osd_information = value_map['osd_information']
+                self.osd_information_timestamp = time.time()
             except KeyError as error:
                 print('key not found:', error)
                 print('leaving in OSDManager field empty!')
 
+    def __probe_volume_metadata(self, mount_point_guess=None):
+        """
+        read the metadata of the volume containing the managed folder, with xtfsutil and from the DIR status page.
+        the volume mounted at mount_point_guess (if given) is read while xtfsutil determines the actual mount point
+        of the managed folder.
+        """
+        if not div_util.check_for_executable('xtfsutil'):
+            raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            guessed_metadata = None
+            if mount_point_guess is not None:
+                guessed_metadata = executor.submit(self.__probe_mount_point, mount_point_guess)
+
+            output_1 = subprocess.run(["xtfsutil", self.managed_folder], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                      universal_newlines=True)
+
+            if output_1.stderr.startswith("xtfsutil failed: Path doesn't point to an entity on an XtreemFS volume!"):
+                raise NotAXtreemFSVolume("The specified folder '" + self.managed_folder +
+                                         "' is not part of an XtreemFS volume!")
+
+            if len(output_1.stderr) > 0:
+                raise Exception("xtfsutil produced some error: " + output_1.stderr)
+
+            path_on_volume = div_util.remove_leading_trailing_slashes(str(output_1.stdout).split("\n")[0].split()[-1])
+            mount_point = self.managed_folder[0:(len(self.managed_folder) - len(path_on_volume) - 1)]
+
+            if guessed_metadata is not None and mount_point == mount_point_guess:
+                metadata = guessed_metadata.result()
+                if metadata is not None:
+                    return metadata
+        metadata = self.__probe_mount_point(mount_point)
+        if metadata is None:
+            raise Exception("xtfsutil could not read the volume mounted at " + mount_point)
+        return metadata
+
+    def __probe_mount_point(self, mount_point):
+        """
+        read the volume information of the volume mounted at mount_point and the space of its OSDs. returns None if
+        mount_point is not the mount point of an XtreemFS volume.
+        """
+        output_2 = subprocess.run(["xtfsutil", mount_point], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  universal_newlines=True)
+        if output_2.returncode != 0 or len(output_2.stderr) > 0:
+            return None
+        volume_information = div_util.extract_volume_information(output_2.stdout)
+        if volume_information[3] == "":
+            return None
+        return volumeMetadataCache.VolumeMetadata(mount_point, volume_information,
+                                                  read_osd_information(volume_information[3]))
+
+    def read_osd_information(self):
+        """
+        read the space of the OSDs from the DIR status page again (see read_osd_information), and update the volume
+        metadata cache. keeps the previous information if the status page cannot be read.
+        """
+        osd_information = read_osd_information(self.volume_address)
+        if osd_information is None:
+            return self.osd_information
+        self.osd_information = osd_information
+        self.osd_information_timestamp = time.time()
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(volumeMetadataCache.VolumeMetadata(self.path_to_mount_point,
+                                                                       self.volume_information, osd_information))
+        return osd_information
+
+    def get_osd_capacities(self, distribution=None):
+        """
+        the capacities of the OSDs of the distribution (by default, self.distribution) for assigned folders, given
+        the space reported by the DIR: the size of the folders assigned to an OSD plus its usable space, minus
+        capacity_reserve times its total space. hence, this assumes that the folders are located on their assigned
+        OSDs. the capacity is never lower than the size of the assigned folders, and OSDs unknown to the DIR keep
+        their capacity. like folder sizes, capacities are given in KiB.
+        """
+        if distribution is None:
+            distribution = self.distribution
+        osd_capacities = {}
+        for one_osd in distribution.OSDs.values():
+            information = None
+            if self.osd_information is not None:
+                information = self.osd_information.get(one_osd.uuid)
+            if information is None:
+                osd_capacities[one_osd.uuid] = one_osd.capacity
+                continue
+            reserve = int(self.capacity_reserve * information['total_space'])
+            osd_capacities[one_osd.uuid] = int(one_osd.total_folder_size) + \
+                max(0, information['usable_space'] - reserve) // 1024
+        return osd_capacities
+
+    def refresh_osd_capacities(self, distribution=None):
+        """
+        set the capacities of the OSDs of the distribution (by default, self.distribution) according to
+        get_osd_capacities, reading the space of the OSDs from the DIR again if it is older than
+        capacity_refresh_interval_secs. does nothing if capacity_reserve is None.
+
+        capacities are refreshed by the operations that assign new folders to OSDs based on their free space
+        (create_empty_folders, copy_folders, update and thereby rebalance_existing_assignment, plan_rebalance), so
+        a placementDaemon refreshes them at least every resync interval. operations that place folders regardless
+        of their free space (create_distribution_from_existing_files, execute_plan, move_folder_to_osd) clear them.
+        capacities are not persisted.
+        """
+        if self.capacity_reserve is None:
+            return
+        if distribution is None:
+            distribution = self.distribution
+        if time.time() - self.osd_information_timestamp > self.capacity_refresh_interval_secs:
+            self.read_osd_information()
+            # also after a failure, such that an unreachable DIR is not contacted in every operation
+            self.osd_information_timestamp = time.time()
+        if self.osd_information is None:
+            return
+        distribution.set_osd_capacities(self.get_osd_capacities(distribution))
+        if distribution is self.distribution:
+            self.__capacities_derived = True
+        if self.debug:
+            print("osd capacities: " + str(dict((one_osd.uuid, one_osd.capacity)
+                                                for one_osd in distribution.OSDs.values())))
+
+    def __clear_osd_capacities(self, distribution=None):
+        """
+        remove the capacities of the OSDs, e.g., before updating folder sizes, which might exceed them.
+        """
+        if self.capacity_reserve is None:
+            return
+        if distribution is None:
+            distribution = self.distribution
+        distribution.set_osd_capacities(dict((one_osd.uuid, sys.maxsize) for one_osd in distribution.OSDs.values()))
+        if distribution is self.distribution:
+            self.__capacities_derived = False
+
+    @property
+    def distribution(self):
+        if self.__distribution is None:
+            if not self.__read_configuration():
+                self.__distribution = dataDistribution.DataDistribution()
+            elif self.__installed_rules is None:
+                self.__installed_rules = self.configuration_store.load_rules()
+                if self.__installed_rules is None:
+                    # configurations written by older versions have one rule per folder
+                    self.__installed_rules = dict(self.__distribution.folder_index)
+            self.__distribution.add_osd_list(self.__volume_osds)
+        return self.__distribution
+
+    @distribution.setter
+    def distribution(self, distribution):
+        self.__distribution = distribution
+
+    @property
+    def installed_rules(self):
+        """
+        the filenamePrefix rules installed on the volume by this OSDManager, as dictionary prefix -> osd uuid.
+        """
+        if self.__installed_rules is None:
+            self.distribution
+        if self.__installed_rules is None:
+            self.__installed_rules = self.configuration_store.load_rules() or {}
+        return self.__installed_rules
+
+    def __record_rules(self, changed_prefixes=None):
+        self.configuration_store.save_rules(self.installed_rules, changed_prefixes)
+
     def __read_configuration(self):
-        assert self.distribution is None
-        path_to_config = os.path.join(self.managed_folder, self.config_file)
+        assert self.__distribution is None
         try:
-            f = open(path_to_config, "rb")
-            self.distribution = pickle.load(f)
-            return True
+            self.__distribution = self.configuration_store.load()
         except IOError:
             return False
+        return self.__distribution is not None
 
     def __write_configuration(self):
-        path_to_config = os.path.join(self.managed_folder, self.config_file)
-        f = open(path_to_config, "wb")
-        pickle.dump(self.distribution, f)
+        # capacities derived from the space reported by the DIR become stale as soon as data is written, so they
+        # are not persisted (see refresh_osd_capacities)
+        self.configuration_store.save(self.distribution, save_capacities=not self.__capacities_derived)
 
-    def create_distribution_from_existing_files(self,
-                                                fix_layout_internally=True, max_files_in_progress=10000,
-                                                apply_layout=True,
-                                                environment='LOCAL',
-                                                movement_strategy='osd_balanced'):
+    def save_configuration(self):
         """
-        create a good data distribution out of data already present in the file system.
-        the created data distribution will then be transferred to the physical layer,
-        i.e., all files will be moved to their corresponding OSD,
-        using XtreemFS' read-only replication strategy.
+        persist the data distribution, e.g., after folders have been removed.
         """
-        start_time = time.time()
+        self.__write_configuration()
 
-        if self.debug:
-            print("creating distribution from existing files. osd manager: " + str(self))
+    def __get_folder_sizes(self, folders, all_folders=False, rescan=False, update_cache=True):
+        """
+        get the FolderSizes of the given folders (absolute paths), using the size cache if enabled.
+        if all_folders is True, folders that are not given are removed from the size cache.
+        if rescan is True, the given folders are scanned even if their cached size is up to date.
+        if update_cache is False, the size cache is only read, not pruned or saved.
+        """
+        if not self.use_size_cache:
+            return folderSizeScanner.scan_folders(folders, self.scan_parallelism)
+
+        size_cache = folderSizeCache.FolderSizeCache(os.path.join(self.managed_folder, self.size_cache_file),
+                                                     self.managed_folder)
+        size_cache.load()
+        if rescan:
+            for one_folder in folders:
+                size_cache.invalidate(one_folder)
+        folder_sizes = size_cache.get_folder_sizes(folders, self.scan_parallelism)
+        if update_cache:
+            if all_folders:
+                size_cache.retain(folders)
+            size_cache.save()
 
-        if not div_util.check_for_executable('du'):
-            raise ExecutableNotFoundException("No du found. Please make sure it is contained in your PATH.")
+        if self.debug:
+            print("folder sizes: " + str(size_cache.num_hits) + " taken from the cache, "
+                  + str(size_cache.num_misses) + " calculated")
+        return folder_sizes
 
+    def __get_existing_folders(self, update_cache=True):
+        """
+        Folder objects for all depth 2 subdirectories of the managed folder, with their size on disk.
+        """
         existing_folders = self.get_depth_2_subdirectories()
+        folder_sizes = self.__get_folder_sizes(existing_folders, all_folders=True, update_cache=update_cache)
         new_folders = []
         for one_folder in existing_folders:
-            du = subprocess.run(["du", "-s", one_folder], stdout=subprocess.PIPE,
-                                universal_newlines=True)
-            folder_size = int(du.stdout.split()[0])
+            folder_size = folder_sizes[one_folder].get_du_size()
             if folder_size == 0:
                 folder_size = 1
             new_folder = folder.Folder(self.get_path_on_volume(one_folder),
                                        folder_size,
                                        None)
             new_folders.append(new_folder)
+        return new_folders
+
+    def create_distribution_from_existing_files(self,
+                                                fix_layout_internally=True, max_files_in_progress=10000,
+                                                apply_layout=True,
+                                                environment='LOCAL',
+                                                movement_strategy='osd_balanced',
+                                                osd_rate_limits=None, default_rate_limit=None, fill_threshold=None,
+                                                folder_priorities=None, folder_placed_callback=None, scan_window=None):
+        """
+        create a good data distribution out of data already present in the file system.
+        the created data distribution will then be transferred to the physical layer,
+        i.e., all files will be moved to their corresponding OSD,
+        using XtreemFS' read-only replication strategy.
+        """
+        start_time = time.time()
+
+        if self.debug:
+            print("creating distribution from existing files. osd manager: " + str(self))
 
-        new_assignments = self.distribution.add_folders(new_folders, debug=self.debug)
+        # the files are not on their assigned OSDs yet, so the free space of the OSDs does not limit the assignment
+        self.__clear_osd_capacities()
+        new_assignments = self.distribution.add_folders(self.__get_existing_folders(), debug=self.debug)
 
         if apply_layout:
             self.apply_osd_assignments(new_assignments)
@@ -175,9 +380,13 @@ class OSDManager(object):
         start_time = time.time()
 
         if fix_layout_internally:
-            placement_realizer = \
-                physicalPlacementRealizer.PhysicalPlacementRealizer(self, debug=self.debug,
-                                                                    max_files_in_progress=max_files_in_progress)
+            placement_realizer = self.__create_placement_realizer(max_files_in_progress=max_files_in_progress,
+                                                                  osd_rate_limits=osd_rate_limits,
+                                                                  default_rate_limit=default_rate_limit,
+                                                                  fill_threshold=fill_threshold,
+                                                                  folder_priorities=folder_priorities,
+                                                                  folder_placed_callback=folder_placed_callback,
+                                                                  scan_window=scan_window)
             placement_realizer.realize_placement(strategy=movement_strategy)
         else:
             if environment == 'SLURM':
@@ -205,7 +414,9 @@ class OSDManager(object):
                                       rebalance_algorithm='lpt',
                                       fix_layout_internally=True, max_files_in_progress=10000,
                                       environment='LOCAL',
-                                      movement_strategy='osd_balanced'):
+                                      movement_strategy='osd_balanced',
+                                      osd_rate_limits=None, default_rate_limit=None, fill_threshold=None,
+                                      folder_priorities=None, folder_placed_callback=None, scan_window=None):
         if self.debug:
             print("rebalancing existing distribution... osd manager: \n" + str(self))
 
@@ -217,14 +428,7 @@ class OSDManager(object):
 
         start_time = time.time()
 
-        if rebalance_algorithm is 'rebalance_one':
-            movements = self.distribution.rebalance_one_folder()
-        elif rebalance_algorithm is 'two_step_opt':
-            movements = self.distribution.rebalance_two_steps_optimal_matching()
-        elif rebalance_algorithm is 'two_step_rnd':
-            movements = self.distribution.rebalance_two_steps_random_matching()
-        else:
-            movements = self.distribution.rebalance_lpt()
+        movements = rebalance(self.distribution, rebalance_algorithm)
 
         if self.debug:
             rebalance_time = round(time.time() - start_time)
@@ -249,12 +453,15 @@ class OSDManager(object):
         start_time = time.time()
 
         if fix_layout_internally:
-            # TODO use movements to make realize_placement more efficient
-            # TODO (for the first calculation of files that need to be moved)
-            placement_realizer = \
-                physicalPlacementRealizer.PhysicalPlacementRealizer(self, debug=self.debug,
-                                                                    max_files_in_progress=max_files_in_progress)
-            placement_realizer.realize_placement(strategy=movement_strategy)
+            # only the files of moved folders need to be checked
+            placement_realizer = self.__create_placement_realizer(max_files_in_progress=max_files_in_progress,
+                                                                  osd_rate_limits=osd_rate_limits,
+                                                                  default_rate_limit=default_rate_limit,
+                                                                  fill_threshold=fill_threshold,
+                                                                  folder_priorities=folder_priorities,
+                                                                  folder_placed_callback=folder_placed_callback,
+                                                                  scan_window=scan_window)
+            placement_realizer.realize_placement(strategy=movement_strategy, folder_ids=movements)
 
         elif environment == 'SLURM':
             target_balanced = 1  # 0 is origin balanced, 1 is target balanced
@@ -282,6 +489,126 @@ class OSDManager(object):
             total_time = round(time.time() - start_time)
             print("fixed physical layout of existing files in secs: " + str(total_time))
 
+    def plan_distribution_from_existing_files(self):
+        """
+        calculate, without changing anything, the migration create_distribution_from_existing_files would do with
+        fix_layout_internally=True: the new folder assignments and the files that would be moved.
+        returns a migrationPlan.MigrationPlan.
+        """
+        planned_distribution = copy.deepcopy(self.distribution)
+        self.__clear_osd_capacities(planned_distribution)
+        new_assignments = planned_distribution.add_folders(self.__get_existing_folders(update_cache=False),
+                                                           debug=self.debug)
+        return self.__create_plan(planned_distribution, new_assignments, None)
+
+    def plan_rebalance(self, rebalance_algorithm='lpt'):
+        """
+        calculate, without changing anything, the migration rebalance_existing_assignment would do with
+        fix_layout_internally=True: the updated and rebalanced folder assignments and the files that would be moved.
+        returns a migrationPlan.MigrationPlan.
+        """
+        planned_distribution = copy.deepcopy(self.distribution)
+        assigned_folders = list(filter(lambda x: planned_distribution.get_containing_osd(
+            self.get_path_on_volume(x)) is not None, self.get_depth_2_subdirectories()))
+        folder_sizes = self.__get_folder_sizes(assigned_folders, update_cache=False)
+        self.__clear_osd_capacities(planned_distribution)
+        for assigned_folder in assigned_folders:
+            planned_distribution.update_folder(self.get_path_on_volume(assigned_folder),
+                                               folder_sizes[assigned_folder].get_du_size())
+        self.refresh_osd_capacities(planned_distribution)
+
+        movements = rebalance(planned_distribution, rebalance_algorithm)
+        new_assignments = list(map(lambda item: (item[0], item[1][1]), list(movements.items())))
+        return self.__create_plan(planned_distribution, new_assignments, list(movements.keys()))
+
+    def __create_plan(self, planned_distribution, new_assignments, folder_ids):
+        placement_realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(self, debug=self.debug,
+                                                                                 distribution=planned_distribution)
+        placement_realizer.calculate_files_to_be_moved(folder_ids)
+        assignments = [(folder_id, osd_uuid, planned_distribution.get_folder_size(folder_id))
+                       for folder_id, osd_uuid in new_assignments]
+        osd_bandwidths = dict((osd_uuid, one_osd.bandwidth) for osd_uuid, one_osd in planned_distribution.OSDs.items())
+        return migrationPlan.MigrationPlan(placement_realizer.get_list_of_all_files_to_be_moved(), assignments,
+                                           folder_ids, osd_bandwidths)
+
+    def execute_plan(self, plan, max_files_in_progress=10000, movement_strategy='osd_balanced',
+                     osd_rate_limits=None, default_rate_limit=None, fill_threshold=None,
+                     folder_priorities=None, folder_placed_callback=None, scan_window=None):
+        """
+        execute a migrationPlan.MigrationPlan as it is: apply its folder assignments and move its files.
+        """
+        start_time = time.time()
+        # the plan has been checked against the capacities when it was created
+        self.__clear_osd_capacities()
+        for folder_id, osd_uuid, folder_size in plan.assignments:
+            if self.distribution.get_containing_osd(folder_id) is None:
+                self.distribution.OSDs[osd_uuid].add_folder(folder_id, folder_size)
+            else:
+                self.distribution.assign_new_osd(folder_id, osd_uuid)
+        self.apply_osd_assignments(list(map(lambda x: (x[0], x[1]), plan.assignments)))
+        self.__write_configuration()
+
+        placement_realizer = self.__create_placement_realizer(max_files_in_progress=max_files_in_progress,
+                                                              osd_rate_limits=osd_rate_limits,
+                                                              default_rate_limit=default_rate_limit,
+                                                              fill_threshold=fill_threshold,
+                                                              folder_priorities=folder_priorities,
+                                                              folder_placed_callback=folder_placed_callback,
+                                                              scan_window=scan_window)
+        placement_realizer.realize_planned_moves(plan.files_to_move, strategy=movement_strategy,
+                                                 folder_ids=plan.folder_ids)
+
+        if self.debug:
+            total_time = round(time.time() - start_time)
+            print("executed migration plan in secs: " + str(total_time))
+
+    def __create_placement_realizer(self, journal=None, **movement_args):
+        """
+        the PhysicalPlacementRealizer for an internal migration, recording its progress in the migration journal.
+        movement_args are passed to the PhysicalPlacementRealizer.
+        """
+        if journal is None:
+            journal = self.get_migration_journal()
+        return physicalPlacementRealizer.PhysicalPlacementRealizer(self, debug=self.debug, journal=journal,
+                                                                   **movement_args)
+
+    def get_migration_journal(self):
+        """
+        the journal recording the progress of internal migrations (see PhysicalPlacementRealizer).
+        """
+        return migrationJournal.MigrationJournal(os.path.join(self.managed_folder, self.journal_file))
+
+    def resume_placement(self, max_files_in_progress=10000, movement_strategy=None,
+                         osd_rate_limits=None, default_rate_limit=None, fill_threshold=None,
+                         folder_priorities=None, folder_placed_callback=None, scan_window=None):
+        """
+        resume the internal migration that has been interrupted, e.g., by a crash of the machine running it.
+        only the folders that have not been checked yet and the files that have not been moved yet are handled.
+        if movement_strategy is None, the strategy of the interrupted migration is used.
+        """
+        journal = self.get_migration_journal()
+        if not journal.has_unfinished_migration():
+            print("there is no unfinished migration to resume.")
+            return
+        if movement_strategy is None:
+            movement_strategy = journal.get_strategy()
+
+        start_time = time.time()
+        placement_realizer = self.__create_placement_realizer(journal=journal,
+                                                              max_files_in_progress=max_files_in_progress,
+                                                              osd_rate_limits=osd_rate_limits,
+                                                              default_rate_limit=default_rate_limit,
+                                                              fill_threshold=fill_threshold,
+                                                              folder_priorities=folder_priorities,
+                                                              folder_placed_callback=folder_placed_callback,
+                                                              scan_window=scan_window)
+        placement_realizer.realize_placement(strategy=movement_strategy, resume=True)
+        journal.close()
+
+        if self.debug:
+            total_time = round(time.time() - start_time)
+            print("resumed migration finished in secs: " + str(total_time))
+
     def fix_physical_layout_externally(self):
         """
         fixes the physical layout, such that it matches the data distribution described in self.distribution.
@@ -308,6 +635,7 @@ class OSDManager(object):
             new_tile = folder.Folder(self.get_path_on_volume(input_folder), average_size, None)
             tiles.append(new_tile)
 
+        self.refresh_osd_capacities()
         new_tiles = self.distribution.add_folders(tiles)
 
         self.apply_osd_assignments(new_tiles)
@@ -333,9 +661,6 @@ class OSDManager(object):
             print("execute_copy: " + str(execute_copy))
             print("random_osd_assignemnt: " + str(random_osd_assignment))
 
-        if not div_util.check_for_executable('du'):
-            raise ExecutableNotFoundException("No du found. Please make sure it is contained in your PATH.")
-
         if remote_source is not None:
             if not div_util.check_for_executable('sshfs'):
                 raise ExecutableNotFoundException("No sshfs found. Please make sure it is contained in your PATH.")
@@ -349,6 +674,10 @@ class OSDManager(object):
 
         new_folders = []
 
+        local_folder_sizes = {}
+        if remote_source is None:
+            local_folder_sizes = folderSizeScanner.scan_folders(folders, self.scan_parallelism)
+
         for input_folder in folders:
             last_2_path_elements = os.path.join(os.path.split(os.path.split(input_folder)[0])[1],
                                                 os.path.split(input_folder)[1])
@@ -356,15 +685,11 @@ class OSDManager(object):
                 mount_point = os.path.join(sshfs_mount_dir, last_2_path_elements)
                 os.makedirs(mount_point, exist_ok=True)
                 subprocess.run(["sshfs", remote_source + ":" + input_folder, mount_point])
-                du = subprocess.run(["du", "-s", mount_point], stdout=subprocess.PIPE,
-                                    universal_newlines=True)
+                folder_size = folderSizeScanner.scan_folder(mount_point).get_du_size()
                 subprocess.run(["fusermount", "-uz", mount_point])
                 shutil.rmtree(mount_point)
-                folder_size = int(du.stdout.split()[0])
             else:
-                du = subprocess.run(["du", "-s", input_folder], stdout=subprocess.PIPE,
-                                    universal_newlines=True)
-                folder_size = int(du.stdout.split()[0])
+                folder_size = local_folder_sizes[input_folder].get_du_size()
 
             # as the folder_id is generated from the copy source, we cannot call get_path_on_volume to get the foler_id
             new_folder = folder.Folder(os.path.join(self.volume_name, self.path_on_volume, last_2_path_elements),
@@ -380,6 +705,7 @@ class OSDManager(object):
         if self.debug:
             print("OSDManager: random_osd_assignment: " + str(random_osd_assignment))
 
+        self.refresh_osd_capacities()
         new_assignments = self.distribution.add_folders(new_folders, random_osd_assignment=random_osd_assignment,
                                                         random_seed=random_seed)
         if apply_layout:
@@ -463,16 +789,9 @@ class OSDManager(object):
         if not div_util.check_for_executable('xtfsutil'):
             raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
         # step 1: add folder to new OSD, update data distribution and xtreemfs configuration
+        self.__clear_osd_capacities()
         self.distribution.assign_new_osd(folder_id, new_osd_id)
-        if self.debug:
-            subprocess.run(["xtfsutil",
-                            "--set-pattr", "1004.filenamePrefix", "--value",
-                            "add " + folder_id + " " + new_osd_id + "", self.path_to_mount_point])
-        else:
-            subprocess.run(["xtfsutil",
-                            "--set-pattr", "1004.filenamePrefix", "--value",
-                            "add " + folder_id + " " + new_osd_id + "", self.path_to_mount_point],
-                           stdout=subprocess.PIPE, universal_newlines=True)
+        self.__add_rules([(folder_id, new_osd_id)])
 
         # step 2: one by one, move files to tmp_location and then back to the folder, which means that they should now
         # be located onto the new OSD.
@@ -497,27 +816,51 @@ class OSDManager(object):
         """
         removes a folder from the distribution. this does NOT delete the folder from the file system.
         """
-        containing_osd = self.distribution.get_containing_osd(folder_id)
-        if containing_osd is not None:
-            if not div_util.check_for_executable('xtfsutil'):
-                raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
+        return self.remove_folders([folder_id])
 
-            containing_osd.remove_folder(folder_id)
-            if self.debug:
-                subprocess.run(["xtfsutil",
-                                "--set-pattr", "1004.filenamePrefix", "--value",
-                                "remove " + folder_id + "", self.path_to_mount_point])
-            else:
-                subprocess.run(["xtfsutil",
-                                "--set-pattr", "1004.filenamePrefix", "--value",
-                                "remove " + folder_id + "", self.path_to_mount_point],
-                               stdout=subprocess.PIPE, universal_newlines=True)
+    def remove_folders(self, folder_ids):
+        """
+        removes the given folders from the distribution, removing their filenamePrefix rules concurrently (or
+        updating the compacted rules, see sync_rules).
+        this does NOT delete the folders from the file system.
+        returns the list of assignmentApplier.FailedOperations.
+        """
+        removed_folders = []
+        for folder_id in folder_ids:
+            containing_osd = self.distribution.get_containing_osd(folder_id)
+            if containing_osd is not None:
+                removed_folders.append(folder_id)
+        if len(removed_folders) == 0:
+            return []
 
-    def update(self, arg_folders=None):
+        if not div_util.check_for_executable('xtfsutil'):
+            raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
+        for folder_id in removed_folders:
+            self.distribution.get_containing_osd(folder_id).remove_folder(folder_id)
+        if self.compact_rules:
+            return self.sync_rules()
+
+        removed_rules = [folder_id for folder_id in removed_folders if folder_id in self.installed_rules]
+        failed_operations = self.get_assignment_applier().remove_rules(removed_rules)
+        failed_folders = set(map(lambda x: x.operation.folder_id, failed_operations))
+        for folder_id in removed_rules:
+            if folder_id not in failed_folders:
+                del self.installed_rules[folder_id]
+        self.__record_rules(removed_rules)
+        return failed_operations
+
+    def get_assignment_applier(self):
+        return assignmentApplier.AssignmentApplier(self.path_to_mount_point,
+                                                   max_concurrency=self.assignment_parallelism, debug=self.debug)
+
+    def update(self, arg_folders=None, rescan=False):
         """
         update the given (by absolute path) folders, such that the values held by self.dataDistribution
         matches their size on disk.
         if no argument is given, all folders are updated.
+        if the size cache is enabled, only folders with changed directory modification times are scanned again,
+        unless rescan is True.
+        afterwards, the OSD capacities are refreshed (see refresh_osd_capacities).
         """
         if arg_folders is not None:
             for folder_for_update in arg_folders:
@@ -532,17 +875,17 @@ class OSDManager(object):
         if arg_folders is None:
             folders = self.get_depth_2_subdirectories()
 
+        if self.debug:
+            print("calculating the size of " + str(len(folders)) + " folders...")
+        folder_sizes = self.__get_folder_sizes(folders, all_folders=arg_folders is None, rescan=rescan)
         for folder_for_update in folders:
             folder_id = self.get_path_on_volume(folder_for_update)
-            command = ["du", "-s", folder_for_update]
-            if self.debug:
-                print("executing: " + str(command))
-            du = subprocess.run(command, stdout=subprocess.PIPE, universal_newlines=True)
-            folder_disk_size = int(du.stdout.split()[0])
-            folder_size_updates[folder_id] = folder_disk_size
+            folder_size_updates[folder_id] = folder_sizes[folder_for_update].get_du_size()
 
+        self.__clear_osd_capacities()
         for folder_for_update, size in folder_size_updates.items():
             self.distribution.update_folder(folder_for_update, size)
+        self.refresh_osd_capacities()
 
         self.__write_configuration()
 
@@ -554,29 +897,68 @@ class OSDManager(object):
         apply the given assignments to the XtreemFS volume, using xtfsutil.
         the assignments are given as a list containing tuples (tile_id, osd),
         where tile_id is given by applying path_on_volume() onto the absolute path of the folder.
+        the rules are added concurrently by an assignmentApplier.AssignmentApplier, transient errors are retried.
+        if compact_rules is set, the assignments must already be part of the distribution, and the compacted rules
+        are updated instead (see sync_rules).
+        returns the list of assignmentApplier.FailedOperations.
         """
         if not div_util.check_for_executable('xtfsutil'):
             raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
 
-        if self.osd_selection_policy is not "1000,1004":
-            if self.debug:
-                subprocess.run(["xtfsutil", "--set-osp", "prefix", self.path_to_mount_point])
-            else:
-                subprocess.run(["xtfsutil", "--set-osp", "prefix", self.path_to_mount_point],
-                               stdout=subprocess.PIPE, universal_newlines=True)
+        if self.compact_rules:
+            return self.sync_rules()
+        self.set_prefix_policy()
+        return self.__add_rules(assignments)
 
-        for new_tile in assignments:
+    def set_prefix_policy(self):
+        """
+        make the volume select OSDs by filenamePrefix rules, if it does not already.
+        """
+        if self.osd_selection_policy != "1000,1004":
             if self.debug:
-                subprocess.run(["xtfsutil",
-                                "--set-pattr", "1004.filenamePrefix", "--value",
-                                "add " + new_tile[0] + " " + new_tile[1] + "",
-                                self.path_to_mount_point])
+                result = subprocess.run(["xtfsutil", "--set-osp", "prefix", self.path_to_mount_point])
             else:
-                subprocess.run(["xtfsutil",
-                                "--set-pattr", "1004.filenamePrefix", "--value",
-                                "add " + new_tile[0] + " " + new_tile[1] + "",
-                                self.path_to_mount_point],
-                               stdout=subprocess.PIPE, universal_newlines=True)
+                result = subprocess.run(["xtfsutil", "--set-osp", "prefix", self.path_to_mount_point],
+                                        stdout=subprocess.PIPE, universal_newlines=True)
+            if result.returncode == 0:
+                self.osd_selection_policy = "1000,1004"
+
+    def __add_rules(self, assignments):
+        if self.compact_rules:
+            return self.sync_rules()
+
+        assignments = list(assignments)
+        failed_operations = self.get_assignment_applier().add_rules(assignments)
+        failed_folders = set(map(lambda x: x.operation.folder_id, failed_operations))
+        for folder_id, osd_uuid in assignments:
+            if folder_id not in failed_folders:
+                self.installed_rules[folder_id] = osd_uuid
+        self.__record_rules(list(map(lambda x: x[0], assignments)))
+        return failed_operations
+
+    def sync_rules(self):
+        """
+        compile the assignments of the distribution into compacted filenamePrefix rules (see
+        ruleCompiler.compile_rules), and apply only the difference to the rules installed on the volume.
+        existing depth 2 subdirectories without assignment are never covered by the rule of their parent.
+        returns the list of assignmentApplier.FailedOperations.
+        """
+        if not div_util.check_for_executable('xtfsutil'):
+            raise ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your PATH.")
+
+        existing_folders = map(self.get_path_on_volume, self.get_depth_2_subdirectories())
+        unassigned_folders = [folder_id for folder_id in existing_folders
+                              if self.distribution.get_containing_osd(folder_id) is None]
+        compiled_rules = ruleCompiler.compile_rules(self.distribution, unassigned_folders)
+        previous_rules = dict(self.installed_rules)
+        self.set_prefix_policy()
+        failed_operations = ruleCompiler.apply_rules(self.get_assignment_applier(), self.installed_rules,
+                                                     compiled_rules)
+        if self.debug:
+            print("filenamePrefix rules: " + str(len(self.installed_rules)) + " rules for "
+                  + str(len(self.distribution.folder_index)) + " folders.")
+        self.__record_rules(set(previous_rules.keys()) | set(compiled_rules.keys()))
+        return failed_operations
 
     def __copy_data(self, input_folders, environment, remote_source):
         """
@@ -716,25 +1098,26 @@ class OSDManager(object):
     def __execute_commands(self, command_list):
         """
         execute, in parallel, a given set of commands. note that the degree of parallelism will match the length of
-        command_list.
+        command_list. the commands are shell command lines (they chain several commands), so each of them is
+        executed by /bin/sh. consecutive commands are started with a delay of 5 seconds.
         """
         if self.debug:
             print("Executing commands: ")
             for command in command_list:
                 print(str(command))
             print("in total " + str(len(command_list)) + " commands.")
-        processes = []
-        for command in command_list:
-            process = subprocess.Popen(command, stderr=subprocess.STDOUT, stdout=subprocess.PIPE, shell=True)
-            time.sleep(5)
-            processes.append(process)
+        if len(command_list) == 0:
+            return
 
-        for p in processes:
-            p.wait()
+        def print_result(result):
+            if self.debug:
+                print(str(result))
+
+        executor = commandExecutor.CommandExecutor(max_concurrency=len(command_list), callback=print_result,
+                                                   start_interval_secs=5)
+        executor.run(map(lambda command: ["/bin/sh", "-c", command], command_list))
 
         if self.debug:
-            for terminated_process in processes:
-                print(str(terminated_process.communicate()))
             print("Executing commands done.")
 
     def get_depth_2_subdirectories(self):
@@ -788,11 +1171,7 @@ class OSDManager(object):
         """
         search for the assigned folder that is a prefix of the given path on volume
         """
-        for osd in self.distribution.OSDs.values():
-            for a_folder in osd.folders:
-                if path_on_volume.startswith(a_folder):
-                    return a_folder
-        return None
+        return self.distribution.get_containing_folder_id(path_on_volume)
 
     def __str__(self):
         representation = "pathToMountPoint: " + self.path_to_mount_point + " volumeName: " + self.volume_name + " pathOnVolume: " \
@@ -802,6 +1181,19 @@ class OSDManager(object):
         return representation
 
 
+def rebalance(distribution, rebalance_algorithm='lpt'):
+    """
+    rebalance the given distribution with the given algorithm, returning the movements.
+    """
+    if rebalance_algorithm == 'rebalance_one':
+        return distribution.rebalance_one_folder()
+    elif rebalance_algorithm == 'two_step_opt':
+        return distribution.rebalance_two_steps_optimal_matching()
+    elif rebalance_algorithm == 'two_step_rnd':
+        return distribution.rebalance_two_steps_random_matching()
+    return distribution.rebalance_lpt()
+
+
 class ExecutableNotFoundException(Exception):
     """raise this when an external executable can not be found"""
 
@@ -812,3 +1204,35 @@ class NotAXtreemFSVolume(Exception):
 
 class PathNotManagedException(Exception):
     """raise this when a path is handled, that is not managed by xOSDManager"""
+
+
+def read_osd_information(volume_address):
+    """
+    read the space of the OSDs from the status page of the DIR of the volume at volume_address, as dictionary
+    uuid -> {'usable_space': ..., 'total_space': ...}, in bytes. returns None if the status page cannot be read.
+    """
+    try:
+        answer = request.urlopen(div_util.get_http_address(volume_address))
+        html_data = answer.read().decode('UTF-8')
+    except (urllib.error.URLError, OSError) as error:
+        print("osd information could not be fetched! Probably the http status page could not be found for:",
+              volume_address)
+        print(error)
+        return None
+
+    parser = dirstatuspageparser.DIRStatusPageParser()
+    parser.feed(html_data)
+
+    # filter out data sets without last update time or wrong service type
+    filtered_data_sets = list(filter(lambda x: int(x['last updated'].split()[0]) != 0, parser.dataSets))
+    filtered_data_sets = list(filter(lambda x: x['type'] == 'SERVICE_TYPE_OSD', filtered_data_sets))
+
+    osd_information = {}
+    for data_set in filtered_data_sets:
+        uuid = data_set['uuid']
+        current_osd = {}
+        current_osd['usable_space'] = int(data_set['usable'].split()[0])
+        current_osd['total_space'] = int(data_set['total'].split()[0])
+
+        osd_information[uuid] = current_osd
+    return osd_information
@@ -0,0 +1,169 @@
+"""
+application of folder to OSD assignments to an XtreemFS volume: rules of the filenamePrefix OSD selection policy
+(attribute 1004.filenamePrefix), set with xtfsutil.
+"""
+import time
+
+from xtreemfs_client import commandExecutor
+
+# parts of the error output of xtfsutil indicating a problem that may go away when trying again
+transient_error_markers = ['timed out', 'timeout', 'temporarily unavailable', 'connection refused',
+                           'connection reset', 'could not connect', 'cannot connect', 'service unavailable',
+                           'try again']
+
+
+class RuleOperation(object):
+    """
+    one change of the filenamePrefix rules: adding the rule assigning folder_id to osd_uuid (action 'add'), or
+    removing the rule of folder_id (action 'remove', osd_uuid is None).
+    """
+
+    def __init__(self, action, folder_id, osd_uuid=None):
+        if action not in ['add', 'remove']:
+            raise ValueError("unknown rule operation: " + str(action))
+        self.action = action
+        self.folder_id = folder_id
+        self.osd_uuid = osd_uuid
+
+    def get_value(self):
+        if self.action == 'add':
+            return "add " + self.folder_id + " " + self.osd_uuid
+        return "remove " + self.folder_id
+
+    def __str__(self):
+        return self.get_value()
+
+
+class FailedOperation(object):
+    """
+    a RuleOperation that could not be applied: the CommandResult of its last attempt, and the number of attempts.
+    """
+
+    def __init__(self, operation, result, attempts):
+        self.operation = operation
+        self.result = result
+        self.attempts = attempts
+
+    def is_transient(self):
+        return is_transient(self.result)
+
+    def __str__(self):
+        return "rule operation '" + str(self.operation) + "' failed after " + str(self.attempts) + " attempts: " \
+               + str(self.result)
+
+
+class AssignmentApplier(object):
+    """
+    applies RuleOperations to the volume mounted at path_to_mount_point, running up to max_concurrency xtfsutil
+    processes at the same time, such that applying many rules is bound by the throughput of the MRC rather than by
+    the latency of a single call.
+
+    operations failing with a transient error (see is_transient) are tried again up to max_retries times, after
+    retry_delay_secs (doubled for each further attempt). operations on the same folder id are applied one after
+    another, in the given order.
+    """
+
+    def __init__(self, path_to_mount_point, max_concurrency=32, max_retries=3, retry_delay_secs=1, timeout=60,
+                 debug=False):
+        self.path_to_mount_point = path_to_mount_point
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay_secs = retry_delay_secs
+        self.timeout = timeout
+        self.debug = debug
+
+    def create_command(self, operation):
+        return ["xtfsutil", "--set-pattr", "1004.filenamePrefix", "--value", operation.get_value(),
+                self.path_to_mount_point]
+
+    def add_rules(self, assignments):
+        """
+        add the rules of the given assignments, tuples (folder_id, osd_uuid). returns the list of FailedOperations.
+        """
+        return self.apply(RuleOperation('add', folder_id, osd_uuid) for folder_id, osd_uuid in assignments)
+
+    def remove_rules(self, folder_ids):
+        """
+        remove the rules of the given folder ids. returns the list of FailedOperations.
+        """
+        return self.apply(RuleOperation('remove', folder_id) for folder_id in folder_ids)
+
+    def apply(self, operations):
+        """
+        apply the given RuleOperations. returns the list of FailedOperations, which is empty if all operations have
+        been applied.
+        """
+        start_time = time.time()
+        failed_operations = []
+        num_operations = 0
+        for wave in split_into_waves(operations):
+            num_operations += len(wave)
+            failed_operations.extend(self.__apply_wave(wave))
+
+        if self.debug:
+            print("applied " + str(num_operations) + " filenamePrefix rule operations in "
+                  + str(round(time.time() - start_time, 3)) + " sec. " + str(len(failed_operations)) + " failed.")
+        for failed_operation in failed_operations:
+            print(str(failed_operation))
+        return failed_operations
+
+    def __apply_wave(self, operations):
+        """
+        apply operations on distinct folder ids concurrently, retrying transient errors.
+        """
+        executor = commandExecutor.CommandExecutor(max_concurrency=self.max_concurrency, timeout=self.timeout)
+        failed_operations = []
+        attempts = 0
+        retry_delay_secs = self.retry_delay_secs
+        while len(operations) > 0:
+            attempts += 1
+            results = executor.run(map(self.create_command, operations))
+            retry_operations = []
+            for operation, result in zip(operations, results):
+                if result.succeeded():
+                    continue
+                if is_transient(result) and attempts <= self.max_retries:
+                    retry_operations.append(operation)
+                else:
+                    failed_operations.append(FailedOperation(operation, result, attempts))
+            if len(retry_operations) > 0:
+                if self.debug:
+                    print("retrying " + str(len(retry_operations)) + " filenamePrefix rule operations in "
+                          + str(retry_delay_secs) + " sec.")
+                time.sleep(retry_delay_secs)
+                retry_delay_secs *= 2
+            operations = retry_operations
+        return failed_operations
+
+
+def split_into_waves(operations):
+    """
+    split the operations into lists in which each folder id occurs at most once, preserving the order of the
+    operations on each folder id.
+    """
+    waves = []
+    for operation in operations:
+        wave_index = 0
+        # the first wave after the last wave containing an operation on the same folder id
+        for index in range(len(waves) - 1, -1, -1):
+            if operation.folder_id in waves[index][1]:
+                wave_index = index + 1
+                break
+        if wave_index == len(waves):
+            waves.append(([], set()))
+        waves[wave_index][0].append(operation)
+        waves[wave_index][1].add(operation.folder_id)
+    return [wave[0] for wave in waves]
+
+
+def is_transient(result):
+    """
+    whether the failure of a command (given by its CommandResult) may go away when trying again: the command has
+    timed out, or its error output indicates a communication problem with the MRC.
+    """
+    if result.succeeded():
+        return False
+    if result.timed_out:
+        return True
+    output = (str(result.stderr) + " " + str(result.stdout)).lower()
+    return any(marker in output for marker in transient_error_markers)
@@ -0,0 +1,143 @@
+"""
+calibration of the relative bandwidths of the OSDs of a volume, by writing and reading probe files on each OSD.
+"""
+import math
+import os
+import shutil
+import statistics
+import time
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import div_util
+from xtreemfs_client import osd
+
+calibration_folder_name = '.das_calibration'
+
+
+def quantize_bandwidth(bandwidth, steps_per_doubling=4):
+    """
+    round bandwidth to the nearest power 2 ** (k / steps_per_doubling), i.e., to one of steps_per_doubling values
+    per factor of two (by default, the rounding error is below 10%). throughput measurements vary by a few percent
+    between runs, so unrounded bandwidths would change with every calibration, and rebalancing would move folders
+    because of measurement noise. identical OSDs also get identical bandwidths, which keeps the lptQueue small.
+    """
+    step = round(math.log2(bandwidth) * steps_per_doubling)
+    return 2 ** (step / steps_per_doubling)
+
+
+class BandwidthCalibrator(object):
+    """
+    measures the throughput of each OSD of the distribution of osd_manager: a probe file of probe_size bytes is
+    written (and synced) into a folder pinned to the OSD by a temporary filenamePrefix rule, and read again. the
+    throughput of an OSD is the median of repetitions measurements of the bytes written and read per second.
+
+    the OSDs are measured one after another, such that they do not compete for the network and the client. the
+    folder of the probe files is created at the mount point, outside of the managed folder, and removed afterwards.
+    note that the measured throughput is bound by the client: OSDs faster than the client all get the same
+    bandwidth.
+
+    the bandwidths are quantized to steps_per_doubling values per factor of two (see quantize_bandwidth), such
+    that repeated calibrations yield the same bandwidths.
+    """
+
+    def __init__(self, osd_manager, probe_size=64 * 1024 * 1024, block_size=1024 * 1024, repetitions=3,
+                 steps_per_doubling=4):
+        self.osd_manager = osd_manager
+        self.probe_size = probe_size
+        self.block_size = block_size
+        self.repetitions = repetitions
+        self.steps_per_doubling = steps_per_doubling
+        self.calibration_folder = os.path.join(osd_manager.path_to_mount_point, calibration_folder_name)
+
+    def get_rule_prefix(self, osd_uuid):
+        return os.path.join(self.osd_manager.volume_name, calibration_folder_name, osd_uuid)
+
+    def calibrate(self, save=True):
+        """
+        measure all OSDs and set their bandwidths (quantized throughput in units of
+        osd.bytes_per_sec_per_bandwidth_unit).
+        OSDs that could not be measured keep their bandwidth. the configuration of osd_manager is saved if save is
+        True. returns the measured bandwidths, a dictionary osd uuid -> bandwidth.
+        """
+        if not div_util.check_for_executable('xtfsutil'):
+            raise OSDManager.ExecutableNotFoundException("No xtfsutil found. Please make sure it is contained in your "
+                                                         "PATH.")
+        distribution = self.osd_manager.distribution
+        osd_uuids = distribution.get_osd_list()
+        applier = self.osd_manager.get_assignment_applier()
+        self.osd_manager.set_prefix_policy()
+
+        measured_bandwidths = {}
+        failed_operations = applier.add_rules((self.get_rule_prefix(osd_uuid), osd_uuid) for osd_uuid in osd_uuids)
+        failed_osds = set(map(lambda x: x.operation.osd_uuid, failed_operations))
+        try:
+            for osd_uuid in osd_uuids:
+                if osd_uuid in failed_osds:
+                    continue
+                throughput = self.calibrate_osd(osd_uuid)
+                if throughput is not None and throughput > 0:
+                    measured_bandwidths[osd_uuid] = quantize_bandwidth(
+                        throughput / osd.bytes_per_sec_per_bandwidth_unit, self.steps_per_doubling)
+                    print("osd " + osd_uuid + ": " + str(round(throughput / 1024 / 1024, 1)) + " MiB/s, bandwidth: "
+                          + str(round(measured_bandwidths[osd_uuid], 3)))
+        finally:
+            applier.remove_rules(self.get_rule_prefix(osd_uuid) for osd_uuid in osd_uuids
+                                 if osd_uuid not in failed_osds)
+            shutil.rmtree(self.calibration_folder, ignore_errors=True)
+
+        osd_bandwidths = dict((osd_uuid, measured_bandwidths.get(osd_uuid, distribution.OSDs[osd_uuid].bandwidth))
+                              for osd_uuid in osd_uuids)
+        distribution.set_osd_bandwidths(osd_bandwidths)
+        if save:
+            self.osd_manager.save_configuration()
+        return measured_bandwidths
+
+    def calibrate_osd(self, osd_uuid):
+        """
+        measure the throughput of the given OSD, in bytes per second. returns None if the probe files are not
+        placed on the OSD.
+        """
+        probe_folder = os.path.join(self.calibration_folder, osd_uuid)
+        os.makedirs(probe_folder, exist_ok=True)
+        throughputs = []
+        for repetition in range(0, self.repetitions):
+            probe_file = os.path.join(probe_folder, 'probe_' + str(repetition))
+            try:
+                write_time = self.write_probe_file(probe_file)
+                osd_uuids = div_util.get_osd_uuids(probe_file)
+                if osd_uuids != [osd_uuid]:
+                    print("probe file for osd " + osd_uuid + " has been placed on " + str(osd_uuids)
+                          + ", skipping the osd.")
+                    return None
+                read_time = self.read_probe_file(probe_file)
+            finally:
+                if os.path.exists(probe_file):
+                    os.remove(probe_file)
+            throughputs.append(2 * self.probe_size / max(write_time + read_time, 1e-9))
+        return statistics.median(throughputs)
+
+    def write_probe_file(self, path):
+        """
+        write a probe file, returning the time until its data has been synced.
+        """
+        block = os.urandom(min(self.block_size, self.probe_size))
+        start_time = time.time()
+        with open(path, 'wb') as f:
+            remaining = self.probe_size
+            while remaining > 0:
+                remaining -= f.write(block[0:min(len(block), remaining)])
+            f.flush()
+            os.fsync(f.fileno())
+        return time.time() - start_time
+
+    def read_probe_file(self, path):
+        """
+        read a probe file, returning the time needed. the file is dropped from the page cache first, if possible.
+        """
+        with open(path, 'rb') as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            start_time = time.time()
+            while len(f.read(self.block_size)) > 0:
+                pass
+        return time.time() - start_time
@@ -0,0 +1,115 @@
+"""
+asyncio based execution of external commands, e.g., xtfsutil calls.
+
+commands are given as argument lists and executed without a shell. a fixed number of workers takes the next command
+as soon as its previous command has returned, so the number of running commands stays at the concurrency limit until
+all commands have been started.
+"""
+import asyncio
+import subprocess
+import time
+
+
+class CommandResult(object):
+    """
+    the result of executing one command.
+    """
+
+    def __init__(self, args, stdout, stderr, returncode, duration, timed_out=False):
+        self.args = args
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.duration = duration
+        self.timed_out = timed_out
+
+    def succeeded(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def __str__(self):
+        return "command: " + str(self.args) \
+               + " returncode: " + str(self.returncode) \
+               + " duration: " + str(round(self.duration, 3)) \
+               + " timed out: " + str(self.timed_out) \
+               + "\nstdout: " + str(self.stdout) \
+               + "\nstderr: " + str(self.stderr)
+
+
+async def run_command(args, timeout=None):
+    """
+    execute one command, given as argument list, and return its CommandResult.
+    if the command does not return within timeout seconds, it is killed.
+    if the command can not be started at all, the result has returncode 127 and the error as stderr.
+    """
+    start_time = time.time()
+    try:
+        process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as error:
+        return CommandResult(args, '', str(error), 127, time.time() - start_time)
+
+    timed_out = False
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        process.kill()
+        stdout, stderr = await process.communicate()
+
+    return CommandResult(args, stdout.decode('UTF-8', errors='replace'), stderr.decode('UTF-8', errors='replace'),
+                         process.returncode, time.time() - start_time, timed_out)
+
+
+class CommandExecutor(object):
+    """
+    executes commands with bounded concurrency.
+
+    max_concurrency: maximum number of commands running at the same time.
+    timeout: per-command timeout in seconds (None means no timeout).
+    callback: function that is called with the CommandResult of each command as soon as the command has returned.
+    start_interval_secs: minimum time between starting two commands.
+    """
+
+    def __init__(self, max_concurrency=200, timeout=None, callback=None, start_interval_secs=0):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1!")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.callback = callback
+        self.start_interval_secs = start_interval_secs
+
+    def run(self, commands):
+        """
+        execute the given commands (an iterable of argument lists) and return the list of their CommandResults,
+        in the order of the commands.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.run_async(commands))
+        finally:
+            loop.close()
+
+    async def run_async(self, commands):
+        """
+        coroutine version of run, for callers that already run an event loop.
+        """
+        results = {}
+        numbered_commands = iter(enumerate(commands))
+        start_lock = asyncio.Lock()
+        last_start = [None]
+
+        async def worker():
+            for index, args in numbered_commands:
+                if self.start_interval_secs > 0:
+                    async with start_lock:
+                        if last_start[0] is not None:
+                            remaining = last_start[0] + self.start_interval_secs - time.time()
+                            if remaining > 0:
+                                await asyncio.sleep(remaining)
+                        last_start[0] = time.time()
+                result = await run_command(args, self.timeout)
+                results[index] = result
+                if self.callback is not None:
+                    self.callback(result)
+
+        await asyncio.gather(*[worker() for _ in range(0, self.max_concurrency)])
+        return [results[index] for index in range(0, len(results))]
@@ -0,0 +1,190 @@
+"""
+persistent storage of the data distribution of an OSDManager in an SQLite database.
+"""
+import os
+import pickle
+import sqlite3
+import sys
+
+from xtreemfs_client import dataDistribution
+from xtreemfs_client import osd
+
+store_format_version = 1
+
+# the first byte of pickles written with protocol 2 or higher
+pickle_protocol_marker = b'\x80'
+
+
+class ConfigurationStore(object):
+    """
+    stores a DataDistribution in an SQLite database: one row per OSD (uuid, bandwidth, capacity) and one row per
+    folder (folder id, OSD uuid, size).
+
+    saving a distribution that has been loaded from (or saved to) this store only writes the OSDs and the folders
+    changed since then (see DataDistribution.changed_folders), in one transaction. other distributions are written
+    completely.
+
+    configurations written by older versions (a pickled DataDistribution) are imported on load; the pickle is
+    kept as <path>.pickle.
+
+    in addition, the filenamePrefix rules installed on the volume are recorded (see load_rules and save_rules).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # the distribution the database is in sync with, apart from its changed folders
+        self.distribution = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def is_pickle(self):
+        with open(self.path, 'rb') as f:
+            return f.read(1) == pickle_protocol_marker
+
+    def connect(self, path=None):
+        if path is None:
+            path = self.path
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("CREATE TABLE IF NOT EXISTS osds "
+                           "(uuid TEXT PRIMARY KEY, position INTEGER, bandwidth NUMERIC, capacity INTEGER)")
+        connection.execute("CREATE TABLE IF NOT EXISTS folders "
+                           "(folder_id TEXT PRIMARY KEY, osd_uuid TEXT NOT NULL, size NUMERIC NOT NULL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS rules (prefix TEXT PRIMARY KEY, osd_uuid TEXT NOT NULL)")
+        return connection
+
+    def load(self):
+        """
+        read the stored DataDistribution. returns None if there is no stored configuration.
+        """
+        if not self.exists():
+            return None
+        if self.is_pickle():
+            return self.import_pickle()
+
+        connection = self.connect()
+        try:
+            version = connection.execute("SELECT value FROM meta WHERE key = 'format_version'").fetchone()
+            if version is not None and int(version[0]) > store_format_version:
+                raise ValueError("configuration " + self.path + " has been written by a newer version (format "
+                                 + version[0] + ")")
+
+            distribution = dataDistribution.DataDistribution()
+            for uuid, bandwidth, capacity in connection.execute(
+                    "SELECT uuid, bandwidth, capacity FROM osds ORDER BY position"):
+                distribution.add_osd(osd.OSD(uuid, bandwidth=bandwidth, capacity=capacity))
+
+            # fill the OSDs directly, as checking capacities and notifying the distribution for each folder
+            # would dominate the loading time of large distributions
+            for folder_id, osd_uuid, size in connection.execute("SELECT folder_id, osd_uuid, size FROM folders"):
+                containing_osd = distribution.OSDs[osd_uuid]
+                containing_osd.folders[folder_id] = size
+                containing_osd.total_folder_size += size
+                distribution.folder_index[folder_id] = osd_uuid
+        finally:
+            connection.close()
+
+        distribution.changed_folders = set()
+        self.distribution = distribution
+        return distribution
+
+    def import_pickle(self):
+        """
+        convert a pickled configuration into a database at the same path, and return the distribution.
+        """
+        with open(self.path, 'rb') as f:
+            distribution = pickle.load(f)
+
+        tmp_path = self.path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self.write(distribution, tmp_path, full=True)
+        os.replace(self.path, self.path + '.pickle')
+        os.replace(tmp_path, self.path)
+
+        distribution.changed_folders = set()
+        self.distribution = distribution
+        return distribution
+
+    def save(self, distribution, save_capacities=True):
+        """
+        store the given distribution. only changed folders are written if the store is in sync with distribution.
+        if save_capacities is False, the OSDs are stored with unlimited capacity (sys.maxsize).
+        """
+        if self.exists() and self.is_pickle():
+            os.replace(self.path, self.path + '.pickle')
+        full = distribution is not self.distribution or not self.exists()
+        self.write(distribution, self.path, full, save_capacities)
+        distribution.changed_folders = set()
+        self.distribution = distribution
+
+    def write(self, distribution, path, full, save_capacities=True):
+        connection = self.connect(path)
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('format_version', ?)",
+                                   (str(store_format_version),))
+
+                osd_rows = [(one_osd.uuid, position, one_osd.bandwidth,
+                             one_osd.capacity if save_capacities else sys.maxsize)
+                            for position, one_osd in enumerate(distribution.OSDs.values())]
+                connection.execute("DELETE FROM osds")
+                connection.executemany("INSERT INTO osds (uuid, position, bandwidth, capacity) VALUES (?, ?, ?, ?)",
+                                       osd_rows)
+
+                if full:
+                    connection.execute("DELETE FROM folders")
+                    folder_ids = distribution.folder_index.keys()
+                else:
+                    folder_ids = distribution.changed_folders
+
+                removed_folders = []
+                folder_rows = []
+                for folder_id in folder_ids:
+                    osd_uuid = distribution.folder_index.get(folder_id)
+                    if osd_uuid is None:
+                        removed_folders.append((folder_id,))
+                    else:
+                        folder_rows.append((folder_id, osd_uuid, distribution.OSDs[osd_uuid].folders[folder_id]))
+                connection.executemany("DELETE FROM folders WHERE folder_id = ?", removed_folders)
+                connection.executemany("INSERT OR REPLACE INTO folders (folder_id, osd_uuid, size) VALUES (?, ?, ?)",
+                                       folder_rows)
+        finally:
+            connection.close()
+
+    def load_rules(self):
+        """
+        read the recorded filenamePrefix rules, as dictionary prefix -> osd uuid. returns None if no rules have been
+        recorded, e.g., for configurations written by older versions.
+        """
+        if not self.exists() or self.is_pickle():
+            return None
+        connection = self.connect()
+        try:
+            recorded = connection.execute("SELECT value FROM meta WHERE key = 'rules_recorded'").fetchone()
+            if recorded is None:
+                return None
+            return dict(connection.execute("SELECT prefix, osd_uuid FROM rules"))
+        finally:
+            connection.close()
+
+    def save_rules(self, rules, changed_prefixes=None):
+        """
+        record the given filenamePrefix rules (dictionary prefix -> osd uuid). if changed_prefixes is given and rules
+        have been recorded before, only the rules of these prefixes are written.
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                recorded = connection.execute("SELECT value FROM meta WHERE key = 'rules_recorded'").fetchone()
+                if changed_prefixes is None or recorded is None:
+                    connection.execute("DELETE FROM rules")
+                    changed_prefixes = rules.keys()
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules_recorded', '1')")
+                connection.executemany("DELETE FROM rules WHERE prefix = ?",
+                                       [(prefix,) for prefix in changed_prefixes if prefix not in rules])
+                connection.executemany("INSERT OR REPLACE INTO rules (prefix, osd_uuid) VALUES (?, ?)",
+                                       [(prefix, rules[prefix]) for prefix in changed_prefixes if prefix in rules])
+        finally:
+            connection.close()
@@ -1,8 +1,14 @@
 import argparse
-
+import os
+import signal
 import sys
 
 from xtreemfs_client import OSDManager
+from xtreemfs_client import bandwidthCalibrator
+from xtreemfs_client import div_util
+from xtreemfs_client import migrationPlan
+from xtreemfs_client import physicalPlacementRealizer
+from xtreemfs_client import placementDaemon
 from xtreemfs_client import verify
 
 """
@@ -61,11 +67,90 @@ parser.add_argument("--fix-internally", action='store_const', const=True, defaul
                          'layout. otherwise files will be temporarily located outside xtreemfs,'
                          'increasing the chance for data loss.')
 
+parser.add_argument("--plan", action='store_const', const=True, default=False,
+                    help='with --create-from-existing-files or --rebalance-existing-assignment, only calculate and'
+                         ' print which files would be moved between which OSDs and how long it would take, without'
+                         ' changing anything.')
+parser.add_argument("--plan-file", nargs=1,
+                    help='with --plan, save the migration plan as json to the given file.')
+parser.add_argument("--execute-plan", nargs=1,
+                    help='execute the migration plan saved in the given json file as it is.')
+
+parser.add_argument("--resume", action='store_const', const=True, default=False,
+                    help='resume an internal migration (started by --create-from-existing-files or'
+                         ' --rebalance-existing-assignment with --fix-internally) that has been interrupted.')
+
+parser.add_argument("--daemon", action='store_const', const=True, default=False,
+                    help='keep running and watch the target folder for changes: new folders are assigned to OSDs'
+                         ' immediately, folder sizes are kept up to date and files written to a wrong OSD are'
+                         ' moved internally.')
+parser.add_argument("--resync-interval", nargs=1,
+                    help='with --daemon, check all folders and files every given number of seconds, e.g., to'
+                         ' catch changes made by other XtreemFS clients.')
+
 parser.add_argument("--max-files-in-progress", nargs=1)
-parser.add_argument("--movement-strategy", nargs=1)
+parser.add_argument("--movement-strategy", nargs=1,
+                    help='strategy for moving files internally: osd_balanced, random, pipelined, byte_balanced or'
+                         ' folder_major (moves whole folders one after another and reports each placed folder).')
+parser.add_argument("--osd-rate-limit", nargs=1,
+                    help='with --movement-strategy byte_balanced, limit the migration rate (bytes/sec, suffixes K, M,'
+                         ' G and T are allowed) per OSD. comma-separated list of uuid=rate entries; a rate without'
+                         ' uuid applies to all other OSDs, e.g., 200M,osd_1=50M.')
+parser.add_argument("--priority-folders", nargs=1,
+                    help='with --movement-strategy folder_major, comma-separated list of folders (absolute or relative'
+                         ' to the target folder) whose files are moved first, e.g., the input of the next jobs.')
+parser.add_argument("--scan-window", nargs=1,
+                    help='with the pipelined, byte_balanced or folder_major movement strategy, start moving files'
+                         ' while the folders are still being scanned, holding only about the given number of files'
+                         ' to be moved in memory. recommended for volumes with millions of files.')
+parser.add_argument("--fill-threshold", nargs=1,
+                    help='when moving files internally, never fill an OSD above the given fraction of its capacity'
+                         ' (e.g., 0.95), counting files that are on both their old and their new OSD during the'
+                         ' movement twice. files are moved away from the fullest OSDs first. requires the pipelined,'
+                         ' byte_balanced or folder_major movement strategy (others fall back to pipelined).')
+parser.add_argument("--compact-rules", action='store_const', const=True, default=False,
+                    help='collapse the filenamePrefix rules of folders sharing a parent and an OSD into a rule for the'
+                         ' parent, applying only changed rules. without another action, the rules of the existing'
+                         ' assignments are compacted.')
+parser.add_argument("--refresh-metadata", action='store_const', const=True, default=False,
+                    help='read the volume information and the OSD space again, instead of using the volume metadata'
+                         ' cached for up to 5 minutes.')
+parser.add_argument("--capacity-reserve", nargs=1,
+                    help='fraction of the total space of each OSD (as reported by the DIR) that is kept free when'
+                         ' assigning folders to OSDs (default: 0.05).')
+parser.add_argument("--ignore-osd-capacities", action='store_const', const=True, default=False,
+                    help='assign folders to OSDs without considering the free space reported by the DIR.')
+parser.add_argument("--calibrate", action='store_const', const=True, default=False,
+                    help='measure the throughput of each OSD by writing and reading probe files pinned to it, and'
+                         ' save the relative OSD bandwidths used for placement into the configuration.')
+parser.add_argument("--probe-size", nargs=1,
+                    help='size of the probe files of --calibrate, e.g., 256M (default: 64M).')
 
 args = parser.parse_args()
 
+if args.resume:
+    # --resume continues the migration recorded in the journal, so it can not be combined with other actions
+    actions = [('--copy', args.copy), ('--new-folders', args.new_folders), ('--update', args.update),
+               ('--plan', args.plan), ('--execute-plan', args.execute_plan),
+               ('--create-from-existing-files', args.create_from_existing_files),
+               ('--rebalance-existing-assignment', args.rebalance_existing_assignment),
+               ('--daemon', args.daemon), ('--calibrate', args.calibrate)]
+    conflicting_actions = [option for option, given in actions if given]
+    if len(conflicting_actions) > 0:
+        parser.error("--resume can not be combined with " + ", ".join(conflicting_actions))
+
+rate_limit_args = {}
+if args.osd_rate_limit is not None:
+    rate_limit_args['osd_rate_limits'], rate_limit_args['default_rate_limit'] = \
+        div_util.parse_rate_limits(args.osd_rate_limit[0])
+
+# arguments of all internal migrations
+movement_args = dict(rate_limit_args)
+if args.fill_threshold is not None:
+    movement_args['fill_threshold'] = float(args.fill_threshold[0])
+if args.scan_window is not None:
+    movement_args['scan_window'] = int(args.scan_window[0])
+
 if args.debug:
     print("args: ")
     print(args)
@@ -77,7 +162,21 @@ if args.verify:
     #     verify.print_tree(vars(args)['target-folder'][0])
     sys.exit(0)
 
-x_man = OSDManager.OSDManager(vars(args)['target-folder'][0], debug=args.debug)
+capacity_reserve = 0.05
+if args.capacity_reserve is not None:
+    capacity_reserve = float(args.capacity_reserve[0])
+if args.ignore_osd_capacities:
+    capacity_reserve = None
+
+x_man = OSDManager.OSDManager(vars(args)['target-folder'][0], debug=args.debug, compact_rules=args.compact_rules,
+                              refresh_metadata=args.refresh_metadata, capacity_reserve=capacity_reserve)
+
+if args.movement_strategy is not None and args.movement_strategy[0] == 'folder_major':
+    # report folders as soon as all their files are on their assigned OSD, e.g., to start data-local jobs
+    movement_args['folder_placed_callback'] = lambda folder_id: print("folder placed: " + folder_id, flush=True)
+if args.priority_folders is not None:
+    movement_args['folder_priorities'] = [x_man.get_path_on_volume(os.path.join(x_man.managed_folder, x.strip()))
+                                          for x in args.priority_folders[0].split(',')]
 
 if args.print:
     print(x_man)
@@ -106,14 +205,79 @@ elif args.update:
     x_man.update()
     print(x_man)
 
+elif args.plan:
+    if args.create_from_existing_files:
+        plan = x_man.plan_distribution_from_existing_files()
+    elif args.rebalance_existing_assignment:
+        plan = x_man.plan_rebalance()
+    else:
+        print("--plan requires --create-from-existing-files or --rebalance-existing-assignment")
+        sys.exit(1)
+    estimate_args = dict(rate_limit_args)
+    if args.max_files_in_progress is not None:
+        estimate_args['max_files_in_progress'] = int(args.max_files_in_progress[0])
+    print(plan.report(**estimate_args))
+    if args.plan_file is not None:
+        plan.save(args.plan_file[0])
+        print("saved migration plan to " + args.plan_file[0])
+
+elif args.execute_plan:
+    plan_args = dict(movement_args)
+    if args.max_files_in_progress is not None:
+        plan_args['max_files_in_progress'] = int(args.max_files_in_progress[0])
+    if args.movement_strategy is not None:
+        plan_args['movement_strategy'] = args.movement_strategy[0]
+    x_man.execute_plan(migrationPlan.load(args.execute_plan[0]), **plan_args)
+
 elif args.create_from_existing_files:
     x_man.create_distribution_from_existing_files(fix_layout_internally=args.fix_internally,
                                                   environment=args.environment,
                                                   max_files_in_progress=int(args.max_files_in_progress[0]),
-                                                  movement_strategy=args.movement_strategy[0])
+                                                  movement_strategy=args.movement_strategy[0],
+                                                  **movement_args)
 
 elif args.rebalance_existing_assignment:
     x_man.rebalance_existing_assignment(fix_layout_internally=args.fix_internally,
                                         environment=args.environment,
                                         max_files_in_progress=int(args.max_files_in_progress[0]),
-                                        movement_strategy=args.movement_strategy[0])
+                                        movement_strategy=args.movement_strategy[0],
+                                        **movement_args)
+
+elif args.resume:
+    resume_args = {}
+    if args.max_files_in_progress is not None:
+        resume_args['max_files_in_progress'] = int(args.max_files_in_progress[0])
+    if args.movement_strategy is not None:
+        resume_args['movement_strategy'] = args.movement_strategy[0]
+    x_man.resume_placement(**resume_args, **movement_args)
+
+elif args.daemon:
+    realizer_args = dict(movement_args)
+    if args.max_files_in_progress is not None:
+        realizer_args['max_files_in_progress'] = int(args.max_files_in_progress[0])
+    placement_realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(x_man, debug=args.debug,
+                                                                             **realizer_args)
+    resync_interval = None
+    if args.resync_interval is not None:
+        resync_interval = int(args.resync_interval[0])
+    movement_strategy = 'osd_balanced'
+    if args.movement_strategy is not None:
+        movement_strategy = args.movement_strategy[0]
+    daemon = placementDaemon.PlacementDaemon(x_man, debug=args.debug, resync_interval_secs=resync_interval,
+                                             movement_strategy=movement_strategy,
+                                             placement_realizer=placement_realizer)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.close()
+
+elif args.calibrate:
+    calibrator_args = {}
+    if args.probe_size is not None:
+        calibrator_args['probe_size'] = div_util.parse_size(args.probe_size[0])
+    bandwidthCalibrator.BandwidthCalibrator(x_man, **calibrator_args).calibrate()
+    print(x_man)
+
+elif args.compact_rules:
+    x_man.sync_rules()
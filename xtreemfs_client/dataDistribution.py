@@ -5,6 +5,7 @@ from ortools.graph import pywrapgraph
 
 from xtreemfs_client import osd
 from xtreemfs_client import folder
+from xtreemfs_client import lptQueue
 
 
 class DataDistribution(object):
@@ -18,6 +19,46 @@ class DataDistribution(object):
 
     def __init__(self):
         self.OSDs = {}
+        # map from folder ids to the uuid of the OSD containing the folder.
+        # it is kept up to date by the OSDs (see folder_added and folder_removed).
+        self.folder_index = {}
+        # ids of the folders that have been added, removed or changed since the distribution has last been saved,
+        # see configurationStore.
+        self.changed_folders = set()
+
+    def __setstate__(self, state):
+        # distributions pickled before the folder index existed need to build it
+        self.__dict__.update(state)
+        if 'changed_folders' not in state:
+            self.changed_folders = set()
+        if 'folder_index' not in state:
+            self.rebuild_folder_index()
+
+    def rebuild_folder_index(self):
+        """
+        (re)build the folder index from scratch, and make sure all OSDs report changes to this distribution.
+        """
+        self.folder_index = {}
+        for one_osd in self.OSDs.values():
+            one_osd.distribution = self
+            for folder_id in one_osd.folders:
+                self.folder_index[folder_id] = one_osd.uuid
+                self.changed_folders.add(folder_id)
+
+    def folder_added(self, folder_id, osd_uuid):
+        """
+        called by an OSD of this distribution whenever a folder is added to it.
+        """
+        self.folder_index[folder_id] = osd_uuid
+        self.changed_folders.add(folder_id)
+
+    def folder_removed(self, folder_id, osd_uuid):
+        """
+        called by an OSD of this distribution whenever a folder is removed from it.
+        """
+        if self.folder_index.get(folder_id) == osd_uuid:
+            del self.folder_index[folder_id]
+            self.changed_folders.add(folder_id)
 
     def add_new_osd(self, osd_uuid):
         """
@@ -27,6 +68,7 @@ class DataDistribution(object):
             print("key: " + osd_uuid + " is already present!")
             return
         new_osd = osd.OSD(osd_uuid)
+        new_osd.distribution = self
         self.OSDs[osd_uuid] = new_osd
 
     def add_osd(self, new_osd):
@@ -37,6 +79,7 @@ class DataDistribution(object):
             print("key: " + new_osd.uuid + " is already present!")
             return
         self.OSDs[new_osd.uuid] = new_osd
+        self.__attach_osd(new_osd)
 
     def add_osd_list(self, osd_list):
         """
@@ -45,6 +88,7 @@ class DataDistribution(object):
         for osd_uuid in osd_list:
             if osd_uuid not in self.OSDs:
                 new_osd = osd.OSD(osd_uuid)
+                new_osd.distribution = self
                 self.OSDs[osd_uuid] = new_osd
 
     def replace_osd(self, new_osd):
@@ -54,7 +98,21 @@ class DataDistribution(object):
         :return:
         """
         assert new_osd.uuid in self.OSDs.keys()
+        old_osd = self.OSDs[new_osd.uuid]
+        for folder_id in old_osd.folders:
+            self.folder_removed(folder_id, old_osd.uuid)
+        old_osd.distribution = None
         self.OSDs[new_osd.uuid] = new_osd
+        self.__attach_osd(new_osd)
+
+    def __attach_osd(self, new_osd):
+        """
+        make new_osd report its folder changes to this distribution and add its folders to the folder index.
+        """
+        new_osd.distribution = self
+        for folder_id in new_osd.folders:
+            self.folder_index[folder_id] = new_osd.uuid
+            self.changed_folders.add(folder_id)
 
     def set_osd_capacities(self, osd_capacities):
         """
@@ -92,9 +150,26 @@ class DataDistribution(object):
         """
         get the OSD containing the given folder_id, or None if the folder is not assigned to any OSD.
         """
-        for checked_osd in self.OSDs.values():
-            if checked_osd.contains_folder(folder_id):
-                return checked_osd
+        osd_uuid = self.folder_index.get(folder_id)
+        if osd_uuid is None:
+            return None
+        return self.OSDs[osd_uuid]
+
+    def get_containing_folder_id(self, path):
+        """
+        get the id of the assigned folder that contains the given path (which must be given relative to the volume,
+        just like folder ids), or None if the path is not contained in any assigned folder.
+        the prefixes of the path are looked up in the folder index component by component, so this takes time
+        proportional to the depth of the path, independently of the number of folders.
+        """
+        separator_index = path.find('/')
+        while separator_index != -1:
+            prefix = path[:separator_index]
+            if prefix in self.folder_index:
+                return prefix
+            separator_index = path.find('/', separator_index + 1)
+        if path in self.folder_index:
+            return path
         return None
 
     def get_folder_size(self, folder_id):
@@ -109,9 +184,10 @@ class DataDistribution(object):
         old_osd = self.get_containing_osd(folder_id)
         if old_osd is None:
             self.OSDs[new_osd].add_folder(folder_id, self.get_average_folder_size())
-        else:
-            self.OSDs[new_osd].add_folder(folder_id, self.OSDs[old_osd.uuid].folders[folder_id])
-            self.OSDs[old_osd.uuid].remove_folder(folder_id)
+        elif old_osd.uuid != new_osd:
+            # add before removing, such that the folder stays assigned if the new OSD rejects it
+            self.OSDs[new_osd].add_folder(folder_id, old_osd.folders[folder_id])
+            old_osd.remove_folder(folder_id)
 
     def get_total_folder_size(self):
         total_size = 0
@@ -217,7 +293,8 @@ class DataDistribution(object):
                     random_osd_assignment=False,
                     ignore_folder_sizes=False,
                     debug=False,
-                    random_seed=None):
+                    random_seed=None,
+                    use_lpt_queue=True):
         """
         adds a list of folders to the data distribution.
         if not specified otherwise, the assignments are calculated using the LPT algorithm.
@@ -232,6 +309,11 @@ class DataDistribution(object):
         folders are randomly assigned to OSDs such that all OSDs have the same number of folders (if possible).
 
         the assignment is stable (i.e., folders already assigned to an OSD are not reassigned to another OSD).
+
+        raises a NoSuitableOSDException if a new folder does not fit on any OSD (unless capacities are ignored).
+
+        if use_lpt_queue=True, the LPT algorithm uses a priority queue of OSDs (see lptQueue.LPTQueue) instead of
+        scanning all OSDs for each folder. both ways yield identical assignments.
         """
 
         # find out which folders are not assigned yet
@@ -274,6 +356,8 @@ class DataDistribution(object):
                 print("using random osd assignment, respecting osd capacities")
             for a_folder in new_folders:
                 suitable_osds = self.get_suitable_osds(a_folder.size)  # list of OSDs with enough capacity
+                if len(suitable_osds) == 0:
+                    raise NoSuitableOSDException(a_folder, self)
                 suitable_random_osd = random.choice(suitable_osds)
                 suitable_random_osd.add_folder(a_folder.id, a_folder.size)
                 osds_for_new_folders.append((a_folder.id,
@@ -298,8 +382,21 @@ class DataDistribution(object):
         list.sort(new_folders, key=lambda x: x.size, reverse=True)
 
         # for each folder calculate the best OSD and add it to it
+        if use_lpt_queue:
+            lpt_queue = lptQueue.LPTQueue(self.OSDs.values())
+            for a_folder in new_folders:
+                least_used_osd, _ = lpt_queue.get_lpt_osd(a_folder.size)
+                if least_used_osd is None:
+                    raise NoSuitableOSDException(a_folder, self)
+                lpt_queue.add_folder(least_used_osd, a_folder.id, a_folder.size)
+                osds_for_new_folders.append((a_folder.id,
+                                             least_used_osd.uuid))
+            return osds_for_new_folders
+
         for a_folder in new_folders:
             least_used_osd, _ = self.get_lpt_osd(a_folder.size)
+            if least_used_osd is None:
+                raise NoSuitableOSDException(a_folder, self)
             least_used_osd.add_folder(a_folder.id, a_folder.size)
             osds_for_new_folders.append((a_folder.id,
                                          least_used_osd.uuid))
@@ -543,13 +640,11 @@ class DataDistribution(object):
         """
         updates the size of a given folder
         """
-        found_containing_osd = False
-        for one_osd in self.OSDs.values():
-            if folder in one_osd.folders.keys():
-                one_osd.update_folder(folder, size)
-                found_containing_osd = True
-                break
-        if not found_containing_osd:
+        containing_osd = self.get_containing_osd(folder)
+        found_containing_osd = containing_osd is not None
+        if found_containing_osd:
+            containing_osd.update_folder(folder, size)
+        else:
             print("update_folder: could not find a containing OSD for folder id: " + str(folder))
         assert found_containing_osd is True
 
@@ -572,3 +667,19 @@ class DataDistribution(object):
         for key, value in self.OSDs.items():
             string_representation += str(value) + " \n"
         return string_representation
+
+
+class NoSuitableOSDException(Exception):
+    """raise this when a folder can not be assigned to any OSD, as none has enough free capacity"""
+
+    def __init__(self, a_folder, distribution):
+        largest_free_capacity = max([one_osd.get_free_capacity() for one_osd in distribution.OSDs.values()],
+                                    default=0)
+        super(NoSuitableOSDException, self).__init__("no OSD has enough free capacity for folder " + str(a_folder.id)
+                                                     + " of size " + str(a_folder.size)
+                                                     + ". largest free capacity of an OSD: "
+                                                     + str(largest_free_capacity)
+                                                     + ", total OSD capacity: " + str(distribution.get_total_capacity())
+                                                     + ", current total folder size: "
+                                                     + str(distribution.get_total_folder_size()))
+        self.folder = a_folder
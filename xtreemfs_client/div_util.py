@@ -2,10 +2,89 @@ import subprocess
 import sys
 import socket
 import os
-import time
+import json
+import shlex
+import shutil
+
+from xtreemfs_client import commandExecutor
+
+# extended attribute under which the XtreemFS client exposes the replica locations (xlocset) of a file
+locations_xattr = 'xtreemfs.locations'
+
+# replication flag of a replica that holds all objects of its file
+replication_flag_is_complete = 1
 
 
 def get_osd_uuids(path):
+    """
+    get the uuids of all OSDs holding a replica of the given file.
+    the replica locations are read in-process from the extended attributes of the file.
+    if this is not possible, xtfsutil is used as a fallback.
+    """
+    replicas = get_replicas(path)
+    if replicas is None:
+        return get_osd_uuids_xtfsutil(path)
+    osd_list = []
+    for osd_uuids, _ in replicas:
+        osd_list.extend(osd_uuids)
+    return osd_list
+
+
+def get_replicas(path):
+    """
+    read the replicas of the given file from the extended attribute xtreemfs.locations.
+    returns a list of tuples (list of osd uuids, replication flags), one tuple for each replica,
+    or None if the extended attribute could not be read, e.g.,
+    because the file is not on an XtreemFS volume or the platform does not support extended attributes.
+    """
+    try:
+        locations = json.loads(os.getxattr(path, locations_xattr).decode('UTF-8'))
+        replicas = []
+        for replica in locations['replicas']:
+            osd_uuids = list(map(lambda x: x['uuid'], replica['osds']))
+            replicas.append((osd_uuids, replica.get('replication-flags', 0)))
+        return replicas
+    except (AttributeError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def parse_xtfsutil_replicas(output):
+    """
+    parse the replica section of the output of xtfsutil for a file.
+    only the 'complete' flag is extracted from the 'Replication Flags' line of each replica.
+    """
+    replicas = []
+    for splitString in output.split('\n'):
+        stripped = splitString.strip()
+        if stripped.startswith("Replica ") and not stripped.startswith("Replica Selection"):
+            replicas.append(([], 0))
+        elif stripped.startswith("Replication Flags") and len(replicas) > 0:
+            flags = stripped[len("Replication Flags"):].replace(',', ' ').split()
+            if "complete" in flags:
+                replicas[-1] = (replicas[-1][0], replicas[-1][1] | replication_flag_is_complete)
+        elif stripped.startswith("OSD "):
+            end_index = splitString.rfind(" ")
+            begin_index = splitString.rfind(" ", 0, end_index) + 1
+            if len(replicas) == 0:
+                replicas.append(([], 0))
+            replicas[-1][0].append(splitString[begin_index:end_index])
+    return replicas
+
+
+def is_replica_complete(replicas, osd_uuid):
+    """
+    check whether the given replicas (as returned by get_replicas) contain a complete replica on the given OSD.
+    """
+    for osd_uuids, flags in replicas:
+        if osd_uuid in osd_uuids and flags & replication_flag_is_complete:
+            return True
+    return False
+
+
+def get_osd_uuids_xtfsutil(path):
+    """
+    get the uuids of all OSDs holding a replica of the given file, by parsing the output of xtfsutil.
+    """
     xtfsutil = subprocess.run(["xtfsutil", path],
                               stdout=subprocess.PIPE, universal_newlines=True)
     string_elements = xtfsutil.stdout.split('\n')
@@ -20,22 +99,15 @@ def get_osd_uuids(path):
 
 
 def create_replication_policy_command(absolute_file_path):
-    return command_list_to_single_string(["xtfsutil", "-r", "RONLY", absolute_file_path])
+    return ["xtfsutil", "-r", "RONLY", absolute_file_path]
 
 
 def create_create_replica_command(absolute_file_path, new_osd):
-    return command_list_to_single_string(["xtfsutil", "-a" + new_osd, "--full", absolute_file_path])
+    return ["xtfsutil", "-a" + new_osd, "--full", absolute_file_path]
 
 
 def create_delete_replica_command(absolute_file_path, osd):
-    return command_list_to_single_string(["xtfsutil", "-d", osd, absolute_file_path])
-
-
-def command_list_to_single_string(command_list):
-    single_string = ""
-    for command in command_list:
-        single_string = single_string + command + " "
-    return single_string
+    return ["xtfsutil", "-d", osd, absolute_file_path]
 
 
 def print_error(finished_process):
@@ -48,81 +120,30 @@ def print_error(finished_process):
     print(str(finished_process[1][1]))
 
 
-def run_commands(commands, max_processes=200, print_errors=True):
+def run_commands(commands, max_processes=200, print_errors=True, timeout=None):
     """
-    execute list of commands in parallel, return list of executions returned with an error
+    execute list of commands in parallel, return list of executions returned with an error.
+    commands are argument lists (strings are split like a shell would do it, but no shell is involved).
+    at most max_processes commands are running at the same time, and commands running longer than timeout seconds
+    are killed.
+    each returned execution is a tuple (args, (stdout, stderr), returncode).
     """
-    # running_processes = set()
-    running_processes_map = {}
     errored_processes = []
-    num_finished = 0
-    num_total = len(commands)
-    for command in commands:
-        started_process = subprocess.Popen(command, stderr=subprocess.PIPE, stdout=subprocess.PIPE, shell=True)
-        # running_processes.add(started_process)
-        start_time = time.time()
-        running_processes_map[started_process] = start_time
-        # if len(running_processes) >= max_processes:
-        if len(running_processes_map) >= max_processes:
-            os.wait()
-            difference = set()
-            # for running_process in running_processes:
-            for running_process in running_processes_map.keys():
-                if running_process.poll() is not None:
-                    num_finished += 1
-                    difference.add(running_process)
-                    finished_process = (running_process.args,
-                                        running_process.communicate(),
-                                        running_process.returncode)
-                    if finished_process[2] != 0:
-                        errored_processes.append(finished_process)
-                        if print_errors:
-                            print_error(finished_process)
-                            # print("progress: " + str(num_finished) + "/" + str(num_total))
-
-            # running_processes = running_processes.difference(difference)
-            for finished_process in difference:
-                del running_processes_map[finished_process]
-
-    timeout_processes = 0
-    # for finished_process in running_processes:
-    for still_running_process in running_processes_map:
-        try:
-            stdout, stderr = still_running_process.communicate(timeout=10)
-        except subprocess.TimeoutExpired:
-            print("process timed out: " + str(still_running_process.args))
-            still_running_process.kill()
-            print("process killed.")
-            try:
-                stdout, stderr = still_running_process.communicate(timeout=10)
-            except subprocess.TimeoutExpired:
-                timeout_processes += 1
-                continue
-
-        still_running_process = (still_running_process.args,
-                                 (stdout, stderr),
-                                 still_running_process.returncode)
-        if still_running_process[2] != 0:
-            errored_processes.append(still_running_process)
-            if print_errors:
-                print_error(still_running_process)
-
-        num_finished += 1
-        # print("progress: " + str(num_finished) + "/" + str(num_total))
 
-    if timeout_processes > 0:
-        print("number of processes with expired timeout: " + str(timeout_processes))
+    def collect_error(result):
+        if not result.succeeded():
+            if result.timed_out:
+                print("process timed out and was killed: " + str(result.args))
+            errored_process = (result.args, (result.stdout, result.stderr), result.returncode)
+            errored_processes.append(errored_process)
+            if print_errors:
+                print_error(errored_process)
 
+    argument_lists = map(lambda x: shlex.split(x) if isinstance(x, str) else x, commands)
+    executor = commandExecutor.CommandExecutor(max_concurrency=max_processes, timeout=timeout,
+                                               callback=collect_error)
+    executor.run(argument_lists)
     return errored_processes
-    # return list(map(lambda proc: (proc.args, proc.communicate(), proc.returncode), all_processes))
-
-
-def print_process_list(processes):
-    for process in processes:
-        print("command: " + str(process[0]))
-        print("stout: " + str(process[1][0]))
-        print("stderr: " + str(process[1][1]))
-        print("returncode: " + str(process[2]))
 
 
 def extract_volume_information(string):
@@ -225,11 +246,7 @@ def check_for_executable(executable):
     """
     check whether the given program exists in $PATH
     """
-    try:
-        subprocess.run([executable], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except FileNotFoundError:
-        return False
-    return True
+    return shutil.which(executable) is not None
 
 
 def remove_leading_trailing_slashes(string):
@@ -247,3 +264,31 @@ def remove_leading_trailing_slashes(string):
         if len(string) == 0:
             return string
     return string
+
+
+def parse_size(string):
+    """
+    parse a size in bytes, optionally with a binary suffix (K, M, G or T), e.g., 100M.
+    """
+    string = string.strip()
+    suffixes = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if len(string) > 0 and string[-1].upper() in suffixes:
+        return int(float(string[:-1]) * suffixes[string[-1].upper()])
+    return int(float(string))
+
+
+def parse_rate_limits(string):
+    """
+    parse OSD rate limits (in bytes/sec), given as comma-separated list of entries uuid=rate or rate,
+    where an entry without uuid applies to all OSDs not listed.
+    returns a tuple (map from uuid to rate limit, default rate limit or None).
+    """
+    osd_rate_limits = {}
+    default_rate_limit = None
+    for entry in string.split(','):
+        if '=' in entry:
+            osd_uuid, rate_limit = entry.split('=', 1)
+            osd_rate_limits[osd_uuid.strip()] = parse_size(rate_limit)
+        elif len(entry.strip()) > 0:
+            default_rate_limit = parse_size(entry)
+    return osd_rate_limits, default_rate_limit
@@ -0,0 +1,114 @@
+"""
+persistent cache of folder sizes, such that only folders that have changed need to be scanned again.
+"""
+import concurrent.futures
+import json
+import os
+
+from xtreemfs_client import folderSizeScanner
+
+cache_format_version = 1
+
+
+class FolderSizeCache(object):
+    """
+    caches the FolderSize (size, number of files and directory modification times) of folders below base_folder
+    in a json file.
+
+    a cached size is used as long as the modification times of all directories of the folder are unchanged.
+    creating, deleting or renaming files and directories changes the modification time of the containing
+    directory, so checking a folder costs one stat per directory instead of one stat per file.
+    modifying the content of an existing file in place does not change any directory modification time and is
+    therefore not detected; such folders must be scanned again explicitly (see invalidate).
+    """
+
+    def __init__(self, cache_file, base_folder):
+        self.cache_file = cache_file
+        self.base_folder = base_folder
+        self.folder_sizes = {}
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def load(self):
+        """
+        read the cache file. returns False (and starts with an empty cache) if it can not be read.
+        """
+        self.folder_sizes = {}
+        try:
+            with open(self.cache_file) as f:
+                values = json.load(f)
+        except (IOError, ValueError):
+            return False
+        if values.get('version') != cache_format_version:
+            return False
+        for relative_path, entry in values['folders'].items():
+            self.folder_sizes[relative_path] = folderSizeScanner.FolderSize(entry['apparent_size'],
+                                                                            entry['allocated_size'],
+                                                                            entry['num_files'],
+                                                                            entry['directory_mtimes'])
+        return True
+
+    def save(self):
+        folders = {}
+        for relative_path, folder_size in self.folder_sizes.items():
+            folders[relative_path] = {'apparent_size': folder_size.apparent_size,
+                                      'allocated_size': folder_size.allocated_size,
+                                      'num_files': folder_size.num_files,
+                                      'directory_mtimes': folder_size.directory_mtimes}
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': cache_format_version, 'folders': folders}, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def get_relative_path(self, path):
+        return os.path.relpath(path, self.base_folder)
+
+    def is_valid(self, path):
+        """
+        check whether the cached size of the folder at path is still up to date.
+        """
+        folder_size = self.folder_sizes.get(self.get_relative_path(path))
+        if folder_size is None:
+            return False
+        for directory, mtime in folder_size.directory_mtimes.items():
+            try:
+                if os.stat(os.path.join(path, directory), follow_symlinks=False).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def get_folder_size(self, path):
+        """
+        get the FolderSize of the folder at path, from the cache if it is up to date, by scanning it otherwise.
+        """
+        if self.is_valid(path):
+            self.num_hits += 1
+            return self.folder_sizes[self.get_relative_path(path)]
+        self.num_misses += 1
+        folder_size = folderSizeScanner.scan_folder(path)
+        self.folder_sizes[self.get_relative_path(path)] = folder_size
+        return folder_size
+
+    def get_folder_sizes(self, paths, parallelism=16):
+        """
+        get the FolderSizes of all given folders, checking and scanning up to parallelism folders concurrently.
+        returns a map from path to FolderSize.
+        """
+        paths = list(paths)
+        if len(paths) == 0:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(paths)))) as executor:
+            return dict(zip(paths, executor.map(self.get_folder_size, paths)))
+
+    def invalidate(self, path):
+        self.folder_sizes.pop(self.get_relative_path(path), None)
+
+    def retain(self, paths):
+        """
+        remove all folders but the given ones from the cache, e.g., folders that have been deleted.
+        """
+        relative_paths = set(map(self.get_relative_path, paths))
+        for relative_path in list(self.folder_sizes.keys()):
+            if relative_path not in relative_paths:
+                del self.folder_sizes[relative_path]
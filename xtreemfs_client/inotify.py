@@ -0,0 +1,143 @@
+"""
+minimal ctypes wrapper around the linux inotify API, used to watch the managed folder for changes.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+# the events needed to follow the creation, modification and deletion of files and directories
+default_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+event_header = struct.Struct('iIII')
+
+
+class InotifyEvent(object):
+    """
+    one inotify event. path is the path of the watched directory the event refers to, name the name of the entry
+    in this directory (empty for events on the directory itself).
+    """
+
+    def __init__(self, wd, mask, cookie, name, path):
+        self.wd = wd
+        self.mask = mask
+        self.cookie = cookie
+        self.name = name
+        self.path = path
+
+    def get_full_path(self):
+        if self.path is None:
+            return None
+        if self.name == '':
+            return self.path
+        return os.path.join(self.path, self.name)
+
+    def is_dir(self):
+        return bool(self.mask & IN_ISDIR)
+
+    def __str__(self):
+        return "inotify event: path: " + str(self.get_full_path()) + " mask: " + hex(self.mask) \
+               + " cookie: " + str(self.cookie)
+
+
+class Inotify(object):
+    """
+    an inotify instance. watches are added per directory (inotify does not watch recursively),
+    and the watched path of each watch descriptor is kept, such that events can be mapped to full paths.
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, "inotify_init1 failed: " + os.strerror(error))
+        self.paths = {}
+        self.watch_descriptors = {}
+
+    def add_watch(self, path, mask=default_mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, "inotify_add_watch failed: " + os.strerror(error), path)
+        self.paths[wd] = path
+        self.watch_descriptors[path] = wd
+        return wd
+
+    def remove_watch(self, path):
+        wd = self.watch_descriptors.pop(path, None)
+        if wd is None:
+            return
+        del self.paths[wd]
+        # fails if the watch has already been removed by the kernel, e.g., because the directory was deleted
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def remove_watches_below(self, path):
+        """
+        remove the watches of path and of all watched directories below path.
+        """
+        for watched_path in list(self.watch_descriptors.keys()):
+            if watched_path == path or watched_path.startswith(path + '/'):
+                self.remove_watch(watched_path)
+
+    def is_watched(self, path):
+        return path in self.watch_descriptors
+
+    def read_events(self, timeout=None):
+        """
+        wait up to timeout seconds (forever if None) for events, and return all events available then.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if len(readable) == 0:
+            return []
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, cookie, name_length = event_header.unpack_from(buffer, offset)
+                offset += event_header.size
+                name = os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+                offset += name_length
+                path = self.paths.get(wd)
+                if mask & IN_IGNORED:
+                    # the watch has been removed, either explicitly or because the directory is gone
+                    if path is not None and self.watch_descriptors.get(path) == wd:
+                        del self.watch_descriptors[path]
+                    self.paths.pop(wd, None)
+                events.append(InotifyEvent(wd, mask, cookie, name, path))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.paths = {}
+        self.watch_descriptors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,92 @@
+"""
+priority queue of OSDs for the LPT (largest processing time first) algorithm.
+"""
+import heapq
+
+
+class LPTQueue(object):
+    """
+    priority queue yielding, for a given folder size, the OSD with the smallest processing time
+    (total_folder_size + folder_size) / bandwidth among all OSDs with enough free capacity.
+
+    the processing time of an OSD depends on the folder size, so one heap for all OSDs does not work.
+    however, among OSDs with the same bandwidth, the order by processing time is the order by total_folder_size.
+    therefore, the OSDs are grouped by bandwidth, and each group is kept in a heap keyed on
+    (total_folder_size, position). a query only compares the heads of all groups, so it takes time linear in the
+    number of distinct bandwidths (plus logarithmic time in the size of a group). the queue is therefore only faster
+    than a linear scan over all OSDs if there are few distinct bandwidths, e.g., one per kind of disk. if every OSD
+    has a bandwidth of its own, it degrades to a linear scan, but still returns the same OSDs.
+
+    ties are broken by the position of the OSD in the list given to the constructor, such that the queue returns
+    exactly the OSD that a linear scan over this list (as in DataDistribution.get_lpt_osd) would return.
+
+    the queue is only correct as long as the OSDs are modified exclusively through add_folder.
+    """
+
+    def __init__(self, osds):
+        self.osds = list(osds)
+        # heap entries are (total_folder_size, position, version). an entry is outdated if its version is not
+        # the current version of the OSD at position. outdated entries are dropped when they reach the head.
+        self.versions = [0] * len(self.osds)
+        self.positions = {}
+        self.heaps = {}
+        for position, one_osd in enumerate(self.osds):
+            self.positions[one_osd.uuid] = position
+            if one_osd.bandwidth not in self.heaps:
+                self.heaps[one_osd.bandwidth] = []
+            self.heaps[one_osd.bandwidth].append((one_osd.total_folder_size, position, 0))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def get_lpt_osd(self, folder_size):
+        """
+        return (OSD with the smallest processing time after adding folder_size, this processing time),
+        considering only OSDs with at least folder_size free capacity.
+        if there is no such OSD, (None, -1) is returned.
+        """
+        best_processing_time = -1
+        best_position = None
+        for bandwidth, heap in self.heaps.items():
+            position = self.__get_first_suitable(heap, folder_size)
+            if position is None:
+                continue
+            processing_time = (self.osds[position].total_folder_size + folder_size) / bandwidth
+            if best_position is None or processing_time < best_processing_time \
+                    or (processing_time == best_processing_time and position < best_position):
+                best_processing_time = processing_time
+                best_position = position
+
+        if best_position is None:
+            return None, -1
+        return self.osds[best_position], best_processing_time
+
+    def add_folder(self, one_osd, folder_id, folder_size):
+        """
+        add the folder to the given OSD (which must be part of this queue) and update the queue accordingly.
+        """
+        position = self.positions[one_osd.uuid]
+        one_osd.add_folder(folder_id, folder_size)
+        self.versions[position] += 1
+        heapq.heappush(self.heaps[one_osd.bandwidth],
+                       (one_osd.total_folder_size, position, self.versions[position]))
+
+    def __get_first_suitable(self, heap, folder_size):
+        """
+        return the position of the first OSD of the heap that has enough free capacity for folder_size,
+        or None if there is no such OSD.
+        """
+        unsuitable = []
+        position = None
+        while len(heap) > 0:
+            _, candidate_position, version = heap[0]
+            if version != self.versions[candidate_position]:
+                heapq.heappop(heap)
+                continue
+            candidate = self.osds[candidate_position]
+            if candidate.capacity - candidate.total_folder_size - folder_size >= 0:
+                position = candidate_position
+                break
+            unsuitable.append(heapq.heappop(heap))
+        for entry in unsuitable:
+            heapq.heappush(heap, entry)
+        return position
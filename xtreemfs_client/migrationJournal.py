@@ -0,0 +1,150 @@
+"""
+durable journal of a migration done by the PhysicalPlacementRealizer, such that an interrupted migration can be
+resumed.
+"""
+import json
+import os
+import sqlite3
+import time
+
+journal_format_version = 1
+
+# states of a file in the journal. files that are already on their target OSD when the migration starts are not
+# recorded at all.
+file_scheduled = 'scheduled'
+file_policy_set = 'policy_set'
+file_replica_added = 'replica_added'
+file_moved = 'moved'
+
+
+class MigrationJournal(object):
+    """
+    records, in an SQLite database,
+    - the scope of the migration (the folder ids given to realize_placement, or all folders) and its strategy,
+    - the folders whose files have been checked, together with the files that need to be moved,
+    - the state of each of these files (scheduled, policy set, new replica added, moved, i.e., old replica deleted).
+
+    the journal never claims more progress than has actually been made, but it may claim less: state changes are
+    buffered and written in batches (at least every flush_interval_secs), so after a crash some files may have to be
+    checked again. this is harmless, as a resumed migration checks the actual replicas of every file that is not
+    recorded as moved (see PhysicalPlacementRealizer.realize_placement).
+    """
+
+    def __init__(self, path, flush_interval_secs=10, flush_batch_size=1000):
+        self.path = path
+        self.flush_interval_secs = flush_interval_secs
+        self.flush_batch_size = flush_batch_size
+        self.connection = None
+        # buffered state changes: list of (state, path)
+        self.pending_states = []
+        self.last_flush = time.time()
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS folders (folder_id TEXT PRIMARY KEY)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder_id TEXT, "
+                                    "origin_osd TEXT, target_osd TEXT, state TEXT)")
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def get_meta(self, key):
+        if not os.path.isfile(self.path):
+            return None
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def has_unfinished_migration(self):
+        return self.get_meta('status') == 'running'
+
+    def get_scope(self):
+        """
+        the folder ids the unfinished migration is restricted to, or None if it covers all folders.
+        """
+        return self.get_meta('folder_ids')
+
+    def get_strategy(self):
+        return self.get_meta('strategy')
+
+    def begin(self, folder_ids, strategy):
+        """
+        start a new migration, discarding the journal of any previous migration.
+        """
+        if folder_ids is not None:
+            folder_ids = list(folder_ids)
+        connection = self.connect()
+        self.pending_states = []
+        with connection:
+            connection.execute("DELETE FROM meta")
+            connection.execute("DELETE FROM folders")
+            connection.execute("DELETE FROM files")
+            connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                   [('format_version', json.dumps(journal_format_version)),
+                                    ('status', json.dumps('running')),
+                                    ('folder_ids', json.dumps(folder_ids)),
+                                    ('strategy', json.dumps(strategy))])
+
+    def finish(self):
+        """
+        mark the migration as finished, such that it is not resumed.
+        """
+        self.flush()
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('status', ?)",
+                               (json.dumps('finished'),))
+
+    def folder_checked(self, folder_id, files_to_move):
+        """
+        record that all files of the given folder have been checked, and which of them (FileToMove objects)
+        need to be moved.
+        """
+        self.flush()
+        with self.connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO files (path, folder_id, origin_osd, target_osd, state) "
+                                   "VALUES (?, ?, ?, ?, ?)",
+                                   [(x.absolute_file_path, folder_id, x.origin_osd, x.target_osd, file_scheduled)
+                                    for x in files_to_move])
+            connection.execute("INSERT OR REPLACE INTO folders (folder_id) VALUES (?)", (folder_id,))
+
+    def get_checked_folders(self):
+        return set(row[0] for row in self.connect().execute("SELECT folder_id FROM folders"))
+
+    def get_unfinished_files(self):
+        """
+        absolute paths of the recorded files that have not been moved yet.
+        """
+        self.flush()
+        return [row[0] for row in self.connect().execute("SELECT path FROM files WHERE state != ?", (file_moved,))]
+
+    def get_file_states(self):
+        """
+        map from absolute path to state of all recorded files.
+        """
+        self.flush()
+        return dict(self.connect().execute("SELECT path, state FROM files"))
+
+    def record_file_state(self, absolute_file_path, state):
+        self.pending_states.append((state, absolute_file_path))
+        if len(self.pending_states) >= self.flush_batch_size \
+                or time.time() - self.last_flush >= self.flush_interval_secs:
+            self.flush()
+
+    def record_file_states(self, absolute_file_paths, state):
+        for absolute_file_path in absolute_file_paths:
+            self.record_file_state(absolute_file_path, state)
+
+    def flush(self):
+        self.last_flush = time.time()
+        if len(self.pending_states) == 0:
+            return
+        with self.connect() as connection:
+            connection.executemany("UPDATE files SET state = ? WHERE path = ?", self.pending_states)
+        self.pending_states = []
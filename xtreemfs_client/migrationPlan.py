@@ -0,0 +1,163 @@
+"""
+migration plans: the folder assignments and file movements of an internal migration, calculated without executing
+anything, such that they can be reviewed, estimated and later executed as they are.
+"""
+import collections
+import datetime
+import json
+
+from xtreemfs_client import migrationScheduler
+from xtreemfs_client import osd
+from xtreemfs_client import physicalPlacementRealizer
+
+plan_format_version = 2
+
+
+class MigrationPlan(object):
+    """
+    a migration plan consists of
+    - assignments: list of (folder_id, osd_uuid, folder_size), the folder assignments to be applied (as
+      filenamePrefix rules and in the data distribution) before files are moved,
+    - files_to_move: list of FileToMove objects,
+    - folder_ids: the folders covered by the plan (None for all folders),
+    - osd_bandwidths: map from OSD uuid to bandwidth, used for estimating the duration.
+    """
+
+    def __init__(self, files_to_move, assignments=None, folder_ids=None, osd_bandwidths=None):
+        self.files_to_move = files_to_move
+        if assignments is None:
+            assignments = []
+        self.assignments = assignments
+        if folder_ids is not None:
+            folder_ids = list(folder_ids)
+        self.folder_ids = folder_ids
+        if osd_bandwidths is None:
+            osd_bandwidths = {}
+        self.osd_bandwidths = osd_bandwidths
+
+    def get_movement_summary(self):
+        """
+        map from (origin OSD, target OSD) to (number of files, number of bytes).
+        """
+        summary = collections.OrderedDict()
+        for file_to_move in self.files_to_move:
+            movement_key = (file_to_move.origin_osd, file_to_move.target_osd)
+            num_files, num_bytes = summary.get(movement_key, (0, 0))
+            summary[movement_key] = (num_files + 1, num_bytes + migrationScheduler.get_file_size(file_to_move))
+        return summary
+
+    def get_total_bytes(self):
+        return sum(map(migrationScheduler.get_file_size, self.files_to_move))
+
+    def get_osd_estimates(self, max_files_in_progress_per_osd=200, per_file_overhead_secs=1, osd_rate_limits=None,
+                          default_rate_limit=None):
+        """
+        map from OSD uuid to the estimated time (in seconds) the OSD needs for its part of the migration:
+        the maximum of
+        - the time for sending or receiving all its bytes (each byte is read from the origin OSD and written to the
+          target OSD) at its bandwidth (see osd.bytes_per_sec_per_bandwidth_unit) or its rate limit, if lower,
+        - the time for the per-file overhead (xtfsutil calls, waiting for completion), with
+          max_files_in_progress_per_osd files in progress at the same time.
+        """
+        if osd_rate_limits is None:
+            osd_rate_limits = {}
+        bytes_per_osd = collections.Counter()
+        files_per_osd = collections.Counter()
+        for file_to_move in self.files_to_move:
+            for osd_uuid in set([file_to_move.origin_osd, file_to_move.target_osd]):
+                bytes_per_osd[osd_uuid] += migrationScheduler.get_file_size(file_to_move)
+                files_per_osd[osd_uuid] += 1
+
+        estimates = {}
+        for osd_uuid in files_per_osd.keys():
+            rate = self.osd_bandwidths.get(osd_uuid, 1) * osd.bytes_per_sec_per_bandwidth_unit
+            rate_limit = osd_rate_limits.get(osd_uuid, default_rate_limit)
+            if rate_limit is not None:
+                rate = min(rate, rate_limit)
+            transfer_secs = bytes_per_osd[osd_uuid] / rate
+            overhead_secs = files_per_osd[osd_uuid] * per_file_overhead_secs / max_files_in_progress_per_osd
+            estimates[osd_uuid] = max(transfer_secs, overhead_secs)
+        return estimates
+
+    def estimate_duration(self, max_files_in_progress=10000, max_files_in_progress_per_osd=200,
+                          per_file_overhead_secs=1, osd_rate_limits=None, default_rate_limit=None):
+        """
+        estimate the wall-clock time of the migration in seconds: the time of the slowest OSD (see
+        get_osd_estimates), but at least the per-file overhead of all files with max_files_in_progress files in
+        progress at the same time. this assumes that the movement strategy keeps all OSDs busy, which is
+        approximately true for the pipelined and byte_balanced strategies.
+        """
+        osd_estimates = self.get_osd_estimates(max_files_in_progress_per_osd, per_file_overhead_secs,
+                                               osd_rate_limits, default_rate_limit)
+        total_overhead_secs = len(self.files_to_move) * per_file_overhead_secs / max_files_in_progress
+        return max([total_overhead_secs] + list(osd_estimates.values()))
+
+    def report(self, **estimate_args):
+        """
+        human readable summary of the plan. estimate_args are passed to estimate_duration and get_osd_estimates.
+        """
+        summary = self.get_movement_summary()
+        representation = "migration plan: " + str(len(self.assignments)) + " folder assignments, " \
+                         + str(len(self.files_to_move)) + " files (" + format_bytes(self.get_total_bytes()) \
+                         + ") to be moved\n"
+        for (origin_osd, target_osd), (num_files, num_bytes) in summary.items():
+            representation += "  " + str(origin_osd) + " -> " + str(target_osd) + ": " + str(num_files) \
+                              + " files, " + format_bytes(num_bytes) + "\n"
+
+        osd_estimate_args = dict(estimate_args)
+        osd_estimate_args.pop('max_files_in_progress', None)
+        osd_estimates = self.get_osd_estimates(**osd_estimate_args)
+        for osd_uuid in sorted(osd_estimates.keys()):
+            representation += "  estimated time of OSD " + osd_uuid + ": " \
+                              + str(datetime.timedelta(seconds=round(osd_estimates[osd_uuid]))) + "\n"
+        representation += "estimated duration: " \
+                          + str(datetime.timedelta(seconds=round(self.estimate_duration(**estimate_args))))
+        return representation
+
+    def to_json(self):
+        files = []
+        for file_to_move in self.files_to_move:
+            files.append({'path': file_to_move.absolute_file_path,
+                          'origin_osd': file_to_move.origin_osd,
+                          'target_osd': file_to_move.target_osd,
+                          'size': file_to_move.size,
+                          'set_policy': file_to_move.set_policy,
+                          'create_replica': file_to_move.create_replica,
+                          'delete_osd': file_to_move.delete_osd})
+        return {'format_version': plan_format_version,
+                'created': datetime.datetime.now().isoformat(),
+                'folder_ids': self.folder_ids,
+                'assignments': [{'folder_id': folder_id, 'osd': osd_uuid, 'size': folder_size}
+                                for folder_id, osd_uuid, folder_size in self.assignments],
+                'osd_bandwidths': self.osd_bandwidths,
+                'files': files}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+
+def from_json(values):
+    if values.get('format_version') != plan_format_version:
+        raise ValueError("unsupported migration plan format: " + str(values.get('format_version')))
+    files_to_move = []
+    for entry in values['files']:
+        # the xtfsutil commands are built from these fields, see physicalPlacementRealizer.FileToMove
+        files_to_move.append(physicalPlacementRealizer.FileToMove(entry['path'], entry['origin_osd'],
+                                                                  entry['target_osd'], entry['set_policy'],
+                                                                  entry['create_replica'], entry['delete_osd'],
+                                                                  entry['size']))
+    assignments = [(entry['folder_id'], entry['osd'], entry['size']) for entry in values['assignments']]
+    return MigrationPlan(files_to_move, assignments, values['folder_ids'], values['osd_bandwidths'])
+
+
+def load(path):
+    with open(path) as f:
+        return from_json(json.load(f))
+
+
+def format_bytes(num_bytes):
+    for unit in ['B', 'KiB', 'MiB', 'GiB', 'TiB']:
+        if abs(num_bytes) < 1024 or unit == 'TiB':
+            return str(round(num_bytes, 1)) + " " + unit
+        num_bytes /= 1024
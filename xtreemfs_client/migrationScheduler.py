@@ -0,0 +1,348 @@
+"""
+schedulers deciding which files of an internal migration (moving files between OSDs using xtreemfs replication)
+are started next.
+"""
+import collections
+import time
+
+from xtreemfs_client import osd
+
+
+class MigrationScheduler(object):
+    """
+    keeps the files that still need to be moved, grouped by (origin OSD, target OSD), and hands them out such that
+    at most max_files_in_progress files are in progress in total, and at most max_files_in_progress_per_osd files
+    per OSD (counting both the origin and the target OSD of a file).
+    movement keys are served round-robin, so that all OSD pairs make progress at the same time.
+    """
+
+    def __init__(self, max_files_in_progress=10000, max_files_in_progress_per_osd=200):
+        self.max_files_in_progress = max_files_in_progress
+        self.max_files_in_progress_per_osd = max_files_in_progress_per_osd
+        self.pending = collections.OrderedDict()
+        self.num_pending = 0
+        self.in_progress = 0
+        self.in_progress_per_osd = collections.Counter()
+
+    def add_file(self, file_to_move):
+        movement_key = (file_to_move.origin_osd, file_to_move.target_osd)
+        if movement_key not in self.pending:
+            self.pending[movement_key] = collections.deque()
+        self.pending[movement_key].append(file_to_move)
+        self.num_pending += 1
+
+    def add_files(self, files_to_move):
+        for file_to_move in files_to_move:
+            self.add_file(file_to_move)
+
+    def has_pending_files(self):
+        return self.num_pending > 0
+
+    def get_pending_files(self):
+        pending_files = []
+        for files_of_key in self.pending.values():
+            pending_files.extend(files_of_key)
+        return pending_files
+
+    def next_files(self):
+        """
+        get the files that can be started now, and mark them as in progress.
+        """
+        next_files = []
+        progress = True
+        while progress and self.in_progress < self.max_files_in_progress:
+            progress = False
+            for movement_key in self.get_movement_keys():
+                if movement_key not in self.pending:
+                    continue
+                if self.in_progress >= self.max_files_in_progress:
+                    break
+                if not self.can_start(movement_key):
+                    continue
+                file_to_move = self.pending[movement_key].popleft()
+                if len(self.pending[movement_key]) == 0:
+                    del self.pending[movement_key]
+                self.num_pending -= 1
+                self.start(file_to_move)
+                next_files.append(file_to_move)
+                progress = True
+        return next_files
+
+    def get_movement_keys(self):
+        """
+        the movement keys with pending files, in the order they are served.
+        """
+        return list(self.pending.keys())
+
+    def can_start(self, movement_key):
+        for osd_uuid in get_osds(movement_key):
+            if self.in_progress_per_osd[osd_uuid] >= self.max_files_in_progress_per_osd:
+                return False
+        return True
+
+    def start(self, file_to_move):
+        self.in_progress += 1
+        for osd_uuid in get_osds((file_to_move.origin_osd, file_to_move.target_osd)):
+            self.in_progress_per_osd[osd_uuid] += 1
+
+    def finished(self, file_to_move, succeeded=True):
+        """
+        mark a file handed out by next_files as no longer in progress.
+        """
+        self.in_progress -= 1
+        for osd_uuid in get_osds((file_to_move.origin_osd, file_to_move.target_osd)):
+            self.in_progress_per_osd[osd_uuid] -= 1
+
+    def get_next_start_delay(self):
+        """
+        seconds until files may be started again even if no file in progress finishes, or None if this only
+        happens when files finish.
+        """
+        return None
+
+
+class ByteAwareMigrationScheduler(MigrationScheduler):
+    """
+    a MigrationScheduler that additionally limits the bytes in flight (the sizes of the files in progress) per OSD,
+    again counting both the origin and the target OSD of a file.
+
+    each OSD may have as many bytes in flight as it can transfer in max_in_flight_secs, according to its bandwidth
+    in the given DataDistribution (see osd.bytes_per_sec_per_bandwidth_unit). an OSD without files in progress
+    always accepts one file, regardless of its size. if max_in_flight_secs is None, bytes in flight are not limited.
+
+    osd_rate_limits optionally maps OSD uuids to a maximum migration rate in bytes/sec (default_rate_limit applies
+    to all other OSDs, if not None), e.g., to leave bandwidth for production jobs reading from an OSD.
+    rate limits are enforced with token buckets: starting a file takes its size from the buckets of its OSDs,
+    which may become negative, and files are only started on OSDs whose bucket is positive. buckets are refilled
+    at the rate limit, up to rate_limit_burst_secs times the rate limit.
+    """
+
+    def __init__(self, distribution=None, max_files_in_progress=10000, max_files_in_progress_per_osd=200,
+                 max_in_flight_secs=10, osd_rate_limits=None, default_rate_limit=None, rate_limit_burst_secs=1):
+        super(ByteAwareMigrationScheduler, self).__init__(max_files_in_progress, max_files_in_progress_per_osd)
+        self.distribution = distribution
+        self.max_in_flight_secs = max_in_flight_secs
+        if osd_rate_limits is None:
+            osd_rate_limits = {}
+        self.osd_rate_limits = osd_rate_limits
+        self.default_rate_limit = default_rate_limit
+        self.rate_limit_burst_secs = rate_limit_burst_secs
+        self.bytes_in_flight_per_osd = collections.Counter()
+        # token buckets: map from OSD uuid to (tokens, time of the last refill)
+        self.tokens = {}
+
+    def get_max_bytes_in_flight(self, osd_uuid):
+        if self.max_in_flight_secs is None:
+            return float('inf')
+        bandwidth = 1
+        if self.distribution is not None and osd_uuid in self.distribution.OSDs:
+            bandwidth = self.distribution.OSDs[osd_uuid].bandwidth
+        return bandwidth * osd.bytes_per_sec_per_bandwidth_unit * self.max_in_flight_secs
+
+    def get_rate_limit(self, osd_uuid):
+        return self.osd_rate_limits.get(osd_uuid, self.default_rate_limit)
+
+    def get_tokens(self, osd_uuid, now=None):
+        """
+        the current content of the token bucket of the given OSD (None if it has no rate limit).
+        """
+        rate_limit = self.get_rate_limit(osd_uuid)
+        if rate_limit is None:
+            return None
+        if now is None:
+            now = time.time()
+        burst = rate_limit * self.rate_limit_burst_secs
+        tokens, last_refill = self.tokens.get(osd_uuid, (burst, now))
+        tokens = min(burst, tokens + (now - last_refill) * rate_limit)
+        self.tokens[osd_uuid] = (tokens, now)
+        return tokens
+
+    def can_start(self, movement_key):
+        if not super(ByteAwareMigrationScheduler, self).can_start(movement_key):
+            return False
+        file_size = get_file_size(self.pending[movement_key][0])
+        for osd_uuid in get_osds(movement_key):
+            bytes_in_flight = self.bytes_in_flight_per_osd[osd_uuid]
+            if bytes_in_flight > 0 and bytes_in_flight + file_size > self.get_max_bytes_in_flight(osd_uuid):
+                return False
+            tokens = self.get_tokens(osd_uuid)
+            if tokens is not None and tokens <= 0:
+                return False
+        return True
+
+    def start(self, file_to_move):
+        super(ByteAwareMigrationScheduler, self).start(file_to_move)
+        file_size = get_file_size(file_to_move)
+        for osd_uuid in get_osds((file_to_move.origin_osd, file_to_move.target_osd)):
+            self.bytes_in_flight_per_osd[osd_uuid] += file_size
+            tokens = self.get_tokens(osd_uuid)
+            if tokens is not None:
+                self.tokens[osd_uuid] = (tokens - file_size, self.tokens[osd_uuid][1])
+
+    def finished(self, file_to_move, succeeded=True):
+        super(ByteAwareMigrationScheduler, self).finished(file_to_move, succeeded)
+        file_size = get_file_size(file_to_move)
+        for osd_uuid in get_osds((file_to_move.origin_osd, file_to_move.target_osd)):
+            self.bytes_in_flight_per_osd[osd_uuid] -= file_size
+
+    def get_next_start_delay(self):
+        """
+        seconds until the token bucket of some OSD with pending files becomes positive again.
+        """
+        now = time.time()
+        next_start_delay = None
+        for movement_key in self.pending.keys():
+            for osd_uuid in get_osds(movement_key):
+                tokens = self.get_tokens(osd_uuid, now)
+                if tokens is not None and tokens <= 0:
+                    delay = -tokens / self.get_rate_limit(osd_uuid) + 0.001
+                    if next_start_delay is None or delay < next_start_delay:
+                        next_start_delay = delay
+        return next_start_delay
+
+
+def get_osds(movement_key):
+    """
+    the distinct OSDs involved in a movement (origin, target).
+    """
+    origin_osd, target_osd = movement_key
+    if origin_osd == target_osd:
+        return [origin_osd]
+    return [origin_osd, target_osd]
+
+
+class CapacitySafeMigrationScheduler(ByteAwareMigrationScheduler):
+    """
+    a ByteAwareMigrationScheduler that additionally makes sure that no OSD is filled above fill_threshold (a fraction
+    of its total space) during the migration.
+
+    while a file is moved, it has replicas on both its origin and its target OSD. therefore, the size of a file is
+    added to the used space of its target OSD when the file is started (if a new replica is created), but only
+    subtracted from the used space of its origin OSD when the file has been moved successfully (i.e., its original
+    replica has been deleted). if moving a file fails, the new replica may or may not exist, and it is counted on
+    the target OSD nevertheless. files are only started if their target OSD stays below the fill threshold.
+
+    movement keys are served in the order of the fill level of their origin OSD (fullest first), such that space
+    is freed on full OSDs first, which in turn allows moving files onto them.
+
+    osd_information maps OSD uuids to dicts with 'usable_space' (free space) and 'total_space', in bytes, as read
+    from the DIR status page by the OSDManager. OSDs without information are not limited.
+    """
+
+    def __init__(self, osd_information, fill_threshold=0.95, distribution=None, max_files_in_progress=10000,
+                 max_files_in_progress_per_osd=200, max_in_flight_secs=None, osd_rate_limits=None,
+                 default_rate_limit=None, rate_limit_burst_secs=1):
+        super(CapacitySafeMigrationScheduler, self).__init__(distribution, max_files_in_progress,
+                                                             max_files_in_progress_per_osd, max_in_flight_secs,
+                                                             osd_rate_limits, default_rate_limit,
+                                                             rate_limit_burst_secs)
+        self.fill_threshold = fill_threshold
+        self.total_space = {}
+        self.used_space = {}
+        for osd_uuid, information in osd_information.items():
+            self.total_space[osd_uuid] = information['total_space']
+            self.used_space[osd_uuid] = information['total_space'] - information['usable_space']
+
+    def get_fill_level(self, osd_uuid):
+        if osd_uuid not in self.total_space or self.total_space[osd_uuid] <= 0:
+            return 0
+        return self.used_space[osd_uuid] / self.total_space[osd_uuid]
+
+    def get_movement_keys(self):
+        return sorted(self.pending.keys(), key=lambda x: -self.get_fill_level(x[0]))
+
+    def can_start(self, movement_key):
+        if not super(CapacitySafeMigrationScheduler, self).can_start(movement_key):
+            return False
+        target_osd = movement_key[1]
+        file_to_move = self.pending[movement_key][0]
+        if target_osd not in self.total_space or file_to_move.create_replica_command is None:
+            return True
+        file_size = get_file_size(file_to_move)
+        return self.used_space[target_osd] + file_size <= self.fill_threshold * self.total_space[target_osd]
+
+    def start(self, file_to_move):
+        super(CapacitySafeMigrationScheduler, self).start(file_to_move)
+        if file_to_move.target_osd in self.used_space and file_to_move.create_replica_command is not None:
+            self.used_space[file_to_move.target_osd] += get_file_size(file_to_move)
+
+    def finished(self, file_to_move, succeeded=True):
+        super(CapacitySafeMigrationScheduler, self).finished(file_to_move, succeeded)
+        if succeeded and file_to_move.origin_osd in self.used_space \
+                and file_to_move.delete_replica_command is not None:
+            self.used_space[file_to_move.origin_osd] -= get_file_size(file_to_move)
+
+
+class FolderMajorMigrationScheduler(MigrationScheduler):
+    """
+    a MigrationScheduler that moves the files of one folder after another, such that folders become completely
+    placed (and can be used by data-local jobs) as early as possible, instead of all folders being completed
+    near the end of the migration.
+
+    files are handed out in the order of their folders (file_to_move.folder_id): first the folders in
+    folder_priorities (in this order), then all other folders in the order their first file has been added.
+    files of later folders are only started if the files of earlier folders are blocked by the per-OSD limits, so
+    no OSD stays idle while others are busy with the current folder.
+    """
+
+    def __init__(self, folder_priorities=None, *args, **kwargs):
+        # further arguments are passed on to the next scheduler in the method resolution order, which is
+        # MigrationScheduler (max_files_in_progress, max_files_in_progress_per_osd) unless mixed with other schedulers
+        super(FolderMajorMigrationScheduler, self).__init__(*args, **kwargs)
+        # map from folder id to its rank, i.e., its position in the movement order
+        self.folder_ranks = {}
+        if folder_priorities is not None:
+            for folder_id in folder_priorities:
+                self.folder_ranks.setdefault(folder_id, (0, len(self.folder_ranks)))
+
+    def get_folder_rank(self, folder_id):
+        if folder_id not in self.folder_ranks:
+            self.folder_ranks[folder_id] = (1, len(self.folder_ranks))
+        return self.folder_ranks[folder_id]
+
+    def add_files(self, files_to_move):
+        # the files of each movement key are kept in folder order, so the head of each queue is the file of the
+        # earliest folder with this movement key
+        files_to_move = list(files_to_move)
+        for file_to_move in files_to_move:
+            self.get_folder_rank(file_to_move.folder_id)
+        files_to_move.sort(key=lambda x: self.folder_ranks[x.folder_id])
+        for file_to_move in files_to_move:
+            self.add_file(file_to_move)
+
+    def next_files(self):
+        next_files = []
+        while self.in_progress < self.max_files_in_progress:
+            startable_keys = list(filter(self.can_start, self.pending.keys()))
+            if len(startable_keys) == 0:
+                break
+            movement_key = min(startable_keys, key=lambda x: self.get_folder_rank(self.pending[x][0].folder_id))
+            file_to_move = self.pending[movement_key].popleft()
+            if len(self.pending[movement_key]) == 0:
+                del self.pending[movement_key]
+            self.num_pending -= 1
+            self.start(file_to_move)
+            next_files.append(file_to_move)
+        return next_files
+
+
+class CapacitySafeFolderMajorMigrationScheduler(FolderMajorMigrationScheduler, CapacitySafeMigrationScheduler):
+    """
+    a FolderMajorMigrationScheduler that does not fill any OSD above fill_threshold, like a
+    CapacitySafeMigrationScheduler. files are handed out in folder order, not in the order of the fill level of
+    their origin OSD, and files whose target OSD is too full are skipped in favour of files of later folders.
+    """
+
+    def __init__(self, osd_information, fill_threshold=0.95, folder_priorities=None, distribution=None,
+                 max_files_in_progress=10000, max_files_in_progress_per_osd=200, max_in_flight_secs=None):
+        super(CapacitySafeFolderMajorMigrationScheduler, self).__init__(folder_priorities, osd_information,
+                                                                        fill_threshold, distribution,
+                                                                        max_files_in_progress,
+                                                                        max_files_in_progress_per_osd,
+                                                                        max_in_flight_secs)
+
+
+def get_file_size(file_to_move):
+    if file_to_move.size is None:
+        return 0
+    return file_to_move.size
@@ -1,5 +1,9 @@
 import sys
 
+# OSD bandwidths are relative values. where absolute transfer times need to be estimated,
+# one unit of bandwidth is taken to correspond to this many bytes per second.
+bytes_per_sec_per_bandwidth_unit = 100 * 1024 * 1024
+
 
 class OSD(object):
     """
@@ -15,6 +19,14 @@ class OSD(object):
         self.capacity = capacity
         self.total_folder_size = 0
         self.folders = {}
+        # the data distribution this OSD belongs to. it is notified about added and removed folders,
+        # such that it can keep its folder index up to date.
+        self.distribution = None
+
+    def __setstate__(self, state):
+        # OSDs pickled before the distribution back reference existed do not have it
+        state.setdefault('distribution', None)
+        self.__dict__.update(state)
 
     def add_folder(self, folder_id, folder_size):
         assert self.total_folder_size + folder_size <= self.capacity
@@ -24,14 +36,20 @@ class OSD(object):
         else:
             self.folders[folder_id] += folder_size
         self.total_folder_size += folder_size
+        if self.distribution is not None:
+            self.distribution.folder_added(folder_id, self.uuid)
 
     def remove_folder(self, folder):
         if folder in self.folders.keys():
             self.total_folder_size -= self.folders[folder]
             del self.folders[folder]
+            if self.distribution is not None:
+                self.distribution.folder_removed(folder, self.uuid)
 
     def update_folder(self, folder_id, size):
         assert folder_id in self.folders.keys()
+        # checked before removing, such that the folder stays on this OSD if the new size does not fit
+        assert self.total_folder_size - self.folders[folder_id] + size <= self.capacity
         self.remove_folder(folder_id)
         self.add_folder(folder_id, size)
 
@@ -1,22 +1,66 @@
+import asyncio
 import datetime
 import os
 import random
+import stat
 
 import time
 
 from xtreemfs_client import OSDManager
 from xtreemfs_client import div_util
+from xtreemfs_client import commandExecutor
+from xtreemfs_client import migrationJournal
+from xtreemfs_client import migrationScheduler
+from xtreemfs_client import replicaCompletionWatcher
+from xtreemfs_client import treeWalker
 
 
 class FileToMove(object):
-    def __init__(self, absolute_file_path, origin_osd, target_osd,
-                 policy_command, create_replica_command, delete_replica_command):
+    """
+    a file that is not on its assigned OSD (target_osd).
+    as there may be millions of them, only the information needed to build the xtfsutil commands is kept, and the
+    commands are built on demand:
+    set_policy: whether the read-only replication policy needs to be set (the file has a single replica),
+    create_replica: whether a new replica needs to be created on target_osd,
+    delete_osd: the OSD whose replica needs to be deleted, or None.
+    """
+    __slots__ = ['absolute_file_path', 'origin_osd', 'target_osd', 'set_policy', 'create_replica', 'delete_osd',
+                 'size', 'folder_id']
+
+    def __init__(self, absolute_file_path, origin_osd, target_osd, set_policy, create_replica, delete_osd,
+                 size=None, folder_id=None):
         self.absolute_file_path = absolute_file_path
         self.origin_osd = origin_osd
         self.target_osd = target_osd
-        self.policy_command = policy_command
-        self.create_replica_command = create_replica_command
-        self.delete_replica_command = delete_replica_command
+        self.set_policy = set_policy
+        self.create_replica = create_replica
+        self.delete_osd = delete_osd
+        # file size in bytes
+        self.size = size
+        # id of the folder containing the file
+        self.folder_id = folder_id
+
+    @property
+    def policy_command(self):
+        if not self.set_policy:
+            return None
+        return div_util.create_replication_policy_command(self.absolute_file_path)
+
+    @property
+    def create_replica_command(self):
+        if not self.create_replica:
+            return None
+        return div_util.create_create_replica_command(self.absolute_file_path, self.target_osd)
+
+    @property
+    def delete_replica_command(self):
+        if self.delete_osd is None:
+            return None
+        return div_util.create_delete_replica_command(self.absolute_file_path, self.delete_osd)
+
+
+# strategies moving files through a migrationScheduler.MigrationScheduler
+pipelined_strategies = ['pipelined', 'byte_balanced', 'folder_major']
 
 
 max_processes_change_policy = 200
@@ -25,119 +69,369 @@ max_processes_delete_replica = 200
 
 
 class PhysicalPlacementRealizer(object):
-    def __init__(self, osd_manager: OSDManager, debug=False, repeat_delete_interval_secs=15,
-                 max_files_in_progress=10000, max_files_in_progress_per_osd=200, max_execute_repetitions=5):
+    def __init__(self, osd_manager: OSDManager, debug=False,
+                 max_files_in_progress=10000, max_files_in_progress_per_osd=200,
+                 command_timeout_secs=None, min_poll_interval_secs=1, max_poll_interval_secs=300,
+                 max_completion_polls=20, journal=None, max_in_flight_secs=10, osd_rate_limits=None,
+                 default_rate_limit=None, distribution=None, fill_threshold=None, osd_information=None,
+                 folder_priorities=None, folder_placed_callback=None, scan_window=None, walk_parallelism=16):
         self.osd_manager = osd_manager
+        # the distribution prescribing the OSD of each folder. by default, the distribution of osd_manager,
+        # but it may also be a planned distribution (see OSDManager.plan_rebalance).
+        if distribution is None:
+            distribution = osd_manager.distribution
+        self.distribution = distribution
+        # optional MigrationJournal recording the progress of realize_placement, such that it can be resumed
+        self.journal = journal
         self.files_to_be_moved = {}
-        self.iterations = 0
+        # absolute paths of the files known to be on their assigned OSD
+        self.files_in_place = set()
+        # absolute paths of the files scheduled for movement in the last fix-iteration
+        self.files_in_last_iteration = []
         self.max_files_in_progress_total = max_files_in_progress
         self.max_files_in_progress_per_osd = max_files_in_progress_per_osd
         self.debug = debug
-        self.repeat_delete_interval_secs = repeat_delete_interval_secs
-        self.max_execute_repetitions = max_execute_repetitions
-
-    def realize_placement(self, strategy='osd_balanced'):
+        self.command_timeout_secs = command_timeout_secs
+        # limits of the byte_balanced strategy, see migrationScheduler.ByteAwareMigrationScheduler
+        self.max_in_flight_secs = max_in_flight_secs
+        self.osd_rate_limits = osd_rate_limits
+        self.default_rate_limit = default_rate_limit
+        # if fill_threshold is set, no OSD is filled above this fraction of its total space while files are moved,
+        # see migrationScheduler.CapacitySafeMigrationScheduler. the free space of the OSDs is taken from
+        # osd_information (by default, the information of osd_manager) and kept up to date across fix-iterations.
+        self.fill_threshold = fill_threshold
+        if osd_information is None:
+            osd_information = osd_manager.osd_information
+        if osd_information is None:
+            osd_information = {}
+        self.osd_information = dict((osd_uuid, dict(information)) for osd_uuid, information
+                                    in osd_information.items())
+        # files that have not been started, as they would have filled their target OSD above fill_threshold
+        self.files_not_started = []
+        # folder ids to be moved first by the folder_major strategy
+        self.folder_priorities = folder_priorities
+        # called with the folder id of each folder whose files are all on their assigned OSD after having been
+        # checked (see calculate_files_to_be_moved) or moved by one of the pipelined strategies
+        self.folder_placed_callback = folder_placed_callback
+        # number of files per folder id that have been handed to the current pipeline and not been moved yet
+        self.files_left_per_folder = {}
+        self.folders_with_failures = set()
+        # absolute paths of the files whose movement failed in the current pipeline
+        self.failed_files = []
+        # if set, the pipelined strategies scan the folders while files are moved, keeping only about scan_window
+        # files to be moved in memory, see realize_placement
+        self.scan_window = scan_window
+        # walks the folders to be checked, see scan_files_to_be_moved
+        self.tree_walker = treeWalker.TreeWalker(walk_parallelism)
+        self.completion_watcher = replicaCompletionWatcher.ReplicaCompletionWatcher(
+            self.distribution, min_poll_interval_secs=min_poll_interval_secs,
+            max_poll_interval_secs=max_poll_interval_secs, max_polls=max_completion_polls)
+
+    def realize_placement(self, strategy='osd_balanced', folder_ids=None, resume=False):
         """
           fixes the physical layout, such that it matches the data distribution described in self.distribution
-          we use the following strategy: first, determine which files needs to be moved to another OSD, and create three lists.
-          for each file to be moved, one contains the command to set the default replication policy (1), one contains the command
-          to create a new replica on the target OSD (2) and one contains the command to delete the replica on the original OSD (3).
-          the command-lists are executed in order: 1, 2, 3, commands of list i only being executed if all commands of list i-1
-          have returned. the commands of any one list are executed in parallel, with an upper bound of 200 parallel executions
-          to not violate the maximum number of processes of the OS.
-
-          the commands of list 3 might return an error, as deleting the replica on the original OSD is not possible until
-          the new replica on the target OSD is complete. theses commands are collected and re-executed after a certain delay.
-          this process is repeated until no error is returned, which should eventually happen (as soon as all new replicas on
-          the target OSDs are complete).
+          we use the following strategy: first, determine which files need to be moved to another OSD. each file is then
+          moved in three steps: set the read-only replication policy (1), create a new replica on the target OSD (2) and
+          delete the replica on the original OSD (3). deleting the original replica is not possible until the new replica
+          is complete, so step 3 is only executed once self.completion_watcher, which polls the replicas with a backoff
+          adapted to the file size and the bandwidth of the target OSD, has found the new replica complete. files whose
+          new replica does not become complete are handled again in the next fix-iteration.
+
+          with strategy='osd_balanced' (or 'random'), the files are moved in batches (see execute_moves): steps 1 and 2
+          are executed for all files of a batch in parallel, one step after the other, and the original replica of each
+          file is deleted as soon as its new replica is complete, without waiting for the other files of the batch.
+
+          with strategy='pipelined', there are no global barriers between these three steps. instead, each file advances
+          through its steps on its own, see move_files_pipelined. strategy='byte_balanced' works the same way, but
+          additionally limits the bytes in flight and the migration rate per OSD, see move_files_byte_balanced.
+          if self.fill_threshold is set, both strategies never fill an OSD above this fraction of its capacity, and
+          files are moved away from the fullest OSDs first (osd_balanced and random fall back to pipelined).
+          strategy='folder_major' moves the files folder by folder, such that single folders are completely placed
+          early, see move_files_folder_major. it also respects self.fill_threshold, but keeps the folder order.
+
+          after each fix-iteration, only the files scheduled in this iteration are checked again
+          (see update_files_to_be_moved).
+
+          if folder_ids is given (as iterable of folder ids, or as movements map with folder ids as keys, as returned by
+          the rebalancing methods of DataDistribution), only the files in these folders are considered.
+
+          if self.journal is set, the progress is recorded in it. with resume=True, the unfinished migration recorded
+          in the journal is continued instead (with its folder ids): folders whose files have already been checked
+          are not scanned again, only the recorded files that have not been moved yet are checked.
+
+          if self.scan_window is set and one of the pipelined strategies is used, the files to be moved are not
+          calculated up front. instead, the folders are scanned (see scan_files_to_be_moved) while files are moved,
+          such that only about self.scan_window files to be moved are held in memory, regardless of the size of the
+          volume. in this case, files in place are not recorded in self.files_in_place, and only the files whose
+          movement failed are checked again.
         """
-        iteration = 0
-        self.calculate_files_to_be_moved()
+        if self.journal is None:
+            self.__realize_placement(strategy, folder_ids)
+            return
+
+        if resume and self.journal.has_unfinished_migration():
+            folder_ids = self.journal.get_scope()
+            checked_folders = self.journal.get_checked_folders()
+            unfinished_files = self.journal.get_unfinished_files()
+            if self.debug:
+                print("resuming migration: " + str(len(checked_folders)) + " folders have been checked, "
+                      + str(len(unfinished_files)) + " files have not been moved yet.")
+            self.files_to_be_moved = {}
+            self.files_in_place = set()
+            for absolute_file_path in unfinished_files:
+                self.check_file(absolute_file_path)
+            self.journal.record_file_states(self.files_in_place, migrationJournal.file_moved)
+            self.__realize_placement(strategy, folder_ids, skip_folder_ids=checked_folders, reset=False)
+        else:
+            if resume:
+                print("no unfinished migration found in the journal, starting a new one.")
+            self.journal.begin(folder_ids, strategy)
+            self.__realize_placement(strategy, folder_ids)
+
+        self.journal.finish()
+
+    def __realize_placement(self, strategy, folder_ids, skip_folder_ids=None, reset=True):
+        strategy = self.get_movement_strategy(strategy)
+        if self.scan_window is None or strategy not in pipelined_strategies:
+            self.calculate_files_to_be_moved(folder_ids, skip_folder_ids=skip_folder_ids, reset=reset)
+            self.__move_files_to_be_moved(strategy)
+            return
+
+        if reset:
+            self.files_to_be_moved = {}
+            self.files_in_place = set()
+        if self.debug:
+            print("moving files while scanning, with a scan window of " + str(self.scan_window) + " files")
+        self.files_in_last_iteration = []
+        self.__move_files_with_scheduler(self.__create_scheduler(strategy),
+                                         self.scan_files_to_be_moved(folder_ids, skip_folder_ids))
+        # only the failed files need to be checked again
+        self.files_in_last_iteration = self.failed_files
+        self.update_files_to_be_moved()
+        self.__move_files_to_be_moved(strategy)
+
+    def realize_placement_of_files(self, absolute_file_paths, strategy='osd_balanced'):
+        """
+        like realize_placement, but only the given files (e.g., files that have just been written) are checked and,
+        if necessary, moved to the OSD of their folder.
+        """
+        self.files_to_be_moved = {}
+        for absolute_file_path in absolute_file_paths:
+            self.check_file(absolute_file_path)
+        self.__move_files_to_be_moved(strategy)
 
-        while len(list(self.files_to_be_moved.keys())) > 0:
+    def realize_planned_moves(self, files_to_move, strategy='osd_balanced', folder_ids=None):
+        """
+        execute the given movements (FileToMove objects, e.g., of a migrationPlan.MigrationPlan) as they are.
+        files whose movement fails are checked again and moved in further fix-iterations, like in realize_placement.
+        if self.journal is set, the migration is recorded in it as covering folder_ids (None for all folders),
+        such that it can be resumed with realize_placement(resume=True).
+        """
+        self.files_to_be_moved = {}
+        self.files_in_place = set()
+        files_per_folder = {}
+        for file_to_move in files_to_move:
+            self.add_file_to_be_moved(file_to_move)
+            files_per_folder.setdefault(self.get_folder_id(file_to_move), []).append(file_to_move)
+
+        if self.journal is not None:
+            self.journal.begin(folder_ids, strategy)
+            for folder_id, files_of_folder in files_per_folder.items():
+                self.journal.folder_checked(folder_id, files_of_folder)
+
+        self.__move_files_to_be_moved(strategy)
+        if self.journal is not None:
+            self.journal.finish()
+
+    def get_movement_strategy(self, strategy):
+        """
+        the strategy actually used for the given strategy: with a fill threshold, strategies that do not keep track
+        of the space on the OSDs are replaced by pipelined.
+        """
+        if self.fill_threshold is not None and strategy in ['osd_balanced', 'random']:
+            if self.debug:
+                print("strategy " + strategy + " does not support a fill threshold, using pipelined instead.")
+            return 'pipelined'
+        return strategy
+
+    def __move_files_to_be_moved(self, strategy):
+        iteration = 0
+        strategy = self.get_movement_strategy(strategy)
+        while len(self.files_to_be_moved) > 0:
             if self.debug:
                 print("starting to fix physical layout...this is fix-iteration " + str(iteration))
 
+            self.files_in_last_iteration = list(map(lambda x: x.absolute_file_path,
+                                                    self.iterate_files_to_be_moved()))
             if strategy == 'osd_balanced':
                 self.move_files_osd_balanced()
             elif strategy == 'random':
                 self.move_files_randomly()
+            elif strategy == 'pipelined':
+                self.move_files_pipelined()
+            elif strategy == 'byte_balanced':
+                self.move_files_byte_balanced()
+            elif strategy == 'folder_major':
+                self.move_files_folder_major()
             self.update_files_to_be_moved()
             iteration += 1
 
     def get_list_of_all_files_to_be_moved(self):
-        files_to_be_moved_list = []
+        return list(self.iterate_files_to_be_moved())
+
+    def iterate_files_to_be_moved(self):
         for list_per_key in self.files_to_be_moved.values():
             for file_to_be_moved in list_per_key:
-                files_to_be_moved_list.append(file_to_be_moved)
+                yield file_to_be_moved
 
-        return files_to_be_moved_list
+    def add_file_to_be_moved(self, file_to_move):
+        movement_key = (file_to_move.origin_osd, file_to_move.target_osd)
+        if movement_key not in self.files_to_be_moved:
+            self.files_to_be_moved[movement_key] = []
+        self.files_to_be_moved[movement_key].append(file_to_move)
 
     def update_files_to_be_moved(self):
         """
-        update self.files_to_be_moved: check for all elements whether they still need to be moved.
-        right now, we simply recalculate it from scratch, yielding the correct result, but being inefficient.
+        update self.files_to_be_moved after a fix-iteration: only the files that were scheduled in the last iteration
+        (successfully moved or not) are checked again, all other files are known to be in place already.
         :return:
         """
-        # TODO implement
-        self.calculate_files_to_be_moved()
+        files_to_check = self.files_in_last_iteration
+        self.files_to_be_moved = {}
+        for absolute_file_path in files_to_check:
+            if self.check_file(absolute_file_path) is None and self.journal is not None:
+                self.journal.record_file_state(absolute_file_path, migrationJournal.file_moved)
 
-    def calculate_files_to_be_moved(self):
+    def calculate_files_to_be_moved(self, folder_ids=None, skip_folder_ids=None, reset=True):
         """
         method to populate self.files_to_be_moved.
         for each file in self.osd_manager.managed_folder, it is checked whether the file is on the OSD assigned by
-        self.osd_manager.distribution. if this is not the case, the file is added to self.files_to_be_moved.
+        self.distribution. if this is not the case, the file is added to self.files_to_be_moved.
         more precisely, it is appended to the list at key (origin_osd, target_osd) in self.files_to_be_moved.
+        if folder_ids is given (as iterable of folder ids or movements map), only the files in these folders are checked.
+        folders whose id is contained in skip_folder_ids are not checked.
+        if self.journal is set, the files to be moved are recorded in it, folder by folder.
         :return:
         """
-        self.files_to_be_moved = {}
-        managed_folders = self.osd_manager.get_depth_2_subdirectories()
-        for managed_folder in managed_folders:
-            for directory in os.walk(managed_folder):
-                for filename in directory[2]:
-                    policy_command = None
-                    create_command = None
-                    delete_command = None
-                    absolute_file_path = os.path.join(directory[0], filename)
-                    osds_of_file = div_util.get_osd_uuids(absolute_file_path)
-                    path_on_volume = self.osd_manager.get_path_on_volume(absolute_file_path)
-                    containing_folder_id = self.osd_manager.get_containing_folder_id(path_on_volume)
-                    osd_for_file = self.osd_manager.distribution.get_containing_osd(containing_folder_id).uuid
-
-                    file_on_correct_osd = False
-                    osd_of_file = None  # this assignment will always be overwritten,
-                    # as there cannot be files in XtreemFS that do not have an OSD
-                    for osd_of_file in osds_of_file:
-                        if osd_of_file != osd_for_file:
-                            # delete all replicas on wrong OSDs
-                            delete_command = div_util.create_delete_replica_command(absolute_file_path, osd_of_file)
-                        else:
-                            file_on_correct_osd = True
-
-                    if not file_on_correct_osd and len(osds_of_file) < 2:
-                        # only one replica on a wrong OSD => need to set replication policy.
-                        # otherwise, there is a unique replica on the correct OSD => no change necessary,
-                        # OR there are multiple replicas => replication policy must be set.
-                        policy_command = div_util.create_replication_policy_command(absolute_file_path)
-
-                    if not file_on_correct_osd:
-                        # create a replica on the correct osd
-                        create_command = div_util.create_create_replica_command(absolute_file_path, osd_for_file)
-
-                    # in python, strings are also booleans!!! :)
-                    if policy_command or create_command or delete_command:
-                        # create FileToMove object and add it to the corresponding list in the map
-                        file_to_move = FileToMove(absolute_file_path,
-                                                  osd_of_file,
-                                                  osd_for_file,
-                                                  policy_command,
-                                                  create_command,
-                                                  delete_command)
-
-                        movement_key = (osd_of_file, osd_for_file)
-                        if not movement_key in self.files_to_be_moved.keys():
-                            self.files_to_be_moved[movement_key] = []
-                        self.files_to_be_moved[movement_key].append(file_to_move)
+        if reset:
+            self.files_to_be_moved = {}
+            self.files_in_place = set()
+        for _ in self.scan_files_to_be_moved(folder_ids, skip_folder_ids, check=self.check_file):
+            # the files have already been added to self.files_to_be_moved by check_file
+            pass
+
+    def scan_files_to_be_moved(self, folder_ids=None, skip_folder_ids=None, check=None):
+        """
+        generator checking the files of the folders to be checked (see calculate_files_to_be_moved), one folder at a
+        time. for each folder, (folder id, list of FileToMove objects of its files that need to be moved) is yielded,
+        so only the files of one folder are held at the same time.
+        the folders are walked by self.tree_walker. check is the function checking a single file, called with the
+        absolute path of each file. by default, get_file_to_move is used, which does not add the file to
+        self.files_to_be_moved or self.files_in_place, and is called in the walking threads.
+        if self.journal is set, each folder is recorded in it before it is yielded.
+        """
+        for managed_folder in self.get_folders_to_check(folder_ids):
+            folder_id = self.osd_manager.get_path_on_volume(managed_folder)
+            if skip_folder_ids is not None and folder_id in skip_folder_ids:
+                continue
+            if check is None:
+                checked_files = self.tree_walker.walk_files(managed_folder, lambda x: self.get_file_to_move(x.path))
+            else:
+                checked_files = map(lambda x: check(x.path), self.tree_walker.walk_files(managed_folder))
+            files_to_move = list(filter(lambda x: x is not None, checked_files))
+            if self.journal is not None:
+                self.journal.folder_checked(folder_id, files_to_move)
+            if len(files_to_move) == 0 and self.folder_placed_callback is not None:
+                self.folder_placed_callback(folder_id)
+            yield folder_id, files_to_move
+
+    def get_folders_to_check(self, folder_ids=None):
+        """
+        absolute paths of the folders whose files need to be checked: all depth 2 subdirectories of the managed folder,
+        or only the existing folders among folder_ids. the folders in self.folder_priorities come first.
+        """
+        if folder_ids is None:
+            folders = self.osd_manager.get_depth_2_subdirectories()
+        else:
+            folders = []
+            for folder_id in folder_ids:
+                absolute_folder_path = self.osd_manager.get_absolute_file_path(folder_id)
+                if os.path.isdir(absolute_folder_path):
+                    folders.append(absolute_folder_path)
+        if self.folder_priorities is not None:
+            priorities = {}
+            for folder_id in self.folder_priorities:
+                priorities.setdefault(self.osd_manager.get_absolute_file_path(folder_id), len(priorities))
+            folders = sorted(folders, key=lambda x: priorities.get(x, len(priorities)))
+        return folders
+
+    def check_file(self, absolute_file_path):
+        """
+        check whether the given file is on the OSD assigned by self.distribution.
+        if this is not the case, a FileToMove is created and added to self.files_to_be_moved, and returned.
+        otherwise, the file is added to self.files_in_place, and None is returned.
+        """
+        self.files_in_place.discard(absolute_file_path)
+        file_to_move = self.get_file_to_move(absolute_file_path, self.files_in_place)
+        if file_to_move is not None:
+            self.add_file_to_be_moved(file_to_move)
+        return file_to_move
+
+    def get_file_to_move(self, absolute_file_path, files_in_place=None):
+        """
+        check whether the given file is on the OSD assigned by self.distribution.
+        if this is not the case, a FileToMove is returned. otherwise (or if the file does not exist), None is
+        returned, and the file is added to files_in_place (a set), if given.
+        """
+        try:
+            file_stat = os.stat(absolute_file_path)
+        except OSError:
+            # the file has been removed in the meantime
+            return None
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+
+        set_policy = False
+        create_replica = False
+        delete_osd = None
+        osds_of_file = div_util.get_osd_uuids(absolute_file_path)
+        path_on_volume = self.osd_manager.get_path_on_volume(absolute_file_path)
+        containing_folder_id = self.distribution.get_containing_folder_id(path_on_volume)
+        osd_for_file = self.distribution.get_containing_osd(containing_folder_id).uuid
+
+        file_on_correct_osd = False
+        osd_of_file = None  # this assignment will always be overwritten,
+        # as there cannot be files in XtreemFS that do not have an OSD
+        for osd_of_file in osds_of_file:
+            if osd_of_file != osd_for_file:
+                # delete all replicas on wrong OSDs
+                delete_osd = osd_of_file
+            else:
+                file_on_correct_osd = True
+
+        if not file_on_correct_osd and len(osds_of_file) < 2:
+            # only one replica on a wrong OSD => need to set replication policy.
+            # otherwise, there is a unique replica on the correct OSD => no change necessary,
+            # OR there are multiple replicas => replication policy must be set.
+            set_policy = True
+
+        if not file_on_correct_osd:
+            # create a replica on the correct osd
+            create_replica = True
+
+        if not (set_policy or create_replica or delete_osd is not None):
+            if files_in_place is not None:
+                files_in_place.add(absolute_file_path)
+            return None
+
+        return FileToMove(absolute_file_path,
+                          osd_of_file,
+                          osd_for_file,
+                          set_policy,
+                          create_replica,
+                          delete_osd,
+                          file_stat.st_size,
+                          containing_folder_id)
 
     def get_next_files(self, movement_key):
         """
@@ -173,7 +467,7 @@ class PhysicalPlacementRealizer(object):
                 files_to_move_now.extend(self.get_next_files(movement_key))
 
             random.shuffle(files_to_move_now)
-            self.execute_command_list(self.transform_files_to_move_into_three_command_lists(files_to_move_now))
+            self.execute_moves(files_to_move_now)
 
     def move_files_randomly(self):
         """
@@ -192,114 +486,311 @@ class PhysicalPlacementRealizer(object):
                 files_to_be_moved_now.append(files_to_be_moved.pop())
                 if len(files_to_be_moved) == 0:
                     break
-            self.execute_command_list(self.transform_files_to_move_into_three_command_lists(files_to_be_moved_now))
+            self.execute_moves(files_to_be_moved_now)
 
-    def transform_files_to_move_into_three_command_lists(self, files_to_move):
-        change_policy_command_list = []
-        create_replica_command_list = []
-        delete_replica_command_list = []
-
-        for file_to_be_moved in files_to_move:
-            if file_to_be_moved.policy_command is not None:
-                change_policy_command_list.append(file_to_be_moved.policy_command)
-            if file_to_be_moved.create_replica_command is not None:
-                create_replica_command_list.append(file_to_be_moved.create_replica_command)
-            if file_to_be_moved.delete_replica_command is not None:
-                delete_replica_command_list.append(file_to_be_moved.delete_replica_command)
+    def move_files_pipelined(self):
+        """
+        executes the necessary commands in order to move all files in self.files_to_be_moved to their target OSD.
+        each file advances through its steps (set replication policy, create new replica, delete old replica)
+        as soon as its previous step has returned, independently of all other files.
+        a new file is started whenever a file is done, as long as at most self.max_files_in_progress_total files
+        are in progress in total, and at most self.max_files_in_progress_per_osd per OSD.
+        :return:
+        """
+        self.__move_files_with_scheduler(self.__create_scheduler('pipelined'))
 
-        return change_policy_command_list, create_replica_command_list, delete_replica_command_list
+    def move_files_byte_balanced(self):
+        """
+        like move_files_pipelined, but the files are handed out by a migrationScheduler.ByteAwareMigrationScheduler,
+        which also takes file sizes into account: each OSD has at most as many bytes in flight as it can transfer in
+        self.max_in_flight_secs (according to its bandwidth), and OSDs with a rate limit (self.osd_rate_limits,
+        self.default_rate_limit, in bytes/sec) are not given more data than that.
+        :return:
+        """
+        self.__move_files_with_scheduler(self.__create_scheduler('byte_balanced'))
 
-    def execute_command_list(self, command_list_triple):
-        """
-        executes three list of commands, given in the  that are typically needed for moving files in XtreemFS from their current OSD
-        to the designated target OSD. the lists are treated as their order in the argument list. commands from the next
-        list are only executed when all commands of the previous list have returned (or been killed).
-        deletion commands are repeated a number of times, as the target OSD requires some time to create the new replica
-        (for fetching all objects, i.e., file content).
-        :param a triple (change_policy_command_list, create_replica_command_list, delete_replica_command_list)
-        with: change_policy_command_list:list of change replication policy commands to be executed.
-         create_replica_command_list: list of create replica commands to be executed.
-         delete_replica_command_list: list of delete replica commands to be executed.
+    def move_files_folder_major(self):
+        """
+        like move_files_pipelined, but the files are moved folder by folder (see
+        migrationScheduler.FolderMajorMigrationScheduler), starting with the folders in self.folder_priorities.
+        self.folder_placed_callback is called as soon as all files of a folder have been moved.
         :return:
         """
-        change_policy_command_list = command_list_triple[0]
-        create_replica_command_list = command_list_triple[1]
-        delete_replica_command_list = command_list_triple[2]
+        self.__move_files_with_scheduler(self.__create_scheduler('folder_major'))
+
+    def __create_scheduler(self, strategy):
+        if strategy == 'folder_major':
+            if self.fill_threshold is not None:
+                return migrationScheduler.CapacitySafeFolderMajorMigrationScheduler(
+                    self.osd_information, self.fill_threshold, self.folder_priorities, self.distribution,
+                    self.max_files_in_progress_total, self.max_files_in_progress_per_osd)
+            return migrationScheduler.FolderMajorMigrationScheduler(self.folder_priorities,
+                                                                    self.max_files_in_progress_total,
+                                                                    self.max_files_in_progress_per_osd)
+        if strategy == 'byte_balanced':
+            if self.fill_threshold is not None:
+                return migrationScheduler.CapacitySafeMigrationScheduler(
+                    self.osd_information, self.fill_threshold, self.distribution, self.max_files_in_progress_total,
+                    self.max_files_in_progress_per_osd, max_in_flight_secs=self.max_in_flight_secs,
+                    osd_rate_limits=self.osd_rate_limits, default_rate_limit=self.default_rate_limit)
+            return migrationScheduler.ByteAwareMigrationScheduler(self.distribution,
+                                                                  self.max_files_in_progress_total,
+                                                                  self.max_files_in_progress_per_osd,
+                                                                  max_in_flight_secs=self.max_in_flight_secs,
+                                                                  osd_rate_limits=self.osd_rate_limits,
+                                                                  default_rate_limit=self.default_rate_limit)
+        if self.fill_threshold is not None:
+            return migrationScheduler.CapacitySafeMigrationScheduler(
+                self.osd_information, self.fill_threshold, self.distribution, self.max_files_in_progress_total,
+                self.max_files_in_progress_per_osd)
+        return migrationScheduler.MigrationScheduler(self.max_files_in_progress_total,
+                                                     self.max_files_in_progress_per_osd)
+
+    def get_folder_id(self, file_to_move):
+        if file_to_move.folder_id is None:
+            path_on_volume = self.osd_manager.get_path_on_volume(file_to_move.absolute_file_path)
+            file_to_move.folder_id = self.distribution.get_containing_folder_id(path_on_volume)
+        return file_to_move.folder_id
+
+    def __move_files_with_scheduler(self, scheduler, folder_source=None):
+        """
+        move the files in self.files_to_be_moved, and the files yielded by folder_source (see
+        scan_files_to_be_moved), if given, using the given scheduler.
+        """
+        self.files_left_per_folder = {}
+        self.folders_with_failures = set()
+        self.failed_files = []
+        self.__add_files_to_scheduler(scheduler, self.iterate_files_to_be_moved())
+        self.files_to_be_moved = {}
+        if self.debug and folder_source is None:
+            print("number of files that need to be moved: " + str(scheduler.num_pending))
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.__run_pipeline(scheduler, folder_source))
+        finally:
+            loop.close()
+
+        if isinstance(scheduler, migrationScheduler.CapacitySafeMigrationScheduler):
+            for osd_uuid, used_space in scheduler.used_space.items():
+                self.osd_information[osd_uuid]['usable_space'] = scheduler.total_space[osd_uuid] - used_space
+
+        # files that could not be started at all (e.g., as their target OSD is too full) are not checked again
+        not_started = scheduler.get_pending_files()
+        if len(not_started) > 0:
+            print(str(len(not_started)) + " files have not been moved, as their target OSDs would have been "
+                  "filled above " + str(self.fill_threshold) + " of their capacity.")
+            self.files_not_started.extend(not_started)
+            not_started_paths = set(map(lambda x: x.absolute_file_path, not_started))
+            self.files_in_last_iteration = list(filter(lambda x: x not in not_started_paths,
+                                                       self.files_in_last_iteration))
+
+    def __add_files_to_scheduler(self, scheduler, files_to_move):
+        files_to_move = list(files_to_move)
+        for file_to_move in files_to_move:
+            folder_id = self.get_folder_id(file_to_move)
+            self.files_left_per_folder[folder_id] = self.files_left_per_folder.get(folder_id, 0) + 1
+        scheduler.add_files(files_to_move)
+
+    def __fill_scheduler(self, scheduler, folder_source, min_pending):
+        """
+        add the files of further folders of folder_source to the scheduler, until it has at least min_pending
+        pending files. returns whether folder_source has further folders.
+        """
+        while scheduler.num_pending < min_pending:
+            folder = next(folder_source, None)
+            if folder is None:
+                return False
+            self.__add_files_to_scheduler(scheduler, folder[1])
+        return True
+
+    async def __run_pipeline(self, scheduler, folder_source=None):
+        files_in_progress = {}
+        num_moved = 0
+        num_failed = 0
+        start_time = time.time()
+        more_folders = folder_source is not None
+        while scheduler.has_pending_files() or len(files_in_progress) > 0 or more_folders:
+            if more_folders:
+                more_folders = self.__fill_scheduler(scheduler, folder_source, self.scan_window)
+            for file_to_move in scheduler.next_files():
+                files_in_progress[asyncio.ensure_future(self.__move_file(file_to_move))] = file_to_move
+            # files that can not be started now may become startable after some time (e.g., rate limits)
+            next_start_delay = scheduler.get_next_start_delay()
+            if len(files_in_progress) == 0:
+                if next_start_delay is None:
+                    if more_folders:
+                        # none of the pending files can be started, so files of further folders are needed
+                        more_folders = self.__fill_scheduler(scheduler, folder_source, scheduler.num_pending + 1)
+                        continue
+                    break
+                await asyncio.sleep(next_start_delay)
+                continue
+            done, _ = await asyncio.wait(files_in_progress.keys(), timeout=next_start_delay,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                file_to_move = files_in_progress.pop(task)
+                succeeded = task.result()
+                scheduler.finished(file_to_move, succeeded)
+                if succeeded:
+                    num_moved += 1
+                else:
+                    num_failed += 1
+                self.__file_finished(file_to_move, succeeded)
+
+        if self.debug:
+            print("pipelined movement of " + str(num_moved + num_failed) + " files done in "
+                  + str(round(time.time() - start_time)) + " sec. " + str(num_failed) + " files failed.")
+
+    def __file_finished(self, file_to_move, succeeded):
+        """
+        call self.folder_placed_callback if file_to_move was the last file of its folder, and all files of the
+        folder have been moved successfully. folders with failed files are reported in a later fix-iteration.
+        """
+        folder_id = file_to_move.folder_id
+        if not succeeded:
+            self.folders_with_failures.add(folder_id)
+            self.failed_files.append(file_to_move.absolute_file_path)
+        self.files_left_per_folder[folder_id] -= 1
+        if self.files_left_per_folder[folder_id] == 0:
+            del self.files_left_per_folder[folder_id]
+            if folder_id not in self.folders_with_failures and self.folder_placed_callback is not None:
+                self.folder_placed_callback(folder_id)
+
+    async def __move_file(self, file_to_move):
+        """
+        move one file: set the replication policy, create the new replica and delete the old replica.
+        the old replica is only deleted once the new replica is complete. returns whether the file has been moved
+        successfully.
+        """
+        if file_to_move.policy_command is not None:
+            result = await commandExecutor.run_command(file_to_move.policy_command, self.command_timeout_secs)
+            if not result.succeeded():
+                print("errored command: " + str(result))
+                return False
+            self.__record_file_state(file_to_move, migrationJournal.file_policy_set)
+
+        if file_to_move.create_replica_command is not None:
+            result = await commandExecutor.run_command(file_to_move.create_replica_command, self.command_timeout_secs)
+            if not result.succeeded():
+                print("errored command: " + str(result))
+                return False
+            self.__record_file_state(file_to_move, migrationJournal.file_replica_added)
+
+        if file_to_move.delete_replica_command is not None:
+            if not await self.completion_watcher.wait_until_complete(file_to_move.absolute_file_path,
+                                                                     file_to_move.target_osd):
+                print("new replica of " + file_to_move.absolute_file_path + " on OSD " + file_to_move.target_osd
+                      + " is not complete, not deleting the original replica.")
+                return False
+            result = await commandExecutor.run_command(file_to_move.delete_replica_command, self.command_timeout_secs)
+            if not result.succeeded():
+                print("errored command: " + str(result))
+                return False
+
+        self.__record_file_state(file_to_move, migrationJournal.file_moved)
+        return True
+
+    def __record_file_state(self, file_to_move, state):
+        if self.journal is not None:
+            self.journal.record_file_state(file_to_move.absolute_file_path, state)
+
+    def __record_command_results(self, files_to_move, command_attribute, errored_executions, state):
+        """
+        record the given state for all files whose command (given by its attribute name) has not errored.
+        """
+        if self.journal is None:
+            return
+        errored_commands = set(map(lambda x: tuple(x[0]), errored_executions))
+        for file_to_move in files_to_move:
+            command = getattr(file_to_move, command_attribute)
+            if command is not None and tuple(command) not in errored_commands:
+                self.journal.record_file_state(file_to_move.absolute_file_path, state)
+
+    def execute_moves(self, files_to_move):
+        """
+        executes the commands needed to move the given files (FileToMove objects) to their target OSDs:
+        first all change policy commands, then all create replica commands. then the new replicas are watched,
+        and the old replica of each file is deleted as soon as its new replica is complete.
+        :return: list of files whose new replica did not become complete.
+        """
+        change_policy_command_list, create_replica_command_list, _ = \
+            self.transform_files_to_move_into_three_command_lists(files_to_move)
 
         start_time = time.time()
         if self.debug:
             print("starting execution of " + str(len(change_policy_command_list)) + " change policy commands...")
             print(str(datetime.datetime.now()))
-        errored_processes = div_util.run_commands(change_policy_command_list, max_processes_change_policy)
-        end_time = time.time()
+        errored = div_util.run_commands(change_policy_command_list, max_processes_change_policy,
+                                        timeout=self.command_timeout_secs)
+        self.__record_command_results(files_to_move, 'policy_command', errored, migrationJournal.file_policy_set)
         if self.debug:
             print("executing " + str(len(change_policy_command_list)) + " change policy commands done in " +
-                  str(round(end_time - start_time)) + " sec.")
-            # div_util.print_process_list(processes)
+                  str(round(time.time() - start_time)) + " sec.")
 
         start_time = time.time()
         if self.debug:
             print("starting execution of " + str(len(create_replica_command_list)) + " create replica commands...")
             print(str(datetime.datetime.now()))
         random.shuffle(create_replica_command_list)
-        errored_processes = div_util.run_commands(create_replica_command_list, max_processes_add_replica)
-        end_time = time.time()
+        errored = div_util.run_commands(create_replica_command_list, max_processes_add_replica,
+                                        timeout=self.command_timeout_secs)
+        self.__record_command_results(files_to_move, 'create_replica_command', errored,
+                                      migrationJournal.file_replica_added)
         if self.debug:
             print("executing " + str(len(create_replica_command_list)) + " create replica commands done in " +
-                  str(round(end_time - start_time)) + " sec.")
-            # div_util.print_process_list(processes)
+                  str(round(time.time() - start_time)) + " sec.")
 
         start_time = time.time()
+        files_to_delete = list(filter(lambda x: x.delete_replica_command is not None, files_to_move))
         if self.debug:
-            print("starting execution of " + str(len(delete_replica_command_list)) + " delete replica commands...")
-            print(str(datetime.datetime.now()))
-        errored_processes = div_util.run_commands(delete_replica_command_list, max_processes_delete_replica,
-                                                  print_errors=False)
-
-        # run and repeat delete commands, until they return no error
-        # (if an error is returned for another reason than that one would delete the last complete replica,
-        # this will probably not work.
-        iterations = 0
-        while True:
-            if iterations >= self.max_execute_repetitions:
-                print("results of last iteration: ")
-                div_util.print_process_list(errored_processes)
-                print("Original replicas could not be deleted after " + str(
-                    self.max_execute_repetitions) + ". Aborting...")
-                break
-
-            if self.debug:
-                print("executing " + str(len(delete_replica_command_list))
-                      + " delete replica commands done. This is delete-iteration "
-                      + str(iterations))
-                # div_util.print_process_list(processes)
+            print("waiting for " + str(len(files_to_delete)) + " new replicas to become complete...")
+        loop = asyncio.new_event_loop()
+        try:
+            complete_files, incomplete_files = loop.run_until_complete(self.__delete_when_complete(files_to_delete))
+        finally:
+            loop.close()
+        if len(incomplete_files) > 0:
+            print(str(len(incomplete_files)) + " new replicas did not become complete. "
+                  "Their original replicas are not deleted.")
+        if self.journal is not None:
+            self.journal.flush()
+        if self.debug:
+            print("deleting " + str(len(complete_files)) + " replicas done in "
+                  + str(round(time.time() - start_time)) + " sec.")
 
-            errored_deletions = []
+        return incomplete_files
 
-            for process in errored_processes:
-                # check the return code. if it is one, the replica could not be deleted, so we try again later.
-                if process[2] != 0:
-                    errored_deletions.append(process[0])
-                    if self.debug:
-                        print("errored command: ")
-                        print("command: " + str(process[0]))
-                        print("stdoud: " + str(process[1][0]))
-                        print("stderr: " + str(process[1][1]))
-                        print("retcode: " + str(process[2]))
+    async def __delete_when_complete(self, files_to_delete):
+        """
+        watch the new replicas of the given files, and delete the original replica of each file as soon as its new
+        replica is complete. returns a tuple (list of files with complete replica, list of files given up).
+        """
+        delete_slots = asyncio.Semaphore(max_processes_delete_replica)
 
-            if len(errored_deletions) == 0:
-                break
+        async def delete_replica(file_to_move):
+            async with delete_slots:
+                result = await commandExecutor.run_command(file_to_move.delete_replica_command,
+                                                           self.command_timeout_secs)
+            if result.succeeded():
+                self.__record_file_state(file_to_move, migrationJournal.file_moved)
+            else:
+                print("errored command: " + str(result))
 
-            time.sleep(self.repeat_delete_interval_secs)
+        return await self.completion_watcher.wait_for_files(files_to_delete, delete_replica,
+                                                            max_concurrent_polls=max_processes_delete_replica)
 
-            if self.debug:
-                print("rerunning " + str(
-                    len(errored_deletions)) + " commands because replica could not be deleted...")
+    def transform_files_to_move_into_three_command_lists(self, files_to_move):
+        change_policy_command_list = []
+        create_replica_command_list = []
+        delete_replica_command_list = []
 
-            errored_processes = div_util.run_commands(errored_deletions, max_processes_change_policy,
-                                                      print_errors=False)
-            iterations += 1
+        for file_to_be_moved in files_to_move:
+            if file_to_be_moved.policy_command is not None:
+                change_policy_command_list.append(file_to_be_moved.policy_command)
+            if file_to_be_moved.create_replica_command is not None:
+                create_replica_command_list.append(file_to_be_moved.create_replica_command)
+            if file_to_be_moved.delete_replica_command is not None:
+                delete_replica_command_list.append(file_to_be_moved.delete_replica_command)
 
-        if self.debug:
-            end_time = time.time()
-            print("deleting replicas done in in " + str(round(end_time - start_time)) + " sec.")
+        return change_policy_command_list, create_replica_command_list, delete_replica_command_list
@@ -0,0 +1,274 @@
+"""
+long-running daemon that keeps the physical placement of the managed folder up to date while data is written.
+"""
+import os
+import time
+
+from xtreemfs_client import OSDManager
+from xtreemfs_client import inotify
+from xtreemfs_client import physicalPlacementRealizer
+
+
+class PlacementDaemon(object):
+    """
+    watches the managed folder of an OSDManager with inotify and
+    - assigns OSDs to new depth 2 folders as soon as they appear,
+    - removes deleted depth 2 folders from the data distribution,
+    - keeps the folder sizes held by the data distribution current,
+    - moves files that have been written to a wrong OSD (e.g., before the OSD of their folder has been assigned)
+      to the OSD of their folder, using the PhysicalPlacementRealizer.
+
+    events are collected for batch_interval_secs and then handled together.
+
+    inotify only reports changes made through the local mount. changes made by other XtreemFS clients, and changes
+    missed because the kernel event queue overflowed, are picked up by a resync (a full update of the folder sizes
+    and a check of all files), which is done on start (if resync_on_start is True), on queue overflows and every
+    resync_interval_secs (if not None).
+    """
+
+    def __init__(self, osd_manager: OSDManager, debug=False, batch_interval_secs=5, resync_interval_secs=None,
+                 resync_on_start=True, movement_strategy='osd_balanced', placement_realizer=None):
+        self.osd_manager = osd_manager
+        self.managed_folder = osd_manager.managed_folder.rstrip('/')
+        self.debug = debug
+        self.batch_interval_secs = batch_interval_secs
+        self.resync_interval_secs = resync_interval_secs
+        self.resync_on_start = resync_on_start
+        self.movement_strategy = movement_strategy
+        if placement_realizer is None:
+            placement_realizer = physicalPlacementRealizer.PhysicalPlacementRealizer(osd_manager, debug=debug)
+        self.placement_realizer = placement_realizer
+
+        self.inotify = None
+        self.stopped = False
+        self.last_resync = None
+
+        # absolute paths of depth 2 folders that appeared, disappeared or changed since the last batch
+        self.new_folders = set()
+        self.removed_folders = set()
+        self.changed_folders = set()
+        # absolute paths of files that have been written since the last batch
+        self.changed_files = set()
+        self.resync_needed = False
+
+    def start(self):
+        """
+        start watching the managed folder.
+        """
+        self.inotify = inotify.Inotify()
+        self.watch_tree(self.managed_folder)
+        self.stopped = False
+        if self.resync_on_start:
+            self.resync()
+        else:
+            self.last_resync = time.time()
+
+    def stop(self):
+        """
+        stop the daemon. may be called from another thread or a signal handler; run returns after the current batch.
+        """
+        self.stopped = True
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def run(self):
+        """
+        handle changes until stop is called.
+        """
+        if self.inotify is None:
+            self.start()
+        try:
+            while not self.stopped:
+                self.run_once()
+        finally:
+            self.close()
+
+    def run_once(self, timeout=None):
+        """
+        wait up to timeout seconds (default: batch_interval_secs) for events, collect further events for
+        batch_interval_secs and handle them.
+        """
+        if timeout is None:
+            timeout = self.batch_interval_secs
+        events = self.inotify.read_events(timeout)
+        if len(events) > 0:
+            batch_end = time.time() + self.batch_interval_secs
+            while True:
+                self.process_events(events)
+                remaining = batch_end - time.time()
+                if remaining <= 0:
+                    break
+                events = self.inotify.read_events(remaining)
+
+        if self.resync_interval_secs is not None and time.time() - self.last_resync >= self.resync_interval_secs:
+            self.resync_needed = True
+
+        if self.resync_needed:
+            self.resync()
+        else:
+            self.handle_changes()
+
+    def watch_tree(self, path):
+        """
+        watch path and all directories below it.
+        returns the files found below path, which may have been written before the watches were in place.
+        """
+        files = []
+        for directory, subdirectories, filenames in os.walk(path):
+            try:
+                self.inotify.add_watch(directory)
+            except OSError:
+                # the directory has been removed in the meantime
+                continue
+            for filename in filenames:
+                files.append(os.path.join(directory, filename))
+        return files
+
+    def get_depth(self, path):
+        """
+        depth of path below the managed folder: 0 for the managed folder, 2 for folders managed by the distribution.
+        """
+        if path == self.managed_folder:
+            return 0
+        return len(os.path.relpath(path, self.managed_folder).split(os.sep))
+
+    def get_depth_2_folder(self, path):
+        """
+        the depth 2 folder containing path (or path itself, if its depth is 2).
+        """
+        relative_path = os.path.relpath(path, self.managed_folder).split(os.sep)
+        return os.path.join(self.managed_folder, relative_path[0], relative_path[1])
+
+    def process_events(self, events):
+        for event in events:
+            if self.debug:
+                print(str(event))
+            self.process_event(event)
+
+    def process_event(self, event):
+        if event.mask & inotify.IN_Q_OVERFLOW:
+            self.resync_needed = True
+            return
+
+        path = event.get_full_path()
+        if path is None or event.name == '':
+            # events of the watched directory itself are also reported by the event of its parent directory
+            return
+
+        depth = self.get_depth(path)
+        if event.is_dir():
+            if event.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                self.directory_added(path, depth)
+            elif event.mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                self.directory_removed(path, depth)
+        elif depth > 2:
+            # files in the managed folder or at depth 1 do not belong to any managed folder, e.g., the configuration
+            depth_2_folder = self.get_depth_2_folder(path)
+            self.changed_folders.add(depth_2_folder)
+            if event.mask & (inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO):
+                self.changed_files.add(path)
+            elif event.mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                self.changed_files.discard(path)
+
+    def directory_added(self, path, depth):
+        files = self.watch_tree(path)
+        if depth == 1:
+            for directory in os.listdir(path) if os.path.isdir(path) else []:
+                if os.path.isdir(os.path.join(path, directory)):
+                    self.folder_added(os.path.join(path, directory))
+        elif depth == 2:
+            self.folder_added(path)
+        else:
+            self.changed_folders.add(self.get_depth_2_folder(path))
+        self.changed_files.update(files)
+
+    def folder_added(self, path):
+        self.removed_folders.discard(path)
+        self.new_folders.add(path)
+        self.changed_folders.add(path)
+
+    def directory_removed(self, path, depth):
+        self.inotify.remove_watches_below(path)
+        self.changed_files = set(filter(lambda x: not x.startswith(path + '/'), self.changed_files))
+        if depth == 1:
+            for folder_id in self.osd_manager.get_assigned_folder_ids():
+                folder_path = self.osd_manager.get_absolute_file_path(folder_id)
+                if folder_path.startswith(path + '/'):
+                    self.folder_removed(folder_path)
+        elif depth == 2:
+            self.folder_removed(path)
+        else:
+            self.changed_folders.add(self.get_depth_2_folder(path))
+
+    def folder_removed(self, path):
+        self.new_folders.discard(path)
+        self.changed_folders.discard(path)
+        self.removed_folders.add(path)
+
+    def is_assigned(self, path):
+        folder_id = self.osd_manager.get_path_on_volume(path)
+        return self.osd_manager.distribution.get_containing_osd(folder_id) is not None
+
+    def handle_changes(self):
+        """
+        apply the changes collected since the last batch to the data distribution and the physical placement.
+        """
+        removed_folders = list(filter(lambda x: not os.path.isdir(x) and self.is_assigned(x), self.removed_folders))
+        if len(removed_folders) > 0:
+            if self.debug:
+                print("placement daemon: removing folders " + str(removed_folders))
+            self.osd_manager.remove_folders(list(map(self.osd_manager.get_path_on_volume, removed_folders)))
+
+        new_folders = list(filter(lambda x: os.path.isdir(x) and not self.is_assigned(x), self.new_folders))
+        if len(new_folders) > 0:
+            if self.debug:
+                print("placement daemon: assigning OSDs to new folders " + str(new_folders))
+            self.osd_manager.create_empty_folders(new_folders)
+
+        changed_folders = list(filter(lambda x: os.path.isdir(x) and self.is_assigned(x), self.changed_folders))
+        if len(changed_folders) > 0:
+            self.osd_manager.update(changed_folders, rescan=True)
+        elif len(removed_folders) > 0:
+            self.osd_manager.save_configuration()
+
+        changed_files = list(filter(lambda x: os.path.isfile(x) and self.is_assigned(self.get_depth_2_folder(x)),
+                                    self.changed_files))
+        if len(changed_files) > 0:
+            if self.debug:
+                print("placement daemon: checking the placement of " + str(len(changed_files)) + " files")
+            self.placement_realizer.realize_placement_of_files(changed_files, strategy=self.movement_strategy)
+
+        self.new_folders = set()
+        self.removed_folders = set()
+        self.changed_folders = set()
+        self.changed_files = set()
+
+    def resync(self):
+        """
+        bring the data distribution and the physical placement in line with the whole managed folder, e.g., after
+        events have been lost.
+        """
+        if self.debug:
+            print("placement daemon: resyncing " + self.managed_folder)
+        self.new_folders = set()
+        self.removed_folders = set()
+        self.changed_folders = set()
+        self.changed_files = set()
+        self.resync_needed = False
+
+        existing_folders = self.osd_manager.get_depth_2_subdirectories()
+        for folder_id in self.osd_manager.get_assigned_folder_ids():
+            folder_path = self.osd_manager.get_absolute_file_path(folder_id)
+            if folder_path.startswith(self.managed_folder + '/') and not os.path.isdir(folder_path):
+                self.folder_removed(folder_path)
+        for existing_folder in existing_folders:
+            if not self.is_assigned(existing_folder):
+                self.folder_added(existing_folder)
+        self.handle_changes()
+
+        self.osd_manager.update(list(filter(self.is_assigned, self.osd_manager.get_depth_2_subdirectories())))
+        self.placement_realizer.realize_placement(strategy=self.movement_strategy)
+        self.last_resync = time.time()
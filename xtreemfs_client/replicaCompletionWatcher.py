@@ -0,0 +1,90 @@
+"""
+watch new replicas until they are complete, such that the original replica can be deleted.
+"""
+import asyncio
+import os
+
+from xtreemfs_client import commandExecutor
+from xtreemfs_client import div_util
+from xtreemfs_client import osd
+
+
+class ReplicaCompletionWatcher(object):
+    """
+    polls the replicas of files until the replica on the target OSD is complete.
+
+    the first poll of a file happens after the time the target OSD is expected to need for fetching the file,
+    that is, file size / (bandwidth of the target OSD * osd.bytes_per_sec_per_bandwidth_unit),
+    but not earlier than min_poll_interval_secs. afterwards, the interval between two polls doubles,
+    up to max_poll_interval_secs. a file is given up after max_polls polls.
+
+    replicas are read from the extended attributes of the file, with xtfsutil as fallback.
+    """
+
+    def __init__(self, distribution=None, min_poll_interval_secs=1, max_poll_interval_secs=300, max_polls=20):
+        self.distribution = distribution
+        self.min_poll_interval_secs = min_poll_interval_secs
+        self.max_poll_interval_secs = max_poll_interval_secs
+        self.max_polls = max_polls
+
+    def get_first_poll_delay(self, absolute_file_path, target_osd):
+        try:
+            file_size = os.stat(absolute_file_path).st_size
+        except OSError:
+            file_size = 0
+        bandwidth = 1
+        if self.distribution is not None and target_osd in self.distribution.OSDs:
+            bandwidth = self.distribution.OSDs[target_osd].bandwidth
+        expected_secs = file_size / (bandwidth * osd.bytes_per_sec_per_bandwidth_unit)
+        return min(max(expected_secs, self.min_poll_interval_secs), self.max_poll_interval_secs)
+
+    def get_next_poll_delay(self, previous_delay):
+        return min(previous_delay * 2, self.max_poll_interval_secs)
+
+    async def is_complete_async(self, absolute_file_path, target_osd):
+        replicas = div_util.get_replicas(absolute_file_path)
+        if replicas is None:
+            result = await commandExecutor.run_command(["xtfsutil", absolute_file_path])
+            replicas = div_util.parse_xtfsutil_replicas(result.stdout)
+        return div_util.is_replica_complete(replicas, target_osd)
+
+    async def wait_until_complete(self, absolute_file_path, target_osd, poll_slots=None):
+        """
+        wait until the replica of the given file on target_osd is complete.
+        returns False if it is not complete after max_polls polls.
+        if poll_slots (an asyncio.Semaphore) is given, each poll holds one of its slots.
+        """
+        delay = self.get_first_poll_delay(absolute_file_path, target_osd)
+        for _ in range(0, self.max_polls):
+            await asyncio.sleep(delay)
+            if poll_slots is None:
+                complete = await self.is_complete_async(absolute_file_path, target_osd)
+            else:
+                async with poll_slots:
+                    complete = await self.is_complete_async(absolute_file_path, target_osd)
+            if complete:
+                return True
+            delay = self.get_next_poll_delay(delay)
+        return False
+
+    async def wait_for_files(self, files_to_move, on_complete, max_concurrent_polls=200):
+        """
+        wait until the replicas of the given files (FileToMove objects) on their target OSDs are complete.
+        all files are watched concurrently, and the coroutine function on_complete is awaited with a file as soon
+        as its replica is complete (e.g., for deleting its original replica), without waiting for the other files.
+        at most max_concurrent_polls polls run at the same time.
+        returns a tuple (list of files with complete replica, list of files given up).
+        """
+        complete_files = []
+        incomplete_files = []
+        poll_slots = asyncio.Semaphore(max_concurrent_polls)
+
+        async def watch(file_to_move):
+            if await self.wait_until_complete(file_to_move.absolute_file_path, file_to_move.target_osd, poll_slots):
+                complete_files.append(file_to_move)
+                await on_complete(file_to_move)
+            else:
+                incomplete_files.append(file_to_move)
+
+        await asyncio.gather(*[watch(file_to_move) for file_to_move in files_to_move])
+        return complete_files, incomplete_files
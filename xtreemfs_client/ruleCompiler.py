@@ -0,0 +1,95 @@
+"""
+compilation of the folder to OSD assignments of a DataDistribution into a compact set of filenamePrefix rules, and
+application of the difference to the rules installed on a volume.
+
+the filenamePrefix OSD selection policy places a new file according to the longest rule prefix matching its path.
+hence, the folders of a parent directory can be covered by a single rule for the parent, assigning it to the OSD
+of most of them, plus one rule for each folder assigned to another OSD.
+"""
+import os
+
+from xtreemfs_client import assignmentApplier
+
+
+def compile_rules(distribution, unassigned_folders=(), min_group_size=2):
+    """
+    compile the assignments of the given DataDistribution into a dictionary prefix -> osd uuid, placing every
+    assigned folder exactly as one rule per folder would.
+
+    the folders of a parent are collapsed into a rule for the parent if at least min_group_size of them are on the
+    same OSD, and only if the rule for the parent does not affect any other folder: the parent must not be an
+    assigned folder itself, all assigned folders below the parent must be its direct children, and no folder in
+    unassigned_folders (folder ids of existing, but not assigned folders) may be a child of the parent. files
+    directly in the parent are placed on the OSD of its rule.
+    """
+    folders_per_parent = {}
+    # parents containing assigned folders at deeper levels, or folders which must keep the default OSD selection
+    excluded_parents = set(map(os.path.dirname, unassigned_folders))
+    for folder_id, osd_uuid in distribution.folder_index.items():
+        parent = os.path.dirname(folder_id)
+        folders_per_parent.setdefault(parent, {})[folder_id] = osd_uuid
+        ancestor = os.path.dirname(parent)
+        while ancestor != '' and ancestor != os.path.dirname(ancestor):
+            excluded_parents.add(ancestor)
+            ancestor = os.path.dirname(ancestor)
+    excluded_parents.add('')
+    excluded_parents.update(distribution.folder_index.keys())
+
+    rules = {}
+    for parent, folders in folders_per_parent.items():
+        parent_osd = None
+        if parent not in excluded_parents:
+            folders_per_osd = {}
+            for osd_uuid in folders.values():
+                folders_per_osd[osd_uuid] = folders_per_osd.get(osd_uuid, 0) + 1
+            # the OSD of most folders, ties are broken by uuid for a stable result
+            parent_osd, num_folders = min(folders_per_osd.items(), key=lambda x: (-x[1], x[0]))
+            if num_folders < max(2, min_group_size):
+                parent_osd = None
+
+        if parent_osd is not None:
+            rules[parent] = parent_osd
+        for folder_id, osd_uuid in folders.items():
+            if osd_uuid != parent_osd:
+                rules[folder_id] = osd_uuid
+    return rules
+
+
+def diff_rules(installed_rules, compiled_rules):
+    """
+    the RuleOperations turning installed_rules into compiled_rules (both dictionaries prefix -> osd uuid), as a
+    tuple (additions, removals). a changed rule is added again, which replaces the installed one.
+    """
+    additions = [assignmentApplier.RuleOperation('add', prefix, osd_uuid)
+                 for prefix, osd_uuid in sorted(compiled_rules.items())
+                 if installed_rules.get(prefix) != osd_uuid]
+    removals = [assignmentApplier.RuleOperation('remove', prefix)
+                for prefix in sorted(installed_rules.keys())
+                if prefix not in compiled_rules]
+    return additions, removals
+
+
+def apply_rules(applier, installed_rules, compiled_rules):
+    """
+    apply the difference between installed_rules and compiled_rules with the given
+    assignmentApplier.AssignmentApplier. all additions are applied before any removal, such that, e.g., the folders
+    of a parent are never left without a rule when their rules are collapsed into the rule for the parent.
+    if any addition fails, no rules are removed.
+
+    installed_rules is updated to the rules actually installed. returns the list of
+    assignmentApplier.FailedOperations.
+    """
+    additions, removals = diff_rules(installed_rules, compiled_rules)
+    failed_operations = applier.apply(additions)
+    failed_prefixes = set(map(lambda x: x.operation.folder_id, failed_operations))
+    for operation in additions:
+        if operation.folder_id not in failed_prefixes:
+            installed_rules[operation.folder_id] = operation.osd_uuid
+
+    if len(failed_operations) == 0:
+        failed_operations = applier.apply(removals)
+        failed_prefixes = set(map(lambda x: x.operation.folder_id, failed_operations))
+        for operation in removals:
+            if operation.folder_id not in failed_prefixes:
+                del installed_rules[operation.folder_id]
+    return failed_operations
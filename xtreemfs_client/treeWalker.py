@@ -0,0 +1,166 @@
+"""
+parallel directory tree walk, replacing os.walk where each metadata call is a round trip to the MRC.
+"""
+import collections
+import concurrent.futures
+import os
+import queue
+import threading
+
+
+class TreeWalker(object):
+    """
+    walks directory trees with parallelism threads, each listing directories with os.scandir.
+
+    the directories still to be listed are kept in a shared deque: a thread that has just listed a directory
+    continues with its newest subdirectory (depth first, like os.walk), while idle threads steal the oldest
+    directories, which tend to be the largest subtrees. on network file systems like XtreemFS, most of the walking
+    time is spent waiting for metadata requests, so threads work well despite the GIL.
+
+    the threads are kept between walks, call close when the walker is no longer needed.
+    """
+
+    def __init__(self, parallelism=16, max_queued_results=10000):
+        self.parallelism = max(1, parallelism)
+        # upper bound for the number of directory listings walked ahead of the consumer
+        self.max_queued_results = max_queued_results
+        self.executor = None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def walk_files(self, path, function=None):
+        """
+        generator yielding an os.DirEntry for every file (everything that is not a directory) below path, in no
+        particular order. symbolic links to directories are not followed.
+        if function is given, it is called with each os.DirEntry in the walking threads, and its results are
+        yielded instead, e.g., to also query the OSDs of each file in parallel.
+        the walk is stopped when the generator is closed.
+        """
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.parallelism)
+        walk = TreeWalk(path, function, self.max_queued_results)
+        workers = [self.executor.submit(walk.work) for _ in range(0, self.parallelism)]
+        try:
+            num_finished_workers = 0
+            while num_finished_workers < len(workers):
+                try:
+                    results = walk.results.get(timeout=0.1)
+                except queue.Empty:
+                    if walk.stopped:
+                        # a worker has failed
+                        break
+                    continue
+                if results is None:
+                    num_finished_workers += 1
+                    continue
+                for result in results:
+                    yield result
+        finally:
+            walk.stop()
+            for worker in workers:
+                # raises the exceptions of function, if any
+                worker.result()
+
+
+class TreeWalk(object):
+    """
+    the state of one walk of a TreeWalker.
+    """
+
+    def __init__(self, path, function, max_queued_results):
+        self.function = function
+        self.directories = collections.deque([path])
+        # number of directories queued or being listed
+        self.num_pending_directories = 1
+        self.condition = threading.Condition()
+        self.stopped = False
+        # lists of results, one per directory listing, and None for each finished worker
+        self.results = queue.Queue(max_queued_results)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def work(self):
+        try:
+            directory = self.next_directory(None)
+            while directory is not None:
+                subdirectories, results = self.list_directory(directory)
+                if len(results) > 0:
+                    self.put_results(results)
+                directory = self.next_directory(subdirectories)
+        except BaseException:
+            # the other workers would wait for the directories of this worker forever
+            self.stop()
+            raise
+        finally:
+            self.put_results(None)
+
+    def next_directory(self, subdirectories):
+        """
+        add the subdirectories of the directory listed last (if any), and take the next directory to list.
+        returns None when the walk is done or has been stopped.
+        """
+        with self.condition:
+            if subdirectories is not None:
+                self.directories.extend(subdirectories)
+                self.num_pending_directories += len(subdirectories) - 1
+                self.condition.notify(len(subdirectories))
+                if self.num_pending_directories == 0:
+                    self.condition.notify_all()
+                elif len(self.directories) > 0 and not self.stopped:
+                    return self.directories.pop()
+
+            while len(self.directories) == 0 and self.num_pending_directories > 0 and not self.stopped:
+                self.condition.wait()
+            if self.stopped or len(self.directories) == 0:
+                return None
+            # steal the oldest directory
+            return self.directories.popleft()
+
+    def list_directory(self, directory):
+        subdirectories = []
+        results = []
+        try:
+            entries = os.scandir(directory)
+        except OSError as error:
+            print("tree walker: could not read directory " + directory + ": " + str(error))
+            return subdirectories, results
+        with entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    # the entry has been removed in the meantime
+                    continue
+                if is_directory:
+                    subdirectories.append(entry.path)
+                elif self.function is None:
+                    results.append(entry)
+                else:
+                    results.append(self.function(entry))
+        return subdirectories, results
+
+    def put_results(self, results):
+        while not self.stopped:
+            try:
+                self.results.put(results, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+def walk_files(path, parallelism=16, function=None):
+    """
+    walk the files below path once, see TreeWalker.walk_files.
+    """
+    walker = TreeWalker(parallelism)
+    try:
+        for result in walker.walk_files(path, function):
+            yield result
+    finally:
+        walker.close()
@@ -0,0 +1,145 @@
+"""
+cache of the metadata of XtreemFS volumes, keyed by mount point, such that an OSDManager can be constructed without
+calling xtfsutil and fetching the DIR status page.
+"""
+import json
+import os
+import time
+
+from xtreemfs_client import div_util
+
+
+def get_default_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'xtreemfs_client', 'volume_metadata.json')
+
+
+class VolumeMetadata(object):
+    """
+    the metadata of the volume mounted at mount_point: the result of div_util.extract_volume_information for the
+    mount point, and the space of the OSDs (uuid -> {'usable_space': ..., 'total_space': ...}) as reported by the
+    DIR, which is None if the status page could not be read. timestamp is the time the metadata has been read.
+    """
+
+    def __init__(self, mount_point, volume_information, osd_information, timestamp=None):
+        self.mount_point = mount_point
+        self.volume_information = volume_information
+        self.osd_information = osd_information
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def get_age(self):
+        return time.time() - self.timestamp
+
+    def to_json(self):
+        return {'volume_information': self.volume_information, 'osd_information': self.osd_information,
+                'timestamp': self.timestamp}
+
+    @staticmethod
+    def from_json(mount_point, value):
+        volume_name, osd_list, osd_selection_policy, volume_address = value['volume_information']
+        volume_information = (volume_name, [tuple(x) for x in osd_list], osd_selection_policy, volume_address)
+        return VolumeMetadata(mount_point, volume_information, value['osd_information'], value['timestamp'])
+
+
+class VolumeMetadataCache(object):
+    """
+    VolumeMetadata of several volumes, stored as json file at path (by default in the user's cache directory).
+    entries older than ttl_secs are ignored. the file is written atomically, concurrent writers may only lose each
+    other's entries, which are then read again.
+    """
+
+    def __init__(self, path=None, ttl_secs=300):
+        if path is None:
+            path = get_default_path()
+        self.path = path
+        self.ttl_secs = ttl_secs
+
+    def __read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __write(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            # the cache is an optimization only
+            print("volume metadata cache " + self.path + " could not be written: " + str(error))
+
+    def __get_cached_mount_point(self, path):
+        mount_points = [mount_point for mount_point in self.__read().keys()
+                        if path == mount_point or path.startswith(mount_point.rstrip('/') + '/')]
+        if len(mount_points) == 0:
+            return None
+        return max(mount_points, key=len)
+
+    def get(self, mount_point):
+        """
+        the cached VolumeMetadata of the volume mounted at mount_point, or None if there is no entry younger than
+        ttl_secs.
+        """
+        value = self.__read().get(mount_point)
+        if value is None:
+            return None
+        try:
+            metadata = VolumeMetadata.from_json(mount_point, value)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if metadata.get_age() > self.ttl_secs or metadata.get_age() < 0:
+            return None
+        return metadata
+
+    def find(self, path):
+        """
+        the cached VolumeMetadata of the volume containing path (given like the mount points, e.g., as absolute
+        path), or None. if several mount points contain path, the innermost one is used.
+        """
+        mount_point = self.__get_cached_mount_point(path)
+        if mount_point is None:
+            return None
+        return self.get(mount_point)
+
+    def guess_mount_point(self, path):
+        """
+        the probable mount point of the volume containing path: the innermost mount point containing path with a
+        (possibly expired) entry, or else the innermost mount point above path other than the root. returns None
+        if there is no such mount point.
+        """
+        mount_point = self.__get_cached_mount_point(path)
+        if mount_point is not None:
+            return mount_point
+
+        directory = path
+        while os.path.dirname(directory) != directory:
+            if os.path.ismount(directory):
+                return directory
+            directory = os.path.dirname(directory)
+        return None
+
+    def put(self, metadata):
+        entries = self.__read()
+        entries[metadata.mount_point] = metadata.to_json()
+        self.__write(entries)
+
+    def invalidate(self, mount_point=None):
+        """
+        remove the entry of mount_point, or all entries if mount_point is None.
+        """
+        entries = {}
+        if mount_point is not None:
+            entries = self.__read()
+            entries.pop(mount_point, None)
+        self.__write(entries)
+
+
+def get_path_on_volume(metadata, path):
+    """
+    the path of path on the volume of metadata, as printed by xtfsutil, without leading and trailing slashes.
+    """
+    return div_util.remove_leading_trailing_slashes(path[len(metadata.mount_point):])